@@ -19,6 +19,26 @@ Modules:
 - batch: Batch processing functions
 - signal_processing: Signal processing utilities
 - project_management: Project organization tools
+- resample: Timestamp based resampling of sensor streams
+- align: Multi-rate sensor alignment onto a common timebase
+- epochs: Stimulus-locked epoch arrays and on-disk epoch store
+- baseline: Per-respondent baseline correction of physiological channels
+- signal_store: Memory-mapped storage of raw sensor recordings
+- fixations: Fixation tables and gaze metrics from eye tracking samples
+- aoi: AOI label tokenisation and AOI conditioned metrics
+- scanpath: AOI sequences, transition matrices, entropy and similarity
+- heatmap: Streaming gaze heatmaps per stimulus
+- geometry: AOI definitions and grid indexed AOI hit testing
+- pupil: Batched pupil response metrics per fixation
+- records: Compact structured-array fixation and AOI records
+- stats_kernels: NumPy/SciPy test kernels behind get_significance(engine='fast')
+- screening: Column-wise group tests with FDR over wide outcome tables
+- result_cache: Content-addressed on-disk cache of significance results
+- proportions: Binomial/multinomial bootstrap intervals for choice proportions
+- cluster_permutation: Cluster-based permutation tests on respondent x time-bin curves
+- effect_sizes: Batched Cohen's d, Hedges' g and rank-biserial r with CIs
+- modelling: OLS/ANCOVA and mixed models fitted across many outcome columns
+- power: Monte-Carlo power curves and sample sizes for get_significance designs
 """
 
 __version__ = "0.1.0"
@@ -33,6 +53,26 @@ from . import tobiitools
 from . import batch
 from . import signal_processing
 from . import project_management
+from . import resample
+from . import align
+from . import epochs
+from . import baseline
+from . import signal_store
+from . import fixations
+from . import aoi
+from . import scanpath
+from . import heatmap
+from . import geometry
+from . import pupil
+from . import records
+from . import stats_kernels
+from . import screening
+from . import result_cache
+from . import proportions
+from . import cluster_permutation
+from . import effect_sizes
+from . import modelling
+from . import power
 
 __all__ = [
     'clean',
@@ -44,4 +84,24 @@ __all__ = [
     'batch',
     'signal_processing',
     'project_management',
+    'resample',
+    'align',
+    'epochs',
+    'baseline',
+    'signal_store',
+    'fixations',
+    'aoi',
+    'scanpath',
+    'heatmap',
+    'geometry',
+    'pupil',
+    'records',
+    'stats_kernels',
+    'screening',
+    'result_cache',
+    'proportions',
+    'cluster_permutation',
+    'effect_sizes',
+    'modelling',
+    'power',
 ]
@@ -0,0 +1,135 @@
+"""
+Alignment of multi-rate sensor streams onto a common timebase.
+
+An iMotions export interleaves every sensor on one row index, leaving most
+cells empty. split_streams separates it into one dense stream per sensor and
+align_streams joins the streams back onto a single master clock with sorted
+as-of joins, so cross-modal questions (e.g. engagement while fixating an AOI)
+become a single groupby on the aligned frame.
+"""
+
+import numpy as np
+import pandas as pd
+from .resample import uniform_grid
+
+IMOTIONS_SENSORS = {'EEG': ['Frontal Asymmetry Alpha', 'High Engagement', 'Workload Average'],
+                    'ET': ['Fixation Index', 'Fixation Duration', 'AOIs gazed at', 'ET_PupilLeft', 'ET_PupilRight'],
+                    'GSR': ['GSR Raw (microSiemens)', 'Peak detected (binary)'],
+                    'Events': ['SlideEvent']}
+
+
+def _as_list(x):
+    return [] if x is None else ([x] if isinstance(x, str) else list(x))
+
+
+def split_streams(df: pd.DataFrame, sensors: dict = None, *, time_col: str = 'Timestamp', by=None) -> dict:
+    """
+    Splits an interleaved sensor export into one stream per sensor.
+
+    Parameters:
+    - df: Input DataFrame, typically from read_imotions
+    - sensors: Dictionary of sensor name to columns, defaults to IMOTIONS_SENSORS.
+      Columns that are not in df are skipped, as are sensors with none present.
+    - time_col: Column holding sample times
+    - by: Optional key column(s) kept on every stream (e.g. 'Respondent', 'SourceStimuliName')
+
+    Returns:
+    - dict: Sensor name to DataFrame holding only the rows with a sample for that sensor
+
+    Raises:
+    - KeyError: If time_col or by cannot be found in df
+    """
+    keys = _as_list(by)
+    missing = [c for c in [time_col] + keys if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    streams = {}
+    for name, columns in (sensors or IMOTIONS_SENSORS).items():
+        present = [c for c in columns if c in df.columns]
+        if not present:
+            continue
+        _df = df[keys + [time_col] + present].replace(to_replace=' ', value=np.nan)
+        streams[name] = _df.loc[_df[present].notna().any(axis=1)].reset_index(drop=True)
+    return streams
+
+
+def align_streams(streams: dict, master, *, time_col: str = 'Timestamp', by=None, tolerance=None,
+                  direction='nearest', as_arrays: bool = False):
+    """
+    Aligns per-sensor streams onto a master clock.
+
+    Parameters:
+    - streams: Dictionary of stream name to DataFrame, each holding time_col and the by columns
+    - master: Name of the stream whose timestamps are the clock, or a rate in Hz
+      for a uniform grid spanning all streams (per by group)
+    - time_col: Column holding sample times
+    - by: Optional key column(s) that must match exactly (e.g. 'Respondent')
+    - tolerance: Maximum time distance for a match, as a scalar or a dict per stream
+    - direction: 'nearest', 'backward' (sample and hold) or 'forward', as a scalar or a dict per stream
+    - as_arrays: Return a dictionary of column name to np.ndarray instead of a DataFrame
+
+    Returns:
+    - pd.DataFrame or dict: One row per master tick. Columns appearing in more than one
+      stream are prefixed with the stream name.
+
+    Raises:
+    - KeyError: If master is not one of the streams, or a stream lacks time_col or by
+    """
+    keys = _as_list(by)
+    for name, stream in streams.items():
+        missing = [c for c in [time_col] + keys if c not in stream.columns]
+        if missing:
+            raise KeyError(f"{missing} columns missing from stream '{name}'")
+
+    def _sorted(df):
+        df = df.copy()
+        df[time_col] = pd.to_numeric(df[time_col], errors='coerce').astype(float)
+        return df.dropna(subset=[time_col]).sort_values(time_col, kind='stable').reset_index(drop=True)
+
+    streams = {name: _sorted(stream) for name, stream in streams.items()}
+
+    if isinstance(master, str):
+        if master not in streams:
+            raise KeyError(f"Master stream '{master}' not in streams {list(streams)}")
+        clock = streams[master]
+        others = [name for name in streams if name != master]
+    else:
+        # Uniform grid from the earliest to the latest sample of every stream, per key
+        spans = pd.concat([s[keys + [time_col]] for s in streams.values()])
+        if keys:
+            limits = spans.groupby(keys)[time_col].agg(['min', 'max']).reset_index()
+        else:
+            limits = pd.DataFrame({'min': [spans[time_col].min()], 'max': [spans[time_col].max()]})
+        ticks = []
+        for _, row in limits.iterrows():
+            grid = uniform_grid(row['min'], row['max'] + 1000.0 / master, master)
+            tick = pd.DataFrame({time_col: grid})
+            for k in keys:
+                tick[k] = row[k]
+            ticks.append(tick)
+        clock = _sorted(pd.concat(ticks, ignore_index=True)) if ticks else pd.DataFrame(columns=keys + [time_col])
+        others = list(streams)
+
+    shared = keys + [time_col]
+    seen = {}
+    for name in streams:
+        for c in streams[name].columns:
+            if c not in shared:
+                seen[c] = seen.get(c, 0) + 1
+
+    def _renamed(name, df):
+        return df.rename(columns={c: f"{name} {c}" for c in df.columns if c not in shared and seen[c] > 1})
+
+    aligned = _renamed(master, clock) if isinstance(master, str) else clock
+    for name in others:
+        tol = tolerance.get(name) if isinstance(tolerance, dict) else tolerance
+        how = direction.get(name, 'nearest') if isinstance(direction, dict) else direction
+        aligned = pd.merge_asof(aligned, _renamed(name, streams[name]), on=time_col, by=keys or None,
+                                tolerance=tol, direction=how)
+    if keys:
+        aligned = aligned.sort_values(keys + [time_col], kind='stable').reset_index(drop=True)
+
+    if as_arrays:
+        return {c: aligned[c].to_numpy() for c in aligned.columns}
+    return aligned
@@ -0,0 +1,126 @@
+"""
+AOI label handling for eye tracking samples.
+
+iMotions writes every AOI a sample falls in to 'AOIs gazed at', separated by
+';' when AOIs overlap. aoi_matrix tokenises the column once into a sparse
+multi-hot (samples x AOI) matrix, so AOI conditioned metrics for every AOI are
+a single sparse matrix product instead of one substring scan per AOI.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def aoi_matrix(labels, *, sep: str = ';', vocabulary: list = None):
+    """
+    Tokenises AOI labels into a sparse multi-hot matrix.
+
+    Parameters:
+    - labels: Sequence of AOI labels, e.g. the 'AOIs gazed at' column. Missing or blank
+      labels give empty rows.
+    - sep: Separator between overlapping AOIs
+    - vocabulary: Optional fixed AOI list (and column order). Tokens outside it are ignored.
+      Defaults to every AOI found, in order of appearance.
+
+    Returns:
+    - tuple: (matrix, aois) where matrix is a scipy.sparse.csr_matrix of shape
+      (n_samples, n_aois) holding 1 where a sample gazes at an AOI
+    """
+    labels = pd.Series(labels).reset_index(drop=True)
+    tokens = labels.dropna().astype(str).str.split(sep).explode().str.strip()
+    tokens = tokens.loc[tokens != '']
+
+    if vocabulary is None:
+        codes, aois = pd.factorize(tokens)
+        aois = list(aois)
+    else:
+        aois = list(vocabulary)
+        codes = pd.Index(aois).get_indexer(tokens)
+
+    known = codes >= 0
+    rows = tokens.index.to_numpy()[known]
+    matrix = sparse.csr_matrix((np.ones(known.sum()), (rows, codes[known])), shape=(len(labels), len(aois)))
+    # A label repeating an AOI still counts once
+    matrix.data = np.minimum(matrix.data, 1)
+    return matrix, aois
+
+
+def aoi_means(matrix, values):
+    """
+    Averages sample values per AOI with one sparse product.
+
+    Parameters:
+    - matrix: Multi-hot matrix from aoi_matrix, shape (n_samples, n_aois)
+    - values: Array of shape (n_samples,) or (n_samples, n_channels); NaNs are skipped per channel
+
+    Returns:
+    - tuple: (means, counts), each of shape (n_aois, n_channels) (or (n_aois,) for 1-D values)
+    """
+    values = np.asarray(values, dtype=float)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+    valid = ~np.isnan(values)
+    sums = np.asarray(matrix.T @ np.where(valid, values, 0.0))
+    counts = np.asarray(matrix.T @ valid.astype(float))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    if squeeze:
+        return means[:, 0], counts[:, 0]
+    return means, counts
+
+
+def aoi_conditioned(df: pd.DataFrame, columns: list, *, aoi_col: str = 'AOIs gazed at', by=None,
+                    sep: str = ';') -> pd.DataFrame:
+    """
+    Computes channel means while gazing at each AOI (e.g. engagement per AOI).
+
+    Groups are folded into the matrix columns, so every group and AOI is still
+    computed by a single sparse product.
+
+    Parameters:
+    - df: Aligned sensor data holding aoi_col and columns (see align.align_streams)
+    - columns: Channels to average
+    - aoi_col: Column holding AOI labels
+    - by: Optional key column(s), e.g. 'Respondent' or ['Respondent', 'SourceStimuliName']
+    - sep: Separator between overlapping AOIs
+
+    Returns:
+    - pd.DataFrame: One row per (by, AOI) with the mean of each channel and a 'Count' column
+      (samples with a valid value in the first channel). Rows with a zero Count are dropped.
+
+    Raises:
+    - KeyError: If aoi_col, by or columns cannot be found in df
+    """
+    keys = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    columns = list(columns)
+    missing = [c for c in [aoi_col] + keys + columns if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    labels = df[aoi_col].replace(to_replace=' ', value=np.nan)
+    matrix, aois = aoi_matrix(labels, sep=sep)
+    values = df[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    if keys:
+        groups = df.groupby(keys, sort=False, dropna=False)
+        codes = groups.ngroup().to_numpy()
+        n_aois = len(aois)
+        coo = matrix.tocoo()
+        matrix = sparse.csr_matrix((coo.data, (coo.row, codes[coo.row] * n_aois + coo.col)),
+                                   shape=(matrix.shape[0], groups.ngroups * n_aois))
+        means, counts = aoi_means(matrix, values)
+
+        # Matrix column g * n_aois + a holds group g (in ngroup order) and AOI a
+        frame = groups.size().index.to_frame(index=False)
+        frame = frame.loc[frame.index.repeat(n_aois)].reset_index(drop=True)
+        frame[aoi_col] = np.tile(np.asarray(aois, dtype=object), groups.ngroups)
+        frame[columns] = means
+    else:
+        means, counts = aoi_means(matrix, values)
+        frame = pd.DataFrame({aoi_col: aois})
+        frame[columns] = means
+
+    frame['Count'] = counts[:, 0].astype(np.int64)
+    return frame.loc[frame['Count'] > 0].reset_index(drop=True)
@@ -0,0 +1,120 @@
+"""
+Per-respondent baseline correction of physiological channels.
+
+Baselines are taken from a blank-screen stimulus or from a pre-stimulus window
+of stimulus-locked Epochs, for every respondent and channel at once, and then
+applied by broadcasting over the epoch array. Baselines can be cached next to
+the epochs in an EpochStore, so they are computed once per recording.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from .epochs import Epochs, EpochStore
+
+MODES = ('subtract', 'ratio', 'zscore')
+
+
+def compute_baselines(epochs: Epochs, start: float = None, stop: float = None) -> pd.DataFrame:
+    """
+    Computes baseline mean and standard deviation per respondent and channel.
+
+    Parameters:
+    - epochs: Epochs holding the baseline period, e.g. a blank screen stimulus
+      or an epoch cut with a pre-stimulus window
+    - start, stop: Optional time window relative to onset (ms), e.g. -1000 and 0.
+      Defaults to the whole epoch.
+
+    Returns:
+    - pd.DataFrame: Indexed by respondent with ('mean', channel) and ('std', channel) columns
+    """
+    if start is not None or stop is not None:
+        epochs = epochs.window(-np.inf if start is None else start, np.inf if stop is None else stop)
+
+    data = np.asarray(epochs.data, dtype=float)
+    counts = (~np.isnan(data)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(data, axis=1) / counts
+        var = np.nansum((data - mean[:, None, :]) ** 2, axis=1) / (counts - 1)
+    std = np.where(counts > 1, np.sqrt(var), np.nan)
+
+    columns = pd.MultiIndex.from_product([['mean', 'std'], epochs.channels])
+    return pd.DataFrame(np.hstack([mean, std]), index=pd.Index(epochs.respondents, name='Respondent'),
+                        columns=columns)
+
+
+def apply_baseline(data, baselines: pd.DataFrame, *, mode: str = 'subtract', respondent_col: str = 'Respondent'):
+    """
+    Applies per-respondent baselines.
+
+    Parameters:
+    - data: Epochs, or a DataFrame holding respondent_col and the baseline channels
+    - baselines: Output of compute_baselines
+    - mode: 'subtract' (x - mean), 'ratio' (x / mean) or 'zscore' ((x - mean) / std)
+    - respondent_col: Respondent column when data is a DataFrame
+
+    Returns:
+    - Epochs or pd.DataFrame: Corrected copy of data. Respondents without a baseline are NaN.
+
+    Raises:
+    - ValueError: If mode is unknown
+    - KeyError: If a baseline channel or respondent_col is missing from a DataFrame
+    """
+    if mode not in MODES:
+        raise ValueError(f"Expected mode to be one of {MODES}, got '{mode}'")
+
+    def _correct(values, rows, channels):
+        mean = baselines['mean'].reindex(columns=channels).to_numpy(dtype=float)
+        std = baselines['std'].reindex(columns=channels).to_numpy(dtype=float)
+        # Respondents without a baseline pick up a row of NaN
+        mean = np.vstack([mean, np.full(len(channels), np.nan)])[rows]
+        std = np.vstack([std, np.full(len(channels), np.nan)])[rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if mode == 'subtract':
+                return values - mean
+            if mode == 'ratio':
+                return values / mean
+            return (values - mean) / std
+
+    if isinstance(data, Epochs):
+        rows = baselines.index.get_indexer(data.respondents)
+        values = _correct(np.asarray(data.data, dtype=float).transpose(1, 0, 2), rows, data.channels)
+        return Epochs(data.stimulus, values.transpose(1, 0, 2), data.respondents, data.times, data.channels)
+
+    channels = list(baselines['mean'].columns)
+    missing = [c for c in [respondent_col] + channels if c not in data.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+    rows = baselines.index.get_indexer(data[respondent_col])
+    values = data[channels].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    result = data.copy()
+    result[channels] = _correct(values, rows, channels)
+    return result
+
+
+def cached_baselines(store: EpochStore, stimulus: str, start: float = None, stop: float = None, *,
+                     refresh: bool = False) -> pd.DataFrame:
+    """
+    Loads baselines cached in an EpochStore, computing and saving them on first use.
+
+    Parameters:
+    - store: EpochStore holding the baseline stimulus epochs
+    - stimulus: Stimulus the baseline is taken from (e.g. a blank screen, or the stimulus itself
+      when it was epoched with a pre-stimulus window)
+    - start, stop: See compute_baselines
+    - refresh: Recompute even if a cached copy exists. Copies older than the stored epochs
+      are always recomputed.
+
+    Returns:
+    - pd.DataFrame: As returned by compute_baselines
+    """
+    path = f"{store._path(stimulus)}.baseline_{start}_{stop}.pkl"
+    # Pickled so respondent labels such as '001' keep their type; stale once the epochs are rewritten
+    epochs_path = f"{store._path(stimulus)}.npy"
+    fresh = os.path.exists(path) and (not os.path.exists(epochs_path)
+                                      or os.path.getmtime(path) >= os.path.getmtime(epochs_path))
+    if fresh and not refresh:
+        return pd.read_pickle(path)
+    baselines = compute_baselines(store.load(stimulus), start, stop)
+    baselines.to_pickle(path)
+    return baselines
@@ -1,4 +1,11 @@
 from neurallib.clean import * 
+from neurallib.resample import resample_stream
+from neurallib.fixations import build_fixation_table, gaze_metrics
+from neurallib.heatmap import GazeHeatmap
+from neurallib.plot import gaze_heatmap
+from neurallib.pupil import pupil_metrics
+from neurallib.records import Records
+from neurallib.cluster_permutation import respondent_curves, compare_curves
 
 '''
     Terminology:
@@ -221,7 +228,11 @@ def alpha(in_folder, out_folder, results_folder, header_row = 0, freq = 0.1, fre
     #Get Ad names
     dirs = get_files(in_folder)
     
-    DATA = pd.DataFrame()
+    all_path = f"{results_folder}ALL_{data}.csv"
+    first = True
+    if os.path.exists(all_path):
+        #Samples are appended per ad, so start from no file rather than a previous run's
+        os.remove(all_path)
     #For each Ad..
     for dir in dirs:
             print(f"> Now Working: {dir}")
@@ -277,7 +288,8 @@ def alpha(in_folder, out_folder, results_folder, header_row = 0, freq = 0.1, fre
             ind = np.digitize(all_data['Row'],bins)
 
             all_data['Corrected_Time']=ind
-            DATA = pd.concat([DATA, all_data])
+            all_data.to_csv(all_path, mode='w' if first else 'a', header=first)
+            first = False
 
             gb = all_data.groupby(ind)
             for x in gb.groups:
@@ -316,7 +328,6 @@ def alpha(in_folder, out_folder, results_folder, header_row = 0, freq = 0.1, fre
     pprint.pprint(len(calc))
     pp.pprint(calc)
     calc.to_csv(f"{results_folder}proportions_{data}.csv")
-    DATA.to_csv(f"{results_folder}ALL_{data}.csv")
     print("> Completed: Extracting Batch Alpha")
  
 
@@ -462,7 +473,11 @@ def engagement(in_folder, out_folder, results_folder, header_row= 0, freq = 0.2,
     keep = ['Row',data] 
     #Get Ad names
     dirs = get_files(in_folder)
-    DATA = pd.DataFrame()
+    all_path = f"{results_folder}ALL_{data}.csv"
+    first = True
+    if os.path.exists(all_path):
+        #Samples are appended per ad, so start from no file rather than a previous run's
+        os.remove(all_path)
     #For each Ad..
     for dir in dirs:
             print(f"> Now Working: {dir}")
@@ -514,7 +529,8 @@ def engagement(in_folder, out_folder, results_folder, header_row= 0, freq = 0.2,
             ind = np.digitize(all_data['Row'],bins)
 
             all_data['Corrected_Time']=ind
-            DATA = pd.concat([DATA, all_data])
+            all_data.to_csv(all_path, mode='w' if first else 'a', header=first)
+            first = False
 
             gb = all_data.groupby(ind)
             for x in gb.groups:
@@ -603,7 +619,6 @@ def engagement(in_folder, out_folder, results_folder, header_row= 0, freq = 0.2,
     
     pp.pprint(calc)
     calc.to_csv(f"{results_folder}proportions_{data}.csv")
-    DATA.to_csv(f"{results_folder}ALL_{data}.csv")
     print("> Completed: Extracting Batch Engagement")
 
 
@@ -616,7 +631,11 @@ def workload(in_folder, out_folder, results_folder, header_row = 0, freq = 0.2,
     keep = ['Row',data]
     #Get Ad names
     dirs = get_files(in_folder)
-    DATA = pd.DataFrame()
+    all_path = f"{results_folder}ALL_{data}.csv"
+    first = True
+    if os.path.exists(all_path):
+        #Samples are appended per ad, so start from no file rather than a previous run's
+        os.remove(all_path)
     #For each Ad..
     for dir in dirs:
             print(f"> Now Working: {dir}")
@@ -657,7 +676,6 @@ def workload(in_folder, out_folder, results_folder, header_row = 0, freq = 0.2,
                     get_key(z) 
             pprint.pprint(len(all_data))
             all_data.to_csv(results_folder+dir+'_'+data+'.csv')
-            DATA = pd.concat([DATA, all_data])
             #Calculate time proportions
             prop_col = ['Time Workload', 'Low Workload Proportion', 'Optimal Workload Proportion', 'Overworked Proportion']
             prop = pd.DataFrame(columns = prop_col) 
@@ -668,7 +686,8 @@ def workload(in_folder, out_folder, results_folder, header_row = 0, freq = 0.2,
             ind = np.digitize(all_data['Row'],bins)
 
             all_data['Corrected_Time']=ind
-            DATA = pd.concat([DATA, all_data])
+            all_data.to_csv(all_path, mode='w' if first else 'a', header=first)
+            first = False
 
             gb = all_data.groupby(ind)
             for x in gb.groups:
@@ -736,19 +755,20 @@ def workload(in_folder, out_folder, results_folder, header_row = 0, freq = 0.2,
 
     pp.pprint(calc)
     calc.to_csv(f"{results_folder}proportions_{data}.csv")
-    DATA.to_csv(f"{results_folder}ALL_{data}.csv")
     print("> Completed: Extracting Batch Workload")
 
 
-def batch_GSR(in_folder, out_folder, results_folder):
+def batch_GSR(in_folder, out_folder, results_folder, rate = 10):
     
     #Define variables
 
     row = "Row" 
+    time_col = "Timestamp"
     data = "GSR Raw (microSiemens)"
     
     keep = []
     keep.append(row)
+    keep.append(time_col)
     keep.append(data)
     
     #Get Ad names
@@ -778,12 +798,12 @@ def batch_GSR(in_folder, out_folder, results_folder):
             
             #Combine data per ad
             files = get_files(out_path)
-            labels = ['Row', data]
+            labels = ['Row', time_col, data]
             all_data = pd.DataFrame(columns = labels )
             res = 1
             for file in files:
                 try:
-                    _data = pd.read_csv(out_path + '/' + file, header=0, usecols=[0,1], names = labels)
+                    _data = pd.read_csv(out_path + '/' + file, header=0, usecols=[0,1,2], names = labels)
                     _data.insert(0, 'Respondant',res)
                     _data.insert(0, 'Ad', dir)
                     all_data = pd.concat([all_data, _data])
@@ -794,13 +814,12 @@ def batch_GSR(in_folder, out_folder, results_folder):
             pprint.pprint(len(all_data))
             all_data.to_csv(results_folder+dir+'_'+data+'.csv')
             
-            #Produce Time Series
-            
-            df = df= pd.read_csv(results_folder+dir+'_'+data+'.csv', header=0)
-            bins = np.arange(0,30000,1)
-            ind = np.digitize(df['Row'],bins)
-            df = df.groupby(ind).mean().reset_index()
-            df[['Row',data]].to_csv(f"{results_folder}time_{dir}_{data}.csv")
+            #Produce Time Series on the Timestamp clock, relative to each respondent's first sample
+            all_data[time_col] = pd.to_numeric(all_data[time_col], errors='coerce')
+            all_data['Time'] = all_data[time_col] - all_data.groupby('Respondant')[time_col].transform('min')
+            df = resample_stream(all_data, [data], rate, time_col='Time', by='Respondant', start=0)
+            df = df.groupby('Time')[data].mean().reset_index()
+            df[['Time',data]].to_csv(f"{results_folder}time_{dir}_{data}.csv")
 
 
     #Combine all data
@@ -1181,99 +1200,29 @@ def eye_metrics_saliency(in_folder, out_folder, results_folder, header_row = 0):
     files = get_files(in_path)
 
     #Create the things we will need
-    eye = pd.DataFrame()
-    col  = ['Res','Slide','AOI','Timestamp','Index','Duration']
-    calc = pd.DataFrame(columns = col)
-    all_data = pd.DataFrame()
+    col  = ['Res','Stim','AOI','Timestamp','Index','Duration']
+    calc = []
 
     #Extracting all raw data
 
-    ### FOR EACH PARTICIPANT
+    ### FOR EACH PARTICIPANT, ROW ENTRY PER FIXATION
     for f in files:
         try:
             df = pd.read_csv(f"{in_path}{f}", header=header_row, low_memory=False)
-            stims = df['SourceStimuliName'].drop_duplicates()
-
-            for stim in stims: #For each ad, skip this as data should already be split by ad
-                _stim = df[df['SourceStimuliName']== stim]
-
-                #Get list of AOIs viewed by participant - ALREADY DONE
-                aois = _stim['AOIs gazed at'].dropna().drop_duplicates()
-
-                #Get start time - ALREADY DONE
-                _start_time = _stim.loc[_stim['SlideEvent']=='StartMedia']['Timestamp'].iloc[0]
-
-                #Get data per AOI
-                for aoi in aois:
-                    
-                    #Collect all data for the AOI, adjust the timestamp to start of ad
-                    
-                    _aoi = _stim.loc[_stim['AOIs gazed at']==aoi]
-                    col = ['Row','Timestamp','FixIndex','FixDur','Stim','Respondent']
-                    _pupil = pd.DataFrame(columns= col)
-                    _pupil['Row'] = _aoi['Row']
-                    _pupil['Timestamp']=_aoi['Timestamp']-_start_time
-                    _pupil['FixIndex']=_aoi['Fixation Index']
-                    _pupil['FixDur']=_aoi['Fixation Duration']
-                    _pupil['Stim']=_aoi['SourceStimuliName']
-                    _pupil['Respondent']= f[:11]
-
-                    #Find all fixations for the ad
-                    ### FIXATIONS IDENTIFIED BY INDEX
-                    fixations = _pupil['FixIndex'].drop_duplicates().dropna()
-                    
-                    ### THIS IS COLLECTING ALL FIXATIONS FOR AN AOI, ROW ENTRY PER FIXATION
-                    
-                    #For each fixation
-                    for fix in fixations:
-                        _data = _pupil.loc[_pupil['FixIndex']==fix]
-
-                        _calc = {'Res':_data['Respondent'].iloc[0],
-                                'Stim':stim,
-                                'AOI':aoi,
-                                'Timestamp':_data['Timestamp'].iloc[0], #Identify start time of fixation from time of first appearance of fixation index
-                                'Index':_data['FixIndex'].iloc[0],
-                                'Duration':_data['Timestamp'].iloc[-1]-_data['Timestamp'].iloc[0]} #Set duration of fixation by time of last entry minus time of first entry
-                        calc = calc.append(_calc, ignore_index=True)
-
-                    #BY THE END OF THIS, WE HAVE A TABLE WITH A ROW ENTRY FOR EACH FIXATION OF EACH PARTICIPANT
+            calc.append(Records.from_frame(build_fixation_table(df, f[:11])[col]))
             print(f">> Completed Collection: {f} ")
         except Exception as z:
                 get_key(z)  
+    calc = Records.concat(calc).to_frame() if calc else pd.DataFrame(columns = col)
     
     #File containing eye data per ad per fixations
     calc.to_excel(f'{out_path}eye_metrics_raw.xlsx', index = False)
 
-    print(len(calc))
-    calc = calc.loc[(calc['Duration']>=150)]
-    print(len(calc))
-    calc = calc.loc[(calc['Duration']<=900)]
-    print(len(calc))
-
-    calcs = pd.DataFrame()
-
-    resps = calc['Res'].drop_duplicates()
-    
-    #Calculating metrics from raw (FFD and TFD)
-    for res in resps:                
-        _res = calc.loc[calc['Res']==res]
-        stims = _res['Stim'].drop_duplicates()
-
-        for stim in stims:
-            _stim = _res[_res['Stim']== stim].sort_values('Timestamp')
-            aois = _stim['AOI'].dropna().drop_duplicates()
-
-            for aoi in aois:
-                _aoi = _stim.loc[_stim['AOI']==aoi].sort_values('Timestamp')
-                _calcs = {'Res':res,
-                        'Stim':stim,
-                        'AOI':f"{stim}_{aoi}",
-                        'Timestamp':_aoi['Timestamp'].iloc[0],
-                        'Index':_aoi['Index'].iloc[0],
-                        'TFD':_aoi['Duration'].sum(),
-                        'FFD':_aoi['Duration'].iloc[0]}
-
-                calcs = calcs.append(_calcs, ignore_index=True)
+    #Calculating metrics from raw (FFD and TFD), fixations between 150ms and 900ms
+    calcs = gaze_metrics(calc, min_duration=150, max_duration=900)
+    calcs = calcs.rename(columns={'TTFF':'Timestamp'})
+    calcs['AOI'] = calcs['Stim'].astype(str) + '_' + calcs['AOI'].astype(str)
+    calcs = calcs[['Res','Stim','AOI','Timestamp','Index','TFD','FFD']]
 
     calcs.to_excel(f'{out_path}eye_metrics_final.xlsx', index = False)
     
@@ -1297,7 +1246,7 @@ def eye_metrics_saliency(in_folder, out_folder, results_folder, header_row = 0):
     data2.to_excel(f'{out_path}RESULT_Brand_Prominence.xlsx', index = True)
 
 
-def eye_metrics_saliency_og(in_folder, out_folder, results_folder, header_row = 0):
+def eye_metrics_saliency_og(in_folder, out_folder, results_folder, header_row = 0, exclude = None):
     header("> Running: Extracting Eye Metrics")
     in_path = f"{in_folder}"
     out_path = f"{results_folder}"
@@ -1305,124 +1254,53 @@ def eye_metrics_saliency_og(in_folder, out_folder, results_folder, header_row =
          
     files = get_files(in_path)
 
-    eye = pd.DataFrame()
-    col  = ['Res','Slide','AOI','Timestamp','Index','Classification','Duration','Tonic','dPD','Peaks','ICA']
-    calc = pd.DataFrame(columns = col)
-    all_data = pd.DataFrame()
+    col  = ['Res','Stim','AOI','Timestamp','Index','Duration','Tonic','dPD','Peaks','ICA']
+    calc = []
 
     #Extracting all raw data
     for f in files:
         try:
             res = f[:-3]
             df = pd.read_csv(f"{in_path}{f}", header=header_row, low_memory=False)
-            stims = df['SourceStimuliName'].drop_duplicates()
-
-            for stim in stims: #For each slide
-                _stim = df[df['SourceStimuliName']== stim]
-                aois = _stim['AOIs gazed at'].dropna().drop_duplicates()
-                _start_time = _stim.loc[_stim['SlideEvent']=='StartMedia']['Timestamp'].iloc[0]
-
-                for aoi in aois:          
-                    _aoi = _stim.loc[_stim['AOIs gazed at']==aoi]
-                    col = ['Row',
-                           'Timestamp',
-                           'PD',
-                           'SacIndex',
-                           'SacDur',
-                           'FixIndex',
-                           'FixDur',
-                           'Slide',]
-                    _pupil = pd.DataFrame(columns= col)
-                    _pupil['Row'] = _aoi['Row']
-                    _pupil['PD'] = (_aoi['ET_PupilLeft']+_aoi['ET_PupilRight'])/2
-                    _pupil['Timestamp']=_aoi['Timestamp']-_start_time
-                    _pupil['FixIndex']=_aoi['Fixation Index']
-                    _pupil['FixDur']=_aoi['Fixation Duration']
-                    _pupil['Stim']=_aoi['SourceStimuliName']
-
-                    fixations = _pupil['FixIndex'].drop_duplicates().dropna()      
-
-                    for fix in fixations:
-                        _data = _pupil.loc[_pupil['FixIndex']==fix]
-
-                        fc = 60
-                        f = 2
-                        freq = f/(0.5*fc)
-                        y = _data['PD'].to_numpy()
-                        if len(y)>2:
-                            b, a = signal.butter(8, freq ,'lowpass')
-                            yf = signal.filtfilt(b, a, y , padlen=2)
-                        else:
-                            yf = y
-                        x = _data['Timestamp']
-
-                        peaks = signal.find_peaks(y,height=0)
-                        npeaks = len(peaks[1]['peak_heights'])
-
-                        PPS = npeaks/_data['FixDur'].iloc[0]*1000
-
-                        _calc = {'Res':res,
-                                'Stim':stim,
-                                'AOI':aoi,
-                                'Timestamp':_data['Timestamp'].iloc[0],
-                                'Index':_data['FixIndex'].iloc[0],
-                                'Duration':_data['Timestamp'].iloc[-1]-_data['Timestamp'].iloc[0],
-                                'Tonic':round(_data['PD'].mean(),3),
-                                'dPD':round(yf[-1]-yf[0],3),
-                                'Peaks':npeaks,
-                                'ICA':round(PPS,2)}
-                        calc = calc.append(_calc, ignore_index=True)
+            fixations, codes = build_fixation_table(df, res, samples=True)
+
+            #Pupil trace filtered once on its own 60 Hz timebase, metrics reduced per fixation segment
+            pupil = (df['ET_PupilLeft']+df['ET_PupilRight'])/2
+            duration = pd.to_numeric(df['Fixation Duration'], errors='coerce').groupby(codes).first()
+            times = pd.to_numeric(df['Timestamp'], errors='coerce')
+            pupil = pupil_metrics(pupil, codes, n=len(fixations), duration=duration.reindex(range(len(fixations))),
+                                  times=times)
+            pupil = pupil.round({'Tonic':3, 'dPD':3, 'ICA':2})
+
+            fixations[['Tonic','dPD','Peaks','ICA']] = pupil
+            calc.append(fixations[col])
             print(f">> Completed Collection: {res} ")
         except Exception as z:
                 get_key(z)  
+    calc = pd.concat(calc, ignore_index=True) if calc else pd.DataFrame(columns = col)
     
     calc.to_excel(f'{out_path}eye_metrics_raw.xlsx', index = False)
 
-    calc = calc.loc[(calc['Duration']>=150) & (calc['Duration']<=900)]
-    
-    calcs = pd.DataFrame()
-
-    resps = calc['Res'].drop_duplicates()
-    
-    #Calculating metrics from raw (FFD and TFD)
-    for res in resps:                
-        _res = calc.loc[calc['Res']==res]
-        stims = _res['Stim'].drop_duplicates()
-
-        for stim in stims:
-            _stim = _res[_res['Stim']== stim].sort_values('Timestamp')
-            aois = _stim['AOI'].dropna().drop_duplicates()
-
-            for aoi in aois:
-                _aoi = _stim.loc[_stim['AOI']==aoi].sort_values('Timestamp')
-                _calcs = {'Res':res,
-                        'Stim':stim,
-                        'AOI':f"{stim}_{aoi}",
-                        'Timestamp':_aoi['Timestamp'].iloc[0],
-                        'Index':_aoi['Index'].iloc[0],
-                        'TFD':_aoi['Duration'].sum(),
-                        'FFD':_aoi['Duration'].iloc[0],
-                        'Tonic':_aoi['Tonic'].iloc[0],
-                        'dPD':_aoi['dPD'].iloc[0],
-                        'Peaks':_aoi['Peaks'].iloc[0],
-                        'ICA':_aoi['ICA'].iloc[0]}
-
-                calcs = calcs.append(_calcs, ignore_index=True)
+    #Calculating metrics from raw (FFD and TFD), fixations between 150ms and 900ms
+    calcs = gaze_metrics(calc, min_duration=150, max_duration=900, first=['Tonic','dPD','Peaks','ICA'])
+    calcs = calcs.rename(columns={'TTFF':'Timestamp'})
+    calcs['AOI'] = calcs['Stim'].astype(str) + '_' + calcs['AOI'].astype(str)
+    calcs = calcs[['Res','Stim','AOI','Timestamp','Index','TFD','FFD','Tonic','dPD','Peaks','ICA']]
 
     calcs.to_excel(f'{out_path}eye_metrics_final.xlsx', index = False)
     
     #Calculates averages per AOI
     data = calcs
-    data = data.groupby(['AOI']).mean()
+    data = data.groupby(['AOI']).mean(numeric_only=True)
     data['Stim'] = [list(calcs[calcs['AOI']==AOI]['Stim'])[0] for AOI in data.index]
     data['AOI'] = [AOI for AOI in data.index]
     data.to_excel(f'{out_path}RESULT_eye_metrics_AOI_performance.xlsx', index = True)
 
-    #Add code here to exclude certain AOIs from percentiles
-    #exclude = ['Partner','CallToAction','Logo','Partner','KeyVisual']
+    #AOIs left out of the percentiles, e.g. exclude = ['Partner','CallToAction','Logo','KeyVisual']
+    if exclude:
+        data = data.loc[~data['AOI'].str.contains('|'.join(exclude))]
 
     #Calculate percentiles acroos entire dataset (for AOIS)
-    data = data.loc[~data['AOI'].str.contains('|'.join(exclude))]
 
     #Count how many particpants looked at each AOI
     #Exclu
@@ -1431,11 +1309,77 @@ def eye_metrics_saliency_og(in_folder, out_folder, results_folder, header_row =
     data2.to_excel(f'{out_path}RESULT_saliency_AOI_percentiles.xlsx', index = True)
 
     data2['Stim'] = [list(calcs[calcs['AOI']==AOI]['Stim'])[0] for AOI in data.index]
-    data2 = data2.groupby(['Stim']).mean()
+    data2 = data2.groupby(['Stim']).mean(numeric_only=True)
 
     data2.to_excel(f'{out_path}RESULT_saliency_stims_percentiles.xlsx', index = True)
 
 
+def gaze_heatmaps(in_folder, out_folder, results_folder, header_row = 0, size = (1920, 1080), cell = 10, sigma = 30,
+                  x_col = 'Gaze X', y_col = 'Gaze Y', backgrounds = None):
+    """
+    Accumulates gaze from every respondent file into one heatmap per stimulus.
+
+    Files are streamed in chunks into fixed size grids, so memory does not grow
+    with the number of respondents. Each stimulus is saved as a smoothed .npy
+    grid and rendered with plot.gaze_heatmap.
+
+    Parameters:
+    - size: Screen (width, height) in pixels
+    - cell: Grid cell size in pixels
+    - sigma: Gaussian smoothing width in pixels
+    - x_col, y_col: Gaze coordinate columns
+    - backgrounds: Optional dictionary of stimulus name to stimulus image path
+    """
+    header("> Running: Accumulating Gaze Heatmaps")
+    in_path = f"{in_folder}"
+    out_path = f"{results_folder}heatmaps/"
+    os.makedirs(out_path, exist_ok=True)
+    backgrounds = backgrounds or {}
+
+    heatmaps = GazeHeatmap(size, cell=cell)
+    for f in get_files(in_path):
+        try:
+            heatmaps.ingest_csv(f"{in_path}{f}", respondent=f[:11], x_col=x_col, y_col=y_col, header=header_row)
+            print(f">> Completed Collection: {f} ")
+        except Exception as z:
+            get_key(z)
+
+    for stim in heatmaps.stimuli():
+        grid = heatmaps.result(stim, sigma=sigma)
+        name = str(stim).replace('/', '_')
+        np.save(f"{out_path}heatmap_{name}.npy", grid)
+        gaze_heatmap(out_path, grid, background=backgrounds.get(stim), size=size,
+                     title=f"{name} (n={len(heatmaps.respondents[stim])})")
+
+
+
+def eeg_time_clusters(results_folder, data = "Frontal Asymmetry Alpha", stat = 'positive', pairs = None,
+                      n_permutations = 10000, cluster_alpha = 0.05, alpha = 0.05, seed = 0):
+    """
+    Finds the time windows where ads differ on an EEG metric with cluster permutation tests.
+
+    Reads ALL_<data>.csv written by alpha, engagement or workload, builds one
+    respondent x time-bin curve per ad and compares the ads pairwise. The
+    clusters are saved to time_clusters_<data>.csv.
+
+    Parameters:
+    - data: Metric column, e.g. 'Frontal Asymmetry Alpha', 'High Engagement' or 'Workload Average'
+    - stat: Per bin value, 'positive' (alpha proportion), 'mean' (engagement) or 'optimal' (workload proportion)
+    - pairs: (A, B) ads to compare, defaults to every pair
+    - n_permutations, cluster_alpha, alpha, seed: See cluster_permutation.cluster_permutation_test
+
+    Returns:
+    - pd.DataFrame: Clusters of every comparison, 'Start' and 'Stop' are 'Corrected_Time' bins
+    """
+    header(f"> Running: Time Cluster Tests for {data}")
+    all_data = pd.read_csv(f"{results_folder}ALL_{data}.csv")
+    curves = respondent_curves(all_data, data, stat=stat)
+    clusters = compare_curves(curves, pairs, n_permutations=n_permutations, cluster_alpha=cluster_alpha,
+                              alpha=alpha, seed=seed)
+    clusters.to_csv(f"{results_folder}time_clusters_{data}.csv", index=False)
+    print(f"> Completed: {int(clusters['Significant'].sum()) if len(clusters) else 0} significant windows")
+    return clusters
+
 def get_scene_times(in_folder, out_folder, results_folder): 
     
     #todo: 
@@ -14,6 +14,8 @@ from scipy.stats import norm
 from matplotlib.animation import FuncAnimation as fa
 import pprint as pp
 from . import plot
+from .aoi import aoi_matrix, aoi_means
+from .effect_sizes import effect_sizes, magnitude
 from scipy.stats import ttest_ind
 from collections import OrderedDict 
 import plotly.express as px
@@ -60,61 +62,18 @@ def flatten_list(nested_list):
 
 
 def get_effect(d1,d2):
-        cD, hG = get_effect_size(d1, d2)
-
-        try:
-            if cD <0:
-                cD_Pol = 'Decrease'
-            else:
-                cD_Pol = 'Increase'
-
-            if hG <0:
-                hG_Pol = 'Decrease'
-            else:
-                hG_Pol = 'Increase'
-
-            cD = np.abs(cD)
-            hG = np.abs(hG)
-
-
-            if cD<0.2:
-                cDE = 'Negligible'
-            if cD>=0.2 and cD<0.5:
-                cDE= 'Small-to-Medium'
-            if cD>=0.5 and cD<0.8:
-                cDE= 'Medium-to-Large'
-            if cD>=0.8:
-                cDE= 'Large'
-
-            if hG<0.2:
-                hGE = 'Negligible'
-            if hG>=0.2 and hG<0.5:
-                hGE= 'Small-to-Medium'
-            if hG>=0.5 and hG<0.8:
-                hGE= 'Medium-to-Large'
-            if hG>=0.8:
-                hGE= 'Large'
-            return f"{cDE} {cD_Pol}", f"{hGE} {hG_Pol}"
-        except:
-            return np.nan, np.nan
-
+    """Magnitude and direction labels of Cohen's d and Hedges' g for d1 relative to d2, e.g. 'Large Increase'"""
+    cD, hG = get_effect_size(d1, d2)
+    cDE, hGE = magnitude([cD, hG])
+    return cDE, hGE
 
 
 def get_effect_size(d1, d2):
-    # calculate the size of samples
+    """Cohen's d and Hedges' g of d1 relative to d2, see effect_sizes.effect_sizes for many pairs at once"""
     try:
-        n1, n2 = len(d1), len(d2)
-        # calculate the variance of the samples
-        s1, s2 = np.var(d1, ddof=1), np.var(d2, ddof=1)
-        # calculate the pooled standard deviation
-        s = np.sqrt(((n1 - 1) * s1 + (n2 - 1) * s2) / (n1 + n2 - 2))
-        # calculate the means of the samples
-        u1, u2 = np.mean(d1), np.mean(d2)
-        # calculate the effect size
-        cohensD = (u1 - u2) / s
-        hedgesG = cohensD*(1-3/(4*(n1+n2)-9))
-        return cohensD, hedgesG
-    except:
+        result = effect_sizes(np.asarray(d1, dtype=float), np.asarray(d2, dtype=float)).iloc[0]
+        return result['Cohen d'], result['Hedges g']
+    except (TypeError, ValueError):
         return np.nan, np.nan
 
 
@@ -525,36 +484,18 @@ def batch_AOI_engagement(in_folder, out_folder, results_folder):
             pprint.pprint(len(all_data))
             all_data.to_csv(results_folder+dir+'_engagement.csv')
             
-            AOIs = all_data[AOI].drop_duplicates()
-            AOIs = AOIs.dropna()
-
-            #Calculate proportions
-            for aoi in AOIs:
-                try:
-                    _data = all_data.loc[all_data[AOI].str.contains(aoi)]
-                    _data = _data.dropna()
-
-                    _data = _data[data]
-                    _mean = _data.mean()
-
-                    _disengaged = sum(1 for item in _data if item < 0.4)
-                    _low = sum(1 for item in _data if item > 0.4 and item < 0.7)
-                    _high = sum(1 for item in _data if item > 0.7)
-
-                    _count = len(_data)
-                    if _count>0:
-                        _disengaged = _disengaged/_count*100
-                        _low = _low/_count*100
-                        _high = _high/_count*100
-                    else: 
-                        _count = 0
-                        _disengaged = 0
-                        _low = 0
-                        _high = 0
-
-                    calc = calc.append({'Ad':dir, 'AOI':aoi, 'Eng Mean':_mean, 'Eng Disengaged Prop': _disengaged, 'Eng Low Prop':_low, 'Eng High Prop' :_high , 'Eng Count':_count}, ignore_index = True)
-                except OSError or ValueError or ZeroDivisionError as error:
-                    print(f">##### Error joining outfile file: {error} #####")
+            #Calculate proportions for every AOI with one sparse product
+            _data = all_data.dropna(subset=[data, AOI])
+            _values = pd.to_numeric(_data[data], errors='coerce').to_numpy(dtype=float)
+            _bands = np.column_stack([_values, _values < 0.4, (_values > 0.4) & (_values < 0.7), _values > 0.7])
+            #Missing values are in no band, so they do not dilute the proportions
+            _bands[np.isnan(_values), 1:] = np.nan
+            _hits, _aois = aoi_matrix(_data[AOI])
+            _means, _counts = aoi_means(_hits, _bands)
+            calc = pd.concat([calc, pd.DataFrame({'Ad':dir, 'AOI':_aois, 'Eng Mean':_means[:,0],
+                                                  'Eng Disengaged Prop':_means[:,1]*100, 'Eng Low Prop':_means[:,2]*100,
+                                                  'Eng High Prop':_means[:,3]*100, 'Eng Count':_counts[:,0]})],
+                             ignore_index = True)
                     
             print(f"> Got Scenes: {file}")
     
@@ -615,28 +556,17 @@ def batch_AOI_alpha(in_folder, out_folder, results_folder):
             pprint.pprint(len(all_data))
             all_data.to_csv(results_folder+dir+'_engagement.csv')
             
-            AOIs = all_data[AOI].drop_duplicates()
-            AOIs = AOIs.dropna()
-
-            #Calculate proportions
-            for aoi in AOIs:
-                try:
-                    _data = all_data.loc[all_data[AOI].str.contains(aoi)]
-                    _data = _data.dropna()
-
-                    _data = _data[data]
-
-                    _mean = _data.mean()
-                    _pos = sum(1 for item in _data if item>0)
-                    _count = len(_data)
-                    if _count>0:
-                        _prop = _pos/_count*100
-                    else: 
-                        _count = 0
-                        _prop = 0
-                    calc = calc.append({'Ad':dir, 'AOI':aoi, 'Alpha Mean':_mean, 'Alpha Prop':_prop, 'Alpha Count':_count}, ignore_index = True)
-                except OSError or ValueError or ZeroDivisionError as error:
-                    print(f">##### Error joining outfile file: {error} #####")
+            #Calculate proportions for every AOI with one sparse product
+            _data = all_data.dropna(subset=[data, AOI])
+            _values = pd.to_numeric(_data[data], errors='coerce').to_numpy(dtype=float)
+            _bands = np.column_stack([_values, _values > 0])
+            #Missing values are in no band, so they do not dilute the proportions
+            _bands[np.isnan(_values), 1:] = np.nan
+            _hits, _aois = aoi_matrix(_data[AOI])
+            _means, _counts = aoi_means(_hits, _bands)
+            calc = pd.concat([calc, pd.DataFrame({'Ad':dir, 'AOI':_aois, 'Alpha Mean':_means[:,0],
+                                                  'Alpha Prop':_means[:,1]*100, 'Alpha Count':_counts[:,0]})],
+                             ignore_index = True)
                     
             print(f"> Got Scenes: {file}")
     
@@ -697,37 +627,18 @@ def batch_AOI_workload(in_folder, out_folder, results_folder):
             pprint.pprint(len(all_data))
             all_data.to_csv(results_folder+dir+'_workload.csv')
             
-            AOIs = all_data[AOI].drop_duplicates()
-            AOIs = AOIs.dropna()
-
-            #Calculate proportions
-            for aoi in AOIs:
-                try:
-                    val = all_data[AOI].str.contains(aoi)
-                    _data = all_data.loc[all_data[AOI].str.contains(aoi)]
-                    _data = _data.dropna()
-
-                    _data = _data[data]
-                    _mean = _data.mean()
-
-                    _low = sum(1 for item in _data if item < 0.4)
-                    _optimal = sum(1 for item in _data if item > 0.4 and item < 0.6)
-                    _overworked = sum(1 for item in _data if item > 0.6)
-
-                    _count = len(_data)
-                    if _count>0:
-                        _low = _low/_count*100
-                        _optimal = _optimal/_count*100
-                        _overworked = _overworked/_count*100
-                    else: 
-                        _count = 0
-                        _low = 0
-                        _optimal = 0
-                        _overworked = 0
-
-                    calc = calc.append({'Ad':dir, 'AOI':aoi, 'WL Mean':_mean, 'WL Low Prop': _low, 'WL Optimal Prop':_optimal, 'WL Overworked Prop':_overworked, 'WL Count':_count}, ignore_index = True)
-                except OSError or ValueError or ZeroDivisionError as error:
-                    print(f">##### Error joining outfile file: {error} #####")
+            #Calculate proportions for every AOI with one sparse product
+            _data = all_data.dropna(subset=[data, AOI])
+            _values = pd.to_numeric(_data[data], errors='coerce').to_numpy(dtype=float)
+            _bands = np.column_stack([_values, _values < 0.4, (_values > 0.4) & (_values < 0.6), _values > 0.6])
+            #Missing values are in no band, so they do not dilute the proportions
+            _bands[np.isnan(_values), 1:] = np.nan
+            _hits, _aois = aoi_matrix(_data[AOI])
+            _means, _counts = aoi_means(_hits, _bands)
+            calc = pd.concat([calc, pd.DataFrame({'Ad':dir, 'AOI':_aois, 'WL Mean':_means[:,0],
+                                                  'WL Low Prop':_means[:,1]*100, 'WL Optimal Prop':_means[:,2]*100,
+                                                  'WL Overworked Prop':_means[:,3]*100, 'WL Count':_counts[:,0]})],
+                             ignore_index = True)
                     
             print(f"> Got Scenes: {file}")
     
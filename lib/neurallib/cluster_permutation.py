@@ -0,0 +1,241 @@
+"""
+Cluster-based permutation tests on respondent x time-bin curves.
+
+batch.alpha, engagement and workload bin every respondent's EEG metric into
+time bins (ALL_<metric>.csv). To find where two ads, or two groups, differ in
+time, a pointwise t statistic is computed for every bin, neighbouring bins
+above the threshold are joined into clusters and each cluster's summed t (its
+mass) is compared with the largest cluster mass under permuted labels. Group
+sums and sums of squares for a whole block of permutations are matrix products
+of a label (or sign flip) matrix with the data, and clusters are labelled as
+runs over the flattened block, so 10,000 permutations take a few matrix
+multiplications per block.
+"""
+
+import itertools
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Per sample transforms whose bin mean gives the curve value
+CURVE_STATS = {
+    'mean': lambda v: v,
+    'positive': lambda v: (v > 0) * 100.0,
+    'optimal': lambda v: ((v > 0.4) & (v < 0.6)) * 100.0,
+}
+
+
+def respondent_curves(df: pd.DataFrame, value_col: str, *, stat='mean', ad_col: str = 'Ad',
+                      respondent_col: str = 'Respondant', bin_col: str = 'Corrected_Time') -> dict:
+    """
+    Builds one respondent x time-bin matrix per ad from binned samples.
+
+    Parameters:
+    - df: Samples with ad, respondent, bin and value columns, e.g. ALL_<metric>.csv from batch.alpha
+    - value_col: Metric column, e.g. 'Frontal Asymmetry Alpha'
+    - stat: Per bin reduction, 'mean', 'positive' (% above 0, as the alpha proportion), 'optimal'
+      (% between 0.4 and 0.6, as the workload proportion) or a callable on a Series
+    - ad_col, respondent_col, bin_col: Source columns
+
+    Returns:
+    - dict: Ad name to a DataFrame indexed by respondent with one column per bin, NaN where a
+      respondent has no samples
+
+    Raises:
+    - KeyError: If a column cannot be found in df
+    """
+    missing = [c for c in [ad_col, respondent_col, bin_col, value_col] if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+    values = pd.to_numeric(df[value_col], errors='coerce')
+    keys = [df[ad_col], df[respondent_col], df[bin_col]]
+    if isinstance(stat, str):
+        binned = CURVE_STATS[stat](values).where(values.notna()).groupby(keys).mean()
+    else:
+        binned = values.groupby(keys).agg(stat)
+    return {ad: frame.droplevel(0).unstack(bin_col) for ad, frame in binned.groupby(level=0, sort=False)}
+
+
+def _moments(weights: np.ndarray, filled: np.ndarray, squares: np.ndarray, valid: np.ndarray):
+    """
+    Count, sum and sum of squares per bin for every row of a weight matrix.
+    """
+    return weights @ valid, weights @ filled, weights @ squares
+
+
+def _independent_t(first: np.ndarray, filled: np.ndarray, squares: np.ndarray, valid: np.ndarray,
+                   totals: tuple) -> np.ndarray:
+    """
+    Pooled two-sample t of every bin, for every row of a 0/1 first-group membership matrix.
+    """
+    n1, s1, q1 = _moments(first, filled, squares, valid)
+    n, s, q = totals
+    n2, s2, q2 = n - n1, s - s1, q - q1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m1, m2 = s1 / n1, s2 / n2
+        pooled = (q1 - s1 * m1 + q2 - s2 * m2) / (n - 2)
+        return (m1 - m2) / np.sqrt(pooled * (1 / n1 + 1 / n2))
+
+
+def _one_sample_t(signs: np.ndarray, filled: np.ndarray, squares: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    One-sample t against 0 of every bin, for every row of a +1/-1 sign flip matrix.
+
+    Flipping signs leaves the sum of squares unchanged, so only the sums are permuted.
+    """
+    n = valid.sum(axis=0)
+    sums = signs @ filled
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / n
+        var = (squares.sum(axis=0) - sums * mean) / (n - 1)
+        return mean / np.sqrt(var / n)
+
+
+def _runs(t: np.ndarray, threshold: np.ndarray, tail: int):
+    """
+    Labels supra-threshold runs of equal sign along the last axis of every row.
+
+    Returns:
+    - tuple: (row, start, stop, mass) of every cluster, stop exclusive
+    """
+    t = np.atleast_2d(t)
+    above = np.nan_to_num(np.abs(t)) > threshold
+    sign = np.where(above, np.sign(t), 0).astype(np.int8)
+    if tail > 0:
+        sign[sign < 0] = 0
+    elif tail < 0:
+        sign[sign > 0] = 0
+
+    rows, width = sign.shape
+    flat = sign.ravel()
+    start = np.ones(flat.size, dtype=bool)
+    start[1:] = flat[1:] != flat[:-1]
+    start[::width] = True
+    run = np.cumsum(start) - 1
+    mass = np.bincount(run, weights=np.where(flat != 0, np.nan_to_num(t).ravel(), 0.0))
+    first = np.flatnonzero(start)
+    keep = flat[first] != 0
+    stop = np.r_[first[1:], flat.size]
+    return first[keep] // width, first[keep] % width, (stop[keep] - 1) % width + 1, mass[keep]
+
+
+def _max_mass(t: np.ndarray, threshold: np.ndarray, tail: int) -> np.ndarray:
+    """
+    Largest absolute cluster mass of every row, 0 for rows without clusters.
+    """
+    row, _, _, mass = _runs(t, threshold, tail)
+    result = np.zeros(len(t))
+    np.maximum.at(result, row, np.abs(mass))
+    return result
+
+
+def cluster_permutation_test(a, b=None, *, paired: bool = False, n_permutations: int = 10000,
+                             threshold=None, cluster_alpha: float = 0.05, alpha: float = 0.05, tail: int = 0,
+                             seed=None, block: int = 1000, times=None) -> pd.DataFrame:
+    """
+    Cluster-based permutation test between two sets of curves, or of one set against 0.
+
+    Parameters:
+    - a: (n_respondents, n_bins) curves, e.g. from respondent_curves; NaN for missing bins
+    - b: Curves of the second ad or group. None tests a against 0. With paired=True, rows of a and b
+      belong to the same respondents and a - b is tested against 0.
+    - paired: Compare matched rows by sign flipping their differences instead of permuting labels
+    - n_permutations: Number of random permutations (or sign flips)
+    - threshold: Pointwise |t| forming clusters; defaults to the two-sided t critical value at
+      cluster_alpha (one-sided when tail is set) for every bin's degrees of freedom
+    - alpha: Cluster p-value below which a window is significant
+    - tail: 0 for both directions, 1 for a > b only, -1 for a < b only
+    - seed: Seed or np.random.Generator
+    - block: Permutations evaluated per matrix product
+    - times: Optional time of every bin (e.g. the bin columns), used for 'Start' and 'Stop'
+
+    Returns:
+    - pd.DataFrame: One row per observed cluster with 'Start' and 'Stop' (times of its first and last
+      bins), 'Start Bin', 'Stop Bin', 'Mass' (summed t), 'p-val' and 'Significant', ordered by time
+
+    Raises:
+    - ValueError: If the curves have different numbers of bins, or paired curves different respondents
+    """
+    columns = a.columns if isinstance(a, pd.DataFrame) else None
+    a = np.asarray(a, dtype=float)
+    rng = np.random.default_rng(seed)
+    if b is not None:
+        b = np.asarray(b, dtype=float)
+        if b.shape[1] != a.shape[1]:
+            raise ValueError(f"Curves have {a.shape[1]} and {b.shape[1]} bins")
+        if paired:
+            if b.shape[0] != a.shape[0]:
+                raise ValueError("Paired curves need the same respondents in a and b")
+            a, b = a - b, None
+    times = np.asarray(times if times is not None else (columns if columns is not None else np.arange(a.shape[1])))
+
+    if b is None:
+        data = a
+        valid = ~np.isnan(data)
+        filled = np.where(valid, data, 0.0)
+        squares = filled ** 2
+        observed = _one_sample_t(np.ones((1, len(data))), filled, squares, valid)[0]
+        dof = valid.sum(axis=0) - 1
+    else:
+        data = np.vstack([a, b])
+        valid = (~np.isnan(data)).astype(float)
+        filled = np.where(valid > 0, data, 0.0)
+        squares = filled ** 2
+        totals = (valid.sum(axis=0), filled.sum(axis=0), squares.sum(axis=0))
+        membership = np.zeros((1, len(data)))
+        membership[0, :len(a)] = 1
+        observed = _independent_t(membership, filled, squares, valid, totals)[0]
+        dof = valid.sum(axis=0) - 2
+
+    if threshold is None:
+        level = 1 - cluster_alpha / (1 if tail else 2)
+        with np.errstate(invalid='ignore'):
+            threshold = np.where(dof > 0, stats.t.ppf(level, np.maximum(dof, 1)), np.inf)
+    threshold = np.broadcast_to(np.asarray(threshold, dtype=float), observed.shape)
+
+    # Null distribution of the largest cluster mass
+    null = np.empty(n_permutations)
+    for start in range(0, n_permutations, block):
+        size = min(block, n_permutations - start)
+        if b is None:
+            signs = rng.choice(np.array([-1.0, 1.0]), size=(size, len(data)))
+            t = _one_sample_t(signs, filled, squares, valid)
+        else:
+            order = rng.permuted(np.broadcast_to(np.arange(len(data)), (size, len(data))), axis=1)
+            membership = (order < len(a)).astype(float)
+            t = _independent_t(membership, filled, squares, valid, totals)
+        null[start:start + size] = _max_mass(t, threshold, tail)
+
+    _, first, stop, mass = _runs(observed, threshold, tail)
+    p = (np.sum(null[None, :] >= np.abs(mass)[:, None] - 1e-12, axis=1) + 1) / (n_permutations + 1)
+    return pd.DataFrame({'Start': times[first], 'Stop': times[stop - 1], 'Start Bin': first, 'Stop Bin': stop - 1,
+                         'Mass': mass, 'p-val': p, 'Significant': p < alpha})
+
+
+def compare_curves(curves: dict, pairs=None, **kwargs) -> pd.DataFrame:
+    """
+    Cluster permutation tests between many ads (or groups).
+
+    Parameters:
+    - curves: Name to respondent x bin curves, as returned by respondent_curves; bins are aligned
+      on the columns and missing bins are NaN
+    - pairs: (A, B) names to compare, defaults to every pair
+    - kwargs: Passed to cluster_permutation_test
+
+    Returns:
+    - pd.DataFrame: The clusters of every comparison with 'A' and 'B' columns
+    """
+    frames = {k: v if isinstance(v, pd.DataFrame) else pd.DataFrame(np.asarray(v, dtype=float))
+              for k, v in curves.items()}
+    bins = sorted(set().union(*(f.columns for f in frames.values())))
+    pairs = list(itertools.combinations(frames, 2)) if pairs is None else list(pairs)
+    rng = np.random.default_rng(kwargs.pop('seed', None))
+
+    results = []
+    for first, second in pairs:
+        clusters = cluster_permutation_test(frames[first].reindex(columns=bins),
+                                            frames[second].reindex(columns=bins), seed=rng, **kwargs)
+        clusters.insert(0, 'B', second)
+        clusters.insert(0, 'A', first)
+        results.append(clusters)
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
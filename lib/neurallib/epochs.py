@@ -0,0 +1,267 @@
+"""
+Stimulus-locked epochs of continuous sensor data.
+
+Signals are cut relative to each stimulus onset (the 'StartMedia' SlideEvent)
+into a dense (respondent x time x channel) array per stimulus, with NaN where a
+respondent has no sample in a time bin. Epochs can be stored as .npy files and
+reopened memory-mapped, so grand averages, scene windows and bootstrap
+statistics become array reductions instead of repeated DataFrame filtering.
+"""
+
+import os
+import re
+import glob
+import json
+import numpy as np
+import pandas as pd
+
+
+def get_events(df: pd.DataFrame, *, respondent_col: str = 'Respondent', stimulus_col: str = 'SourceStimuliName',
+               time_col: str = 'Timestamp', duration_col: str = 'Duration') -> pd.DataFrame:
+    """
+    Builds the stimulus onset table from iMotions data.
+
+    Parameters:
+    - df: Sensor data holding respondent_col, stimulus_col, time_col and 'SlideEvent'
+    - respondent_col, stimulus_col, time_col: Key and time columns
+    - duration_col: Column holding the stimulus duration, if exported
+
+    Returns:
+    - pd.DataFrame: One row per respondent and stimulus with 'Start' and 'Duration' columns
+
+    Raises:
+    - KeyError: If a required column cannot be found in df
+    """
+    missing = [c for c in [respondent_col, stimulus_col, time_col, 'SlideEvent'] if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    keys = [respondent_col, stimulus_col]
+    starts = df.loc[df['SlideEvent'] == 'StartMedia', keys + [time_col]]
+    events = starts.groupby(keys, sort=False)[time_col].first().rename('Start').reset_index()
+    events['Start'] = pd.to_numeric(events['Start'], errors='coerce')
+    if duration_col in df.columns:
+        durations = df.dropna(subset=[duration_col]).groupby(keys, sort=False)[duration_col].first()
+        events = events.merge(durations.rename('Duration').reset_index(), on=keys, how='left')
+        events['Duration'] = pd.to_numeric(events['Duration'], errors='coerce')
+    else:
+        events['Duration'] = np.nan
+    return events
+
+
+class Epochs:
+    """
+    Dense (respondent x time x channel) epochs for one stimulus.
+    """
+
+    def __init__(self, stimulus: str, data: np.ndarray, respondents: list, times: np.ndarray, channels: list):
+        """
+        Initializes a new Epochs.
+
+        :param stimulus: The stimulus the epochs are locked to.
+        :param data: Array of shape (n_respondents, n_times, n_channels), NaN where no sample.
+        :param respondents: Respondent labels for the first axis.
+        :param times: Bin start times relative to stimulus onset (ms) for the second axis.
+        :param channels: Channel names for the third axis.
+        """
+        self.stimulus = stimulus
+        self.data = data
+        self.respondents = list(respondents)
+        self.times = np.asarray(times, dtype=float)
+        self.channels = list(channels)
+
+    @property
+    def mask(self) -> np.ndarray:
+        return ~np.isnan(self.data)
+
+    def channel(self, name: str) -> np.ndarray:
+        """
+        Returns the (n_respondents, n_times) array of one channel.
+        """
+        return self.data[:, :, self.channels.index(name)]
+
+    def window(self, start: float, stop: float) -> 'Epochs':
+        """
+        Returns the epochs restricted to start <= time <= stop (e.g. one scene).
+        """
+        keep = (self.times >= start) & (self.times <= stop)
+        return Epochs(self.stimulus, self.data[:, keep], self.respondents, self.times[keep], self.channels)
+
+    def grand_average(self) -> np.ndarray:
+        """
+        Returns the (n_times, n_channels) mean across respondents, ignoring missing bins.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.nansum(self.data, axis=0) / self.mask.sum(axis=0)
+
+    def bootstrap(self, n_boot: int = 1000, *, ci: float = 95, seed=None):
+        """
+        Bootstraps the grand average by resampling respondents.
+
+        Resamples are drawn as multinomial respondent weights, so each bootstrap
+        mean is one weighted sum over the respondent axis.
+
+        :param n_boot: Number of bootstrap resamples.
+        :param ci: Width of the percentile interval in percent.
+        :param seed: Seed for np.random.default_rng.
+        :return: Tuple (lower, upper), each of shape (n_times, n_channels).
+        """
+        rng = np.random.default_rng(seed)
+        n = len(self.respondents)
+        weights = rng.multinomial(n, np.full(n, 1.0 / n), size=n_boot).astype(float)
+        values = np.nan_to_num(self.data)
+        sums = np.einsum('br,rtc->btc', weights, values)
+        counts = np.einsum('br,rtc->btc', weights, self.mask.astype(float))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        alpha = (100 - ci) / 2
+        return np.nanpercentile(means, alpha, axis=0), np.nanpercentile(means, 100 - alpha, axis=0)
+
+
+def epoch(df: pd.DataFrame, events: pd.DataFrame, channels: list, rate: float, *, pre: float = 0,
+          post: float = None, respondent_col: str = 'Respondent', stimulus_col: str = 'SourceStimuliName',
+          time_col: str = 'Timestamp') -> dict:
+    """
+    Cuts continuous signals into stimulus-locked epochs.
+
+    Samples are taken from each respondent's whole recording, so a pre-stimulus
+    window (pre > 0) reaches back into whatever was shown before the stimulus.
+
+    Parameters:
+    - df: Sensor data holding respondent_col, time_col and channels
+    - events: Onset table as returned by get_events ('Start' and 'Duration' per respondent and stimulus)
+    - channels: Columns to epoch
+    - rate: Epoch rate in Hz; samples are averaged within each bin
+    - pre: Time before onset to include (ms)
+    - post: Time after onset to include (ms), defaults to the longest stimulus Duration.
+      Samples beyond each respondent's own Duration are masked.
+    - respondent_col, stimulus_col, time_col: Key and time columns
+
+    Returns:
+    - dict: Stimulus name to Epochs
+
+    Raises:
+    - KeyError: If a required column cannot be found
+    - ValueError: If post is not given and events has no Duration
+    """
+    missing = [c for c in [respondent_col, time_col] + list(channels) if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    step = 1000.0 / rate
+    n_channels = len(channels)
+
+    # Sort once by respondent then time, so each respondent is one contiguous block
+    resp_codes, resp_labels = pd.factorize(df[respondent_col])
+    times = pd.to_numeric(df[time_col], errors='coerce').to_numpy(dtype=float)
+    values = df[list(channels)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    order = np.lexsort((times, resp_codes))
+    resp_codes, times, values = resp_codes[order], times[order], values[order]
+    bounds = np.searchsorted(resp_codes, np.arange(len(resp_labels) + 1))
+
+    results = {}
+    for stimulus, _events in events.groupby(stimulus_col, sort=False):
+        _events = _events.dropna(subset=['Start'])
+        duration = _events['Duration'].to_numpy(dtype=float) if 'Duration' in _events else np.full(len(_events), np.nan)
+        _post = post if post is not None else np.nanmax(duration) if np.isfinite(duration).any() else None
+        if _post is None:
+            raise ValueError(f"No post window or Duration available for '{stimulus}'")
+        n_times = int(np.ceil((pre + _post) / step))
+        duration = np.where(np.isfinite(duration), duration, _post)
+
+        respondents = _events[respondent_col].tolist()
+        codes = resp_labels.get_indexer(respondents)
+        starts = _events['Start'].to_numpy(dtype=float)
+
+        # Sample range of every epoch, found with one searchsorted per respondent block
+        lo = np.zeros(len(codes), dtype=np.int64)
+        hi = np.zeros(len(codes), dtype=np.int64)
+        for i, (code, start) in enumerate(zip(codes, starts)):
+            if code < 0:
+                continue
+            block = times[bounds[code]:bounds[code + 1]]
+            lo[i] = bounds[code] + np.searchsorted(block, start - pre, side='left')
+            hi[i] = bounds[code] + np.searchsorted(block, start + _post, side='left')
+
+        lengths = hi - lo
+        owner = np.repeat(np.arange(len(codes)), lengths)
+        index = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(lo, lengths)
+        rel = times[index] - starts[owner]
+        bins = np.floor((rel + pre) / step).astype(np.int64)
+        keep = (bins >= 0) & (bins < n_times) & (rel <= duration[owner])
+        owner, bins, _values = owner[keep], bins[keep], values[index[keep]]
+
+        valid = ~np.isnan(_values)
+        flat = ((owner * n_times + bins)[:, None] * n_channels + np.arange(n_channels))[valid]
+        size = len(codes) * n_times * n_channels
+        sums = np.bincount(flat, weights=_values[valid], minlength=size)
+        counts = np.bincount(flat, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data = (sums / counts).reshape(len(codes), n_times, n_channels)
+
+        results[stimulus] = Epochs(stimulus, data, respondents, np.arange(n_times) * step - pre, channels)
+    return results
+
+
+class EpochStore:
+    """
+    On-disk store of Epochs, one .npy array and one .json header per stimulus.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initializes a new EpochStore.
+
+        :param root: Directory holding the stored epochs. Created if missing.
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, stimulus: str) -> str:
+        return os.path.join(self.root, re.sub(r'[^\w\-. ]', '_', str(stimulus)))
+
+    def save(self, epochs: Epochs) -> None:
+        """
+        Saves epochs for one stimulus, overwriting any previous copy and its cached baselines.
+
+        :param epochs: The Epochs to save.
+        """
+        path = self._path(epochs.stimulus)
+        for cached in glob.glob(f"{glob.escape(path)}.baseline_*"):
+            os.remove(cached)
+        array = np.lib.format.open_memmap(f"{path}.npy", mode='w+', dtype=np.float32, shape=epochs.data.shape)
+        array[:] = epochs.data
+        array.flush()
+        del array
+        with open(f"{path}.json", 'w') as file:
+            json.dump({'stimulus': epochs.stimulus,
+                       'respondents': np.asarray(epochs.respondents).tolist(),
+                       'times': epochs.times.tolist(),
+                       'channels': epochs.channels}, file)
+
+    def load(self, stimulus: str, mmap_mode: str = 'r') -> Epochs:
+        """
+        Loads epochs for one stimulus, memory-mapped by default.
+
+        :param stimulus: The stimulus name.
+        :param mmap_mode: Passed to np.load, None reads the array into memory.
+        :return: The stored Epochs.
+        """
+        path = self._path(stimulus)
+        if not os.path.exists(f"{path}.json"):
+            raise FileNotFoundError(f"No epochs stored for '{stimulus}' in {self.root}")
+        with open(f"{path}.json", 'r') as file:
+            info = json.load(file)
+        data = np.load(f"{path}.npy", mmap_mode=mmap_mode)
+        return Epochs(info['stimulus'], data, info['respondents'], info['times'], info['channels'])
+
+    def stimuli(self) -> list:
+        """
+        Lists the stimuli held in the store.
+        """
+        names = []
+        for f in sorted(os.listdir(self.root)):
+            if f.endswith('.json'):
+                with open(os.path.join(self.root, f), 'r') as file:
+                    names.append(json.load(file).get('stimulus'))
+        return [n for n in names if n is not None]
@@ -0,0 +1,445 @@
+"""
+Fixation level tables built from eye tracking samples.
+
+iMotions marks every gaze sample with a 'Fixation Index' and the AOI label in
+'AOIs gazed at'. build_fixation_table collapses those samples into one row per
+fixation with a single grouped reduction, replacing the respondent -> stimulus
+-> AOI -> fixation loops of the saliency and pack navigation functions.
+detect_fixations re-runs fixation detection (I-VT or I-DT) on raw gaze, so
+thresholds can be changed without re-exporting.
+"""
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+FIXATION_COLUMNS = ['Res', 'Stim', 'AOI', 'Timestamp', 'Index', 'Duration', 'End']
+
+
+def build_fixation_table(df: pd.DataFrame, res=None, *, respondent_col: str = None,
+                         stimulus_col: str = 'SourceStimuliName', aoi_col: str = 'AOIs gazed at',
+                         index_col: str = 'Fixation Index', time_col: str = 'Timestamp',
+                         min_time: float = None, samples: bool = False):
+    """
+    Builds one row per fixation from eye tracking samples.
+
+    A fixation is every sample sharing a respondent, stimulus, AOI and fixation
+    index. Its start and end are the times of its first and last sample, relative
+    to the stimulus 'StartMedia' event (or the first sample of the stimulus when
+    that event is missing).
+
+    Parameters:
+    - df: Sensor data holding stimulus_col, aoi_col, index_col, time_col and 'SlideEvent'
+    - res: Respondent label for every row, used when df holds a single respondent
+    - respondent_col: Column holding the respondent, used instead of res
+    - stimulus_col, aoi_col, index_col, time_col: Source columns
+    - min_time: Drop samples earlier than this many ms after stimulus onset
+    - samples: Also return the fixation of every sample
+
+    Returns:
+    - pd.DataFrame: Columns 'Res', 'Stim', 'AOI', 'Timestamp' (start), 'Index', 'Duration' and 'End',
+      one row per fixation in order of appearance
+    - np.ndarray: Only if samples is True. Row of the table each sample of df belongs to, -1 for none
+
+    Raises:
+    - KeyError: If a required column cannot be found in df
+    """
+    required = [stimulus_col, aoi_col, index_col, time_col] + ([respondent_col] if respondent_col else [])
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    res_col = respondent_col or '_res'
+    keys = [res_col, stimulus_col]
+    data = pd.DataFrame({res_col: df[respondent_col] if respondent_col else res,
+                         stimulus_col: df[stimulus_col],
+                         aoi_col: df[aoi_col].replace(to_replace=' ', value=np.nan),
+                         index_col: pd.to_numeric(df[index_col], errors='coerce'),
+                         time_col: pd.to_numeric(df[time_col], errors='coerce')}, index=df.index)
+    data['_pos'] = np.arange(len(data))
+
+    # Stimulus onset per respondent, falling back to the first sample of the stimulus
+    onset = data.groupby(keys, sort=False, dropna=False)[time_col].min()
+    if 'SlideEvent' in df.columns:
+        starts = data.loc[df['SlideEvent'] == 'StartMedia']
+        starts = starts.groupby(keys, sort=False, dropna=False)[time_col].first()
+        onset.update(starts)
+    data[time_col] = data[time_col] - onset.reindex(pd.MultiIndex.from_frame(data[keys])).to_numpy()
+
+    data = data.dropna(subset=[aoi_col, index_col, time_col])
+    if min_time is not None:
+        data = data.loc[data[time_col] >= min_time]
+
+    groups = data.groupby(keys + [aoi_col, index_col], sort=False, dropna=False)
+    table = groups[time_col].agg(['first', 'last']).reset_index()
+    table.columns = ['Res', 'Stim', 'AOI', 'Index', 'Timestamp', 'End']
+    table['Duration'] = table['End'] - table['Timestamp']
+    table = table[FIXATION_COLUMNS]
+    if not samples:
+        return table
+
+    codes = np.full(len(df), -1, dtype=np.int64)
+    codes[data['_pos'].to_numpy()] = groups.ngroup().to_numpy()
+    return table, codes
+
+
+def gaze_metrics(table: pd.DataFrame, *, keys: list = None, min_duration: float = 150, max_duration: float = 900,
+                 inclusive: str = 'both', first: list = None) -> pd.DataFrame:
+    """
+    Computes AOI level gaze metrics from a fixation table.
+
+    Fixations are sorted once by respondent, stimulus and start time. A dwell is a
+    run of consecutive fixations on the same AOI, so a glance elsewhere (of any
+    duration) followed by a return to the AOI counts as a revisit.
+
+    Parameters:
+    - table: Fixation table as returned by build_fixation_table
+    - keys: Grouping columns, defaults to ['Res', 'Stim', 'AOI']. The last key is the AOI.
+    - min_duration, max_duration: Fixation duration limits (ms), None for no limit
+    - inclusive: Which limits are inclusive, as in pd.Series.between ('both', 'neither', 'left', 'right')
+    - first: Further columns taken from the first valid fixation on each AOI
+
+    Returns:
+    - pd.DataFrame: One row per key with categorical key columns and 'TTFF' (start of the first
+      fixation), 'FFD', 'TFD', 'Fixations', 'Dwells', 'Revisits', 'Index' (of the first fixation)
+      and the first columns
+
+    Raises:
+    - KeyError: If a required column cannot be found in table
+    """
+    keys = list(keys or ['Res', 'Stim', 'AOI'])
+    first = list(first or [])
+    missing = [c for c in keys + ['Timestamp', 'Duration', 'Index'] + first if c not in table.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    sequence = keys[:-1]
+    data = table.sort_values(sequence + ['Timestamp'], kind='stable').reset_index(drop=True)
+
+    # A new dwell starts whenever the AOI (or the sequence it belongs to) changes
+    changed = data[keys].ne(data[keys].shift()).any(axis=1).to_numpy()
+    data['_dwell'] = np.cumsum(changed)
+
+    lower = -np.inf if min_duration is None else min_duration
+    upper = np.inf if max_duration is None else max_duration
+    data = data.loc[data['Duration'].between(lower, upper, inclusive=inclusive)]
+
+    for c in keys:
+        data[c] = data[c].astype('category')
+    groups = data.groupby(keys, sort=False, observed=True)
+    metrics = groups.agg(TTFF=('Timestamp', 'first'),
+                         FFD=('Duration', 'first'),
+                         TFD=('Duration', 'sum'),
+                         Fixations=('Duration', 'size'),
+                         Dwells=('_dwell', 'nunique'),
+                         Index=('Index', 'first'),
+                         **{c: (c, 'first') for c in first})
+    metrics['Revisits'] = metrics['Dwells'] - 1
+    metrics = metrics.reset_index()
+    return metrics[keys + ['TTFF', 'FFD', 'TFD', 'Fixations', 'Dwells', 'Revisits', 'Index'] + first]
+
+
+def hit_runs(times, hits, *, start=None, min_time: float = None):
+    """
+    Run-length encodes a block of AOI hit columns.
+
+    Every column is treated as its own sequence of valid (non-NaN) samples, so
+    gaps where a column is missing do not split a run. The whole block is
+    flattened column by column and run boundaries are found with one comparison,
+    instead of a shift/cumsum groupby per column.
+
+    Parameters:
+    - times: 1-D array of sample times, shape (n_samples,)
+    - hits: 2-D array of AOI hits, shape (n_samples, n_columns), NaN where missing
+    - start: Per column time origin, shape (n_columns,). Defaults to the first valid
+      sample of each column. Columns with a NaN start are skipped.
+    - min_time: Drop samples earlier than this (relative to start)
+
+    Returns:
+    - tuple: (column, onset, duration) arrays with one entry per run of hits, ordered by
+      column then time. onset is relative to start, duration is last minus first sample time.
+    """
+    times = np.asarray(times, dtype=float)
+    hits = np.asarray(hits, dtype=float)
+    if hits.ndim == 1:
+        hits = hits[:, None]
+    valid = ~np.isnan(hits) & ~np.isnan(times)[:, None]
+
+    if start is None:
+        first = np.argmax(valid, axis=0)
+        start = np.where(valid.any(axis=0), times[first], np.nan)
+    start = np.asarray(start, dtype=float)
+    rel = times[:, None] - start[None, :]
+    valid &= ~np.isnan(rel)
+    if min_time is not None:
+        valid &= rel >= min_time
+
+    # Column-major walk over the valid cells, so each column is one contiguous block
+    cols, rows = np.nonzero(valid.T)
+    values = hits[rows, cols]
+    t = rel[rows, cols]
+    if not len(cols):
+        return cols, t, t
+
+    boundary = np.empty(len(cols), dtype=bool)
+    boundary[0] = True
+    boundary[1:] = (cols[1:] != cols[:-1]) | (values[1:] != values[:-1])
+    first = np.flatnonzero(boundary)
+    last = np.r_[first[1:], len(cols)] - 1
+
+    hit = values[first] != 0
+    first, last = first[hit], last[hit]
+    return cols[first], t[first], t[last] - t[first]
+
+
+def aoi_hit_metrics(df: pd.DataFrame, columns: list, *, time_col: str = 'Computer timestamp', start=None,
+                    mask=None, min_time: float = 150, min_duration: float = 150, max_duration: float = 900,
+                    inclusive: str = 'neither') -> pd.DataFrame:
+    """
+    Computes TTFF, FFD and TFD for wide Tobii 'AOI hit [...]' columns.
+
+    Parameters:
+    - df: Tobii export holding time_col and the AOI hit columns
+    - columns: AOI hit columns to process
+    - time_col: Column holding sample times
+    - start: Per column time origin (sequence aligned with columns), see hit_runs
+    - mask: Optional boolean row mask, rows outside it are ignored
+    - min_time: Drop samples earlier than this (relative to start)
+    - min_duration, max_duration: Run duration limits (ms), None for no limit
+    - inclusive: Which limits are inclusive, as in pd.Series.between
+
+    Returns:
+    - pd.DataFrame: One row per column with at least one valid run, with 'ID' (the column name),
+      'TTFF', 'FFD', 'TFD' and 'Fixations'
+
+    Raises:
+    - KeyError: If time_col or a column cannot be found in df
+    """
+    columns = list(columns)
+    missing = [c for c in [time_col] + columns if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    hits = df[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float, copy=True)
+    if mask is not None:
+        hits[~np.asarray(mask, dtype=bool)] = np.nan
+    times = pd.to_numeric(df[time_col], errors='coerce').to_numpy(dtype=float)
+    col, onset, duration = hit_runs(times, hits, start=start, min_time=min_time)
+
+    lower = -np.inf if min_duration is None else min_duration
+    upper = np.inf if max_duration is None else max_duration
+    keep = pd.Series(duration).between(lower, upper, inclusive=inclusive).to_numpy()
+    col, onset, duration = col[keep], onset[keep], duration[keep]
+
+    # Runs are ordered by column, so every column is one reduceat segment
+    ids, first = np.unique(col, return_index=True)
+    return pd.DataFrame({'ID': [columns[i] for i in ids],
+                         'TTFF': onset[first],
+                         'FFD': duration[first],
+                         'TFD': np.add.reduceat(duration, first) if len(first) else duration[first],
+                         'Fixations': np.diff(np.r_[first, len(col)])})
+
+
+def _runs(fixating: np.ndarray, times: np.ndarray, min_duration: float) -> np.ndarray:
+    """
+    Numbers runs of fixating samples lasting at least min_duration, -1 elsewhere.
+    """
+    before = np.r_[False, fixating[:-1]]
+    after = np.r_[fixating[1:], False]
+    first = np.flatnonzero(fixating & ~before)
+    last = np.flatnonzero(fixating & ~after)
+    keep = (times[last] - times[first]) >= min_duration
+
+    run = np.cumsum(fixating & ~before) - 1
+    number = np.cumsum(keep) - 1
+    labels = np.full(len(fixating), -1, dtype=np.int64)
+    labels[fixating] = np.where(keep[run[fixating]], number[run[fixating]], -1)
+    return labels
+
+
+def ivt(times, x, y, *, threshold: float = 30, px_per_degree: float = 35, min_duration: float = 60) -> np.ndarray:
+    """
+    Velocity threshold (I-VT) fixation filter.
+
+    Point to point velocity is np.diff of the gaze position over np.diff of time.
+    Samples slower than threshold are fixating, and each run of fixating
+    samples lasting at least min_duration is a fixation.
+
+    Parameters:
+    - times: Sample times (ms), in order
+    - x, y: Gaze position in pixels, NaN for missing
+    - threshold: Velocity threshold (degrees per second)
+    - px_per_degree: Pixels per degree of visual angle
+    - min_duration: Shortest fixation (ms)
+
+    Returns:
+    - np.ndarray: Fixation number of every sample (from 0), -1 for none
+    """
+    times = np.asarray(times, dtype=float)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(times) < 2:
+        return np.full(len(times), -1, dtype=np.int64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        velocity = np.hypot(np.diff(x), np.diff(y)) / np.diff(times) * 1000 / px_per_degree
+    # Each sample takes the velocity from its predecessor, the first from its successor
+    velocity = np.r_[velocity[0], velocity]
+    return _runs(velocity < threshold, times, min_duration)
+
+
+def idt(times, x, y, *, dispersion: float = 1.0, px_per_degree: float = 35, min_duration: float = 100) -> np.ndarray:
+    """
+    Dispersion threshold (I-DT) fixation filter.
+
+    A fixation starts at the first sample whose min_duration window has a
+    dispersion ((max x - min x) + (max y - min y)) within the threshold, and
+    grows until the dispersion is exceeded. Window dispersions for every sample
+    come from sparse-table range min/max queries, so only the greedy walk from
+    one fixation to the next is a Python loop.
+
+    Parameters:
+    - times: Sample times (ms), in order
+    - x, y: Gaze position in pixels, NaN for missing
+    - dispersion: Dispersion threshold (degrees)
+    - px_per_degree: Pixels per degree of visual angle
+    - min_duration: Shortest fixation (ms)
+
+    Returns:
+    - np.ndarray: Fixation number of every sample (from 0), -1 for none
+    """
+    times = np.asarray(times, dtype=float)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(times)
+    labels = np.full(n, -1, dtype=np.int64)
+    limit = dispersion * px_per_degree
+    if n < 2:
+        return labels
+
+    # Window of every start: up to the first sample min_duration later
+    end = np.searchsorted(times, times + min_duration, side='left')
+    inside = np.flatnonzero(end < n)
+    if not len(inside):
+        return labels
+    start, end = inside, end[inside]
+
+    # Sparse tables of range max/min, only as deep as the longest window
+    span = end - start + 1
+    levels = [(x, x, y, y)]
+    while (1 << len(levels)) <= span.max():
+        h = 1 << (len(levels) - 1)
+        mx, nx, my, ny = levels[-1]
+        levels.append((np.maximum(mx[:-h], mx[h:]), np.minimum(nx[:-h], nx[h:]),
+                       np.maximum(my[:-h], my[h:]), np.minimum(ny[:-h], ny[h:])))
+    k = np.floor(np.log2(span)).astype(np.int64)
+    spread = np.empty(len(start))
+    for level in np.unique(k):
+        at = np.flatnonzero(k == level)
+        a, b = start[at], end[at] - (1 << level) + 1
+        mx, nx, my, ny = levels[level]
+        spread[at] = (np.maximum(mx[a], mx[b]) - np.minimum(nx[a], nx[b])
+                      + np.maximum(my[a], my[b]) - np.minimum(ny[a], ny[b]))
+    candidates = start[spread <= limit]
+
+    number = 0
+    position = 0
+    while True:
+        c = np.searchsorted(candidates, position)
+        if c == len(candidates):
+            break
+        first = candidates[c]
+        size = 64
+        while True:
+            xs, ys = x[first:first + size], y[first:first + size]
+            grown = (np.maximum.accumulate(xs) - np.minimum.accumulate(xs)
+                     + np.maximum.accumulate(ys) - np.minimum.accumulate(ys))
+            exceeded = np.flatnonzero(~(grown <= limit))
+            if len(exceeded):
+                last = first + exceeded[0] - 1
+                break
+            if first + size >= n:
+                last = n - 1
+                break
+            size *= 2
+        labels[first:last + 1] = number
+        number += 1
+        position = last + 1
+    return labels
+
+
+FIXATION_FILTERS = {'ivt': ivt, 'idt': idt}
+
+
+def _detect(method: str, times: np.ndarray, x: np.ndarray, y: np.ndarray, params: dict) -> np.ndarray:
+    return FIXATION_FILTERS[method](times, x, y, **params)
+
+
+def detect_fixations(df: pd.DataFrame, res=None, *, method: str = 'ivt', respondent_col: str = None,
+                     stimulus_col: str = 'SourceStimuliName', aoi_col: str = 'AOIs gazed at',
+                     x_col: str = 'Gaze X', y_col: str = 'Gaze Y', time_col: str = 'Timestamp',
+                     index_col: str = 'Fixation Index', workers: int = None, samples: bool = False,
+                     **params):
+    """
+    Detects fixations from raw gaze and builds the fixation table from them.
+
+    Each respondent's samples are filtered in time order, in parallel across
+    respondents when workers is given, and the detected fixation numbers replace
+    index_col before build_fixation_table, so the output matches the table built
+    from iMotions' own 'Fixation Index'. Only rows with a time and gaze position
+    are filtered, so rows of other sensors in an interleaved export are skipped.
+
+    Parameters:
+    - df: Sensor data holding x_col, y_col, time_col and the build_fixation_table columns
+    - res: Respondent label for every row, used when df holds a single respondent
+    - method: 'ivt' or 'idt'
+    - respondent_col: Column holding the respondent, used instead of res
+    - stimulus_col, aoi_col: Passed to build_fixation_table
+    - x_col, y_col, time_col: Gaze position and time columns
+    - index_col: Fixation index column to replace
+    - workers: Number of processes, None to run in this process
+    - samples: Also return the fixation of every sample, see build_fixation_table
+    - params: Filter settings passed to ivt or idt (e.g. threshold=, dispersion=, min_duration=)
+
+    Returns:
+    - pd.DataFrame: Fixation table, see build_fixation_table
+
+    Raises:
+    - KeyError: If a required column cannot be found in df
+    - ValueError: If method is not recognised
+    """
+    if method not in FIXATION_FILTERS:
+        raise ValueError(f"method must be one of {list(FIXATION_FILTERS)}, not {method!r}")
+    required = [x_col, y_col, time_col] + ([respondent_col] if respondent_col else [])
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    times = pd.to_numeric(df[time_col], errors='coerce').to_numpy(dtype=float)
+    x = pd.to_numeric(df[x_col], errors='coerce').to_numpy(dtype=float)
+    y = pd.to_numeric(df[y_col], errors='coerce').to_numpy(dtype=float)
+    owner = df[respondent_col] if respondent_col else pd.Series(0, index=df.index)
+
+    # Positions of every recording's gaze samples, in time order. Rows of other sensors in an
+    # interleaved export have no gaze position and would break the velocity runs and windows.
+    recordings = []
+    gaze = np.isfinite(times) & np.isfinite(x) & np.isfinite(y)
+    for rows in owner.groupby(owner.to_numpy(), sort=False).indices.values():
+        rows = rows[gaze[rows]]
+        recordings.append(rows[np.argsort(times[rows], kind='stable')])
+
+    jobs = [(method, times[r], x[r], y[r], params) for r in recordings]
+    if workers and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            labels = list(pool.map(_detect, *zip(*jobs)))
+    else:
+        labels = [_detect(*job) for job in jobs]
+
+    index = np.full(len(df), np.nan)
+    for rows, found in zip(recordings, labels):
+        index[rows] = np.where(found >= 0, found + 1, np.nan)
+
+    data = df.copy()
+    data[index_col] = index
+    return build_fixation_table(data, res, respondent_col=respondent_col, stimulus_col=stimulus_col,
+                                aoi_col=aoi_col, index_col=index_col, time_col=time_col, samples=samples)
@@ -0,0 +1,219 @@
+"""
+AOI geometry and offline AOI hit testing.
+
+AOIs are rectangles or polygons in screen pixels, defined per stimulus. An
+AOIIndex buckets each AOI's bounding box into a uniform grid, so a gaze sample
+is only tested against the AOIs overlapping its cell. Point-in-polygon tests
+run once per AOI, vectorised over all of its candidate samples, and the result
+is the same multi-hot matrix and ';' joined labels as iMotions' 'AOIs gazed at',
+so AOI definitions can be changed without re-exporting.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _polygon(shape) -> np.ndarray:
+    """
+    Converts an AOI definition into an (n, 2) vertex array.
+
+    A dictionary with 'rect': [x, y, width, height] or 'points': [[x, y], ...],
+    or a bare vertex list. Two vertices are read as opposite rectangle corners.
+    """
+    if isinstance(shape, dict):
+        if 'rect' in shape:
+            x, y, w, h = shape['rect']
+            return np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype=float)
+        shape = shape['points']
+    points = np.asarray(shape, dtype=float)
+    if points.ndim != 2 or points.shape[1] != 2 or len(points) < 2:
+        raise ValueError(f"AOI vertices must have shape (n, 2), not {points.shape}")
+    if len(points) == 2:
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        points = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+    return points
+
+
+class AOIIndex:
+    """
+    Uniform grid index over the AOIs of one stimulus.
+    """
+
+    def __init__(self, shapes: dict, *, cell: float = 64):
+        """
+        Initializes a new AOIIndex.
+
+        :param shapes: Dictionary of AOI name to definition (see load_aois).
+        :param cell: Grid cell size in pixels.
+        """
+        self.aois = list(shapes)
+        self.polygons = [_polygon(shapes[a]) for a in self.aois]
+        self.cell = float(cell)
+
+        bounds = np.array([np.r_[p.min(axis=0), p.max(axis=0)] for p in self.polygons]).reshape(-1, 4)
+        self.bounds = bounds
+        # Axis aligned rectangles are fully decided by the bounding box test
+        self.rectangular = np.array([len(p) == 4 and np.all(np.isin(p[:, 0], b[[0, 2]]))
+                                     and np.all(np.isin(p[:, 1], b[[1, 3]]))
+                                     for p, b in zip(self.polygons, bounds)], dtype=bool)
+
+        self.origin = bounds[:, :2].min(axis=0) if len(bounds) else np.zeros(2)
+        lo = np.floor((bounds[:, :2] - self.origin) / self.cell).astype(np.int64)
+        hi = np.floor((bounds[:, 2:] - self.origin) / self.cell).astype(np.int64)
+        self.grid = (hi.max(axis=0) + 1) if len(bounds) else np.ones(2, dtype=np.int64)
+
+        # CSR style cell -> AOI lookup
+        cells, owners = [], []
+        for i, (a, b) in enumerate(zip(lo, hi)):
+            gx, gy = np.meshgrid(np.arange(a[0], b[0] + 1), np.arange(a[1], b[1] + 1))
+            cells.append((gy * self.grid[0] + gx).ravel())
+            owners.append(np.full(gx.size, i))
+        cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+        owners = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+        order = np.argsort(cells, kind='stable')
+        self._owners = owners[order]
+        self._starts = np.searchsorted(cells[order], np.arange(self.grid[0] * self.grid[1] + 1))
+
+    def matrix(self, x, y):
+        """
+        Hit tests gaze samples against every AOI.
+
+        Parameters:
+        - x, y: Sample coordinates in pixels, NaN for missing
+
+        Returns:
+        - scipy.sparse.csr_matrix: Multi-hot matrix of shape (n_samples, n_aois), as aoi.aoi_matrix
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        gx = np.floor((x - self.origin[0]) / self.cell)
+        gy = np.floor((y - self.origin[1]) / self.cell)
+        inside = (gx >= 0) & (gx < self.grid[0]) & (gy >= 0) & (gy < self.grid[1])
+        samples = np.flatnonzero(inside)
+        cells = (gy[inside] * self.grid[0] + gx[inside]).astype(np.int64)
+
+        # Expand every sample into its candidate (sample, AOI) pairs
+        counts = self._starts[cells + 1] - self._starts[cells]
+        rows = np.repeat(samples, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        aois = self._owners[np.repeat(self._starts[cells], counts) + offsets]
+
+        b = self.bounds[aois]
+        px, py = x[rows], y[rows]
+        hit = (px >= b[:, 0]) & (px <= b[:, 2]) & (py >= b[:, 1]) & (py <= b[:, 3])
+        rows, aois, px, py, hit = rows[hit], aois[hit], px[hit], py[hit], np.ones(hit.sum(), dtype=bool)
+
+        for i in np.flatnonzero(~self.rectangular):
+            at = np.flatnonzero(aois == i)
+            if len(at):
+                hit[at] = _contains(self.polygons[i], px[at], py[at])
+
+        return sparse.csr_matrix((np.ones(hit.sum()), (rows[hit], aois[hit])), shape=(len(x), len(self.aois)))
+
+    def labels(self, x, y, *, sep: str = ';') -> np.ndarray:
+        """
+        Hit tests gaze samples and joins the AOIs of each sample into one label.
+
+        Returns:
+        - np.ndarray: Object array of labels (e.g. 'Logo;Pack'), NaN where no AOI is hit
+        """
+        matrix = self.matrix(x, y)
+        matrix.sort_indices()
+        labels = np.full(matrix.shape[0], np.nan, dtype=object)
+        counts = np.diff(matrix.indptr)
+        rows = np.flatnonzero(counts)
+        if not len(rows):
+            return labels
+
+        # Each distinct AOI combination is joined once, then broadcast to its samples
+        padded = np.full((len(rows), counts.max()), -1, dtype=np.int64)
+        position = np.arange(matrix.nnz) - np.repeat(matrix.indptr[:-1], counts)
+        padded[np.repeat(np.arange(len(rows)), counts[rows]), position] = matrix.indices
+        combos, inverse = np.unique(padded, axis=0, return_inverse=True)
+        names = [sep.join(self.aois[i] for i in combo if i >= 0) for combo in combos]
+        labels[rows] = np.asarray(names, dtype=object)[inverse.ravel()]
+        return labels
+
+
+def _contains(polygon: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Even-odd ray casting, one pass per edge over all points.
+    """
+    inside = np.zeros(len(x), dtype=bool)
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    for ax, ay, bx, by in zip(x0, y0, x1, y1):
+        crosses = (ay > y) != (by > y)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            at = ax + (y - ay) * (bx - ax) / (by - ay)
+        inside ^= crosses & (x < at)
+    return inside
+
+
+def load_aois(path: str, *, cell: float = 64) -> dict:
+    """
+    Loads AOI definitions and builds one AOIIndex per stimulus.
+
+    Parameters:
+    - path: A .json file of {stimulus: {aoi: {'rect': [x, y, width, height]} or {'points': [[x, y], ...]}}},
+      or a .csv with columns 'Stimulus', 'AOI', 'X' and 'Y', one vertex per row in drawing order
+      (two vertices are read as opposite rectangle corners)
+    - cell: Grid cell size in pixels
+
+    Returns:
+    - dict: Stimulus name to AOIIndex
+
+    Raises:
+    - FileNotFoundError: If path does not exist
+    - KeyError: If a CSV column is missing
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No AOI definitions at {path}")
+    if path.lower().endswith('.json'):
+        with open(path, 'r') as file:
+            definitions = json.load(file)
+    else:
+        df = pd.read_csv(path)
+        missing = [c for c in ['Stimulus', 'AOI', 'X', 'Y'] if c not in df.columns]
+        if missing:
+            raise KeyError(f"{missing} columns missing from DataFrame")
+        definitions = {}
+        for (stim, aoi), g in df.groupby(['Stimulus', 'AOI'], sort=False):
+            definitions.setdefault(stim, {})[aoi] = g[['X', 'Y']].to_numpy(dtype=float)
+    return {stim: AOIIndex(shapes, cell=cell) for stim, shapes in definitions.items()}
+
+
+def assign_aois(df: pd.DataFrame, indexes: dict, *, stimulus_col: str = 'SourceStimuliName',
+                x_col: str = 'Gaze X', y_col: str = 'Gaze Y', sep: str = ';') -> pd.Series:
+    """
+    Labels every gaze sample with the AOIs it falls in, per stimulus.
+
+    The result can replace 'AOIs gazed at' before fixations.build_fixation_table,
+    e.g. df['AOIs gazed at'] = assign_aois(df, load_aois('aois.json')).
+
+    Parameters:
+    - df: Gaze samples holding stimulus_col, x_col and y_col
+    - indexes: Stimulus name to AOIIndex, as returned by load_aois
+    - stimulus_col, x_col, y_col: Source columns
+    - sep: Separator between overlapping AOIs
+
+    Returns:
+    - pd.Series: Labels aligned with df, NaN for samples outside every AOI or on stimuli without AOIs
+
+    Raises:
+    - KeyError: If a required column cannot be found in df
+    """
+    missing = [c for c in [stimulus_col, x_col, y_col] if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    x = pd.to_numeric(df[x_col], errors='coerce').to_numpy(dtype=float)
+    y = pd.to_numeric(df[y_col], errors='coerce').to_numpy(dtype=float)
+    labels = np.full(len(df), np.nan, dtype=object)
+    for stim, rows in df.groupby(stimulus_col, sort=False).indices.items():
+        if stim in indexes:
+            labels[rows] = indexes[stim].labels(x[rows], y[rows], sep=sep)
+    return pd.Series(labels, index=df.index, name='AOIs gazed at')
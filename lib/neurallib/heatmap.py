@@ -0,0 +1,161 @@
+"""
+Gaze heatmaps accumulated across respondents.
+
+GazeHeatmap keeps one fixed resolution grid per stimulus and bins gaze points
+into it with a single bincount per chunk, so memory depends on the screen size
+and resolution only, never on the number of respondents or samples. Gaussian
+smoothing is applied once, when a heatmap is read out.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import gaussian_filter
+
+
+class GazeHeatmap:
+    """
+    Streaming 2-D histogram of gaze points per stimulus.
+    """
+
+    def __init__(self, size: tuple = (1920, 1080), *, cell: float = 10):
+        """
+        Initializes a new GazeHeatmap.
+
+        :param size: Screen (width, height) in pixels.
+        :param cell: Grid cell size in pixels.
+        """
+        self.size = (float(size[0]), float(size[1]))
+        self.cell = float(cell)
+        self.shape = (int(np.ceil(self.size[1] / self.cell)), int(np.ceil(self.size[0] / self.cell)))
+        self.grids = {}
+        self.samples = {}
+        self.respondents = {}
+
+    def stimuli(self) -> list:
+        """
+        Lists the stimuli with accumulated gaze.
+        """
+        return list(self.grids)
+
+    def add(self, df: pd.DataFrame, *, respondent=None, stimulus_col: str = 'SourceStimuliName',
+            x_col: str = 'Gaze X', y_col: str = 'Gaze Y', weight_col: str = None) -> int:
+        """
+        Bins a chunk of gaze samples into the grid of every stimulus it holds.
+
+        Parameters:
+        - df: Gaze samples holding stimulus_col, x_col and y_col (screen pixels, origin top left)
+        - respondent: Respondent the chunk belongs to, counted per stimulus
+        - stimulus_col, x_col, y_col: Source columns
+        - weight_col: Optional column weighting each sample (e.g. 'Fixation Duration')
+
+        Returns:
+        - int: Number of samples binned. Samples off screen or with missing values are skipped.
+
+        Raises:
+        - KeyError: If a required column cannot be found in df
+        """
+        required = [stimulus_col, x_col, y_col] + ([weight_col] if weight_col else [])
+        missing = [c for c in required if c not in df.columns]
+        if missing:
+            raise KeyError(f"{missing} columns missing from DataFrame")
+
+        x = pd.to_numeric(df[x_col], errors='coerce').to_numpy(dtype=float)
+        y = pd.to_numeric(df[y_col], errors='coerce').to_numpy(dtype=float)
+        weights = None
+        if weight_col:
+            weights = pd.to_numeric(df[weight_col], errors='coerce').to_numpy(dtype=float)
+        stim, names = pd.factorize(df[stimulus_col])
+
+        valid = (stim >= 0) & (x >= 0) & (x < self.size[0]) & (y >= 0) & (y < self.size[1])
+        if weights is not None:
+            valid &= ~np.isnan(weights)
+        rows, cols = self.shape
+        cell = (y[valid] // self.cell).astype(np.int64) * cols + (x[valid] // self.cell).astype(np.int64)
+        flat = stim[valid] * (rows * cols) + cell
+        counts = np.bincount(flat, weights=None if weights is None else weights[valid],
+                             minlength=len(names) * rows * cols).reshape(len(names), rows, cols)
+        binned = np.bincount(stim[valid], minlength=len(names))
+
+        for i, name in enumerate(names):
+            if binned[i] == 0:
+                continue
+            if name not in self.grids:
+                self.grids[name] = np.zeros(self.shape)
+                self.samples[name] = 0
+                self.respondents[name] = set()
+            self.grids[name] += counts[i]
+            self.samples[name] += int(binned[i])
+            if respondent is not None:
+                self.respondents[name].add(respondent)
+        return int(valid.sum())
+
+    def ingest_csv(self, path: str, *, respondent=None, stimulus_col: str = 'SourceStimuliName',
+                   x_col: str = 'Gaze X', y_col: str = 'Gaze Y', weight_col: str = None,
+                   chunksize: int = 100000, **kwargs) -> int:
+        """
+        Streams a CSV export into the heatmaps, one chunk at a time.
+
+        Parameters:
+        - path: CSV file to read
+        - respondent: Respondent the file belongs to, defaults to path
+        - stimulus_col, x_col, y_col, weight_col: Source columns, see add
+        - chunksize: Rows read per chunk
+        - kwargs: Passed to pd.read_csv (e.g. header=)
+
+        Returns:
+        - int: Number of samples binned
+        """
+        columns = [stimulus_col, x_col, y_col] + ([weight_col] if weight_col else [])
+        total = 0
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize, low_memory=False, **kwargs):
+            total += self.add(chunk, respondent=path if respondent is None else respondent,
+                              stimulus_col=stimulus_col, x_col=x_col, y_col=y_col, weight_col=weight_col)
+        return total
+
+    def merge(self, other: 'GazeHeatmap') -> 'GazeHeatmap':
+        """
+        Adds the grids of another GazeHeatmap with the same size and cell, e.g. from another batch.
+        """
+        if other.shape != self.shape or other.cell != self.cell:
+            raise ValueError("Cannot merge heatmaps with a different size or cell")
+        for name, grid in other.grids.items():
+            if name not in self.grids:
+                self.grids[name] = np.zeros(self.shape)
+                self.samples[name] = 0
+                self.respondents[name] = set()
+            self.grids[name] += grid
+            self.samples[name] += other.samples[name]
+            self.respondents[name] |= other.respondents[name]
+        return self
+
+    def result(self, stimulus, *, sigma: float = 30, normalize: str = 'max') -> np.ndarray:
+        """
+        Returns the smoothed heatmap of a stimulus.
+
+        Parameters:
+        - stimulus: Stimulus name
+        - sigma: Gaussian smoothing width in pixels, 0 or None for none
+        - normalize: 'max' scales to a peak of 1, 'sum' to a total of 1, None leaves raw counts
+
+        Returns:
+        - np.ndarray: Grid of shape (rows, columns), row 0 at the top of the screen
+
+        Raises:
+        - KeyError: If no gaze was accumulated for stimulus
+        - ValueError: If normalize is not recognised
+        """
+        if stimulus not in self.grids:
+            raise KeyError(f"No gaze accumulated for '{stimulus}'")
+        if normalize not in ('max', 'sum', None):
+            raise ValueError(f"normalize must be 'max', 'sum' or None, not {normalize!r}")
+
+        grid = self.grids[stimulus]
+        if sigma:
+            grid = gaussian_filter(grid, sigma / self.cell, mode='constant')
+        else:
+            grid = grid.copy()
+        if normalize == 'max' and grid.max() > 0:
+            grid /= grid.max()
+        elif normalize == 'sum' and grid.sum() > 0:
+            grid /= grid.sum()
+        return grid
@@ -10,7 +10,10 @@ from nltk.stem import WordNetLemmatizer
 import pingouin as pg
 import scikit_posthocs as sp
 from itertools import permutations
-from .stats import get_significance, get_significance_footnote
+import itertools
+from .stats import get_significance_batch, get_significance_footnote
+from .fixations import build_fixation_table, gaze_metrics, FIXATION_COLUMNS
+from .proportions import bootstrap_proportions, error_bars
 import warnings
 
 BAR_COLORS = ['lightgrey',
@@ -201,8 +204,11 @@ class FlashExposure:
     def save_processed_data(self):
         self._data.to_excel(f'{self._out_path}{self._task}_Raw.xlsx', index = False)
 
-    def get_results(self):
+    def get_results(self, group: str = 'Category'):
         '''
+        Proportion of presses choosing each route, per route, per group and overall, with
+        bootstrap intervals, significance tables and plots written to the output directory.
+
         Per C1, R
         Per C1, Per S1, R
         Per C1, Per S2, R
@@ -217,150 +223,169 @@ class FlashExposure:
         Per R, S2
         Per R, S1S2
 
+        :param group: Column of the task or sample key the routes are split by.
         '''
-        
-
-        
-
-
-    results = []
-    significance = pd.DataFrame()
-    
-    for r in routes:
-        stats_routes = {}
-        preference = {}
-        for g in groups:
-            route = data.loc[data['Shown'].str.contains(r)
-                            & (data['Category']==g)]
-
-            route.loc[route['Salient']==r, ['Preferred']] = 1
-            route.loc[route['Salient']!=r, ['Preferred']] = 0
-            stats_routes[g] = np.array(route['Preferred'])
+        if not self._data_processed:
+            self.process_data()
+        if group not in self._data.columns:
+            raise KeyError(f"'{group}' column missing from processed data")
+
+        data = self._data
+        task = self._task
+        out_path = os.path.join(self._out_path, '')
+        routes = data['Route'].drop_duplicates().tolist()
+        groups = data[group].drop_duplicates().tolist()
+        route_colors = dict(zip(routes, itertools.cycle(BAR_COLORS)))
+
+        #Collect the comparisons per route, per group and overall for one batch
+        route_tasks = []
+        route_results = []
+        for r in routes:
+            stats_routes = {}
+            preference = {}
+            for g in groups:
+                route = data.loc[(data['Route']==r) & (data[group]==g)]
+                stats_routes[g] = route['Chosen'].to_numpy()
 
-            ####
-            chosen = route['Preferred'].sum() 
+                ####
+                chosen = route['Chosen'].sum() 
 
-            result = dict()
-            result['Route'] = r
-            result['Proportion'] = chosen/len(route)*100
-            result['Type'] = g
-            result['Cluster'] = g
-            results.append(result)
+                result = dict()
+                result['Route'] = r
+                result['Proportion'] = chosen/len(route)*100
+                result['Count'] = chosen
+                result['n'] = len(route)
+                result['Type'] = g
+                result['Cluster'] = g
+                route_results.append(result)
  
-        significance = pd.concat([significance, get_significance(stats_routes, r, groups)])
-
-    results = pd.DataFrame(results)
-    results.to_excel(f'{out_path}{task}_PerRoute_Results.xlsx', index = False)
-    significance.to_excel(f'{out_path}{task}_PerRoute_Significance.xlsx', index = False)
-    significance = significance.drop_duplicates(subset=['Cluster','Groups'])
+            route_tasks.append((r, stats_routes, groups))
 
-    x_data = results['Route'].sort_values().drop_duplicates().tolist()
-    y_data = dict()
-    i = 0
-
-    for cluster in groups:
-        _data = results.loc[results['Cluster']==cluster].set_index('Route')
-        y_data[cluster] = dict()
-        y_data[cluster]['values'] = _data.loc[x_data]['Proportion'].values
-        y_data[cluster]['label'] = cluster
-        y_data[cluster]['color'] = [route_colors[x] for x in x_data]
-        i += 1
+        # Split Group
+        group_tasks = []
+        group_results = []
+        for g in groups:
+            stats_routes = {}
+            for r in routes:
+                route = data.loc[(data['Route']==r) & (data[group]==g)]
+                stats_routes[r] = route['Chosen'].to_numpy()
+                chosen = route['Chosen'].sum() 
 
-    ### Add footnote for significance
-    sig = significance.loc[(significance['pValue']<=0.055)]
-    footnote,footnoteLines = get_significance_footnote( sig, clusters=True)
-    plot.multi_bar(out_path,
-                x_data,
-                y_data,
-                xlabel = '',
-                ylabel = 'Percentage Chosen (%)',
-                title = f'Implicit Preference and Visual Salience Split By Pack Type',
-                ylim = 100,
-                footnote = footnote,
-                footnoteLines = footnoteLines
-                )
+                result = dict()
+                result['Route'] = r
+                result['Proportion'] = chosen/len(route)*100
+                result['Count'] = chosen
+                result['n'] = len(route)
+                result['Type'] = r
+                result['Cluster'] = g
+                group_results.append(result)
+                
+            group_tasks.append((g, stats_routes, routes))
 
-    # Split Group
-    results = []
-    significance = pd.DataFrame()
-    
-    for g in groups:
+        # Overall
+        overall_results = []
         stats_routes = {}
         for r in routes:
-            route = data.loc[data['Shown'].str.contains(r)
-                            & (data['Category']==g)]
+            route = data.loc[data['Route']==r]
+            stats_routes[r] = route['Chosen'].to_numpy()
 
-            route.loc[route['Salient']==r, ['Preferred']] = 1
-            route.loc[route['Salient']!=r, ['Preferred']] = 0
-            stats_routes[r] = np.array(route['Preferred'])
-            chosen = route['Preferred'].sum() 
+            chosen = route['Chosen'].sum()
 
             result = dict()
             result['Route'] = r
             result['Proportion'] = chosen/len(route)*100
-            result['Type'] = r
-            result['Cluster'] = g
-            results.append(result)
-                
-        significance = pd.concat([significance, get_significance(stats_routes, g, routes)])
-
-    results = pd.DataFrame(results)
-    results.to_excel(f'{out_path}{task}_PerGroup_Results.xlsx', index = False)
-    significance.to_excel(f'{out_path}{task}_PerGroup_Significance.xlsx', index = False)
-    significance = significance.drop_duplicates(subset=['Cluster','Groups'])
-
-    # Overall
-    overall_results = []
-    significance = pd.DataFrame()
-    stats_routes = {}
-    for r in routes:
-        route = data.loc[data['Shown'].str.contains(r)]
-        route.loc[route['Salient']==r, ['Preferred']] = 1
-        route.loc[route['Salient']!=r, ['Preferred']] = 0
-        stats_routes[r] = np.array(route['Preferred'])
-
-        chosen = route['Preferred'].sum()
-
-        result = dict()
-        result['Route'] = r
-        result['Proportion'] = chosen/len(route)*100
-        result['Type'] = 'Overall'
-        result['Cluster'] = 'Overall'
-        overall_results.append(result)     
-    significance = pd.concat([significance, get_significance(stats_routes,'Overall', routes)])  
-
-    overall_results = pd.DataFrame(overall_results)
-    overall_results.to_excel(f'{out_path}{task}_Results.xlsx', index = False)
-    significance.to_excel(f'{out_path}{task}_Significance.xlsx', index = False)
-    significance = significance.drop_duplicates(subset=['Cluster','pValue'])
-
-    #Plot results
-    results = pd.concat([results,overall_results])
-    clusters = results['Cluster'].drop_duplicates().tolist()
-    for cluster in clusters:
-        _data = results.loc[results['Cluster']==cluster]
-        _data = _data.sort_values(by='Proportion', ascending = False)
-        _x_data = _data['Route']
-        _prop_data = _data['Proportion'].values
+            result['Count'] = chosen
+            result['n'] = len(route)
+            result['Type'] = 'Overall'
+            result['Cluster'] = 'Overall'
+            overall_results.append(result)     
+
+        all_significance = get_significance_batch(route_tasks + group_tasks + [('Overall', stats_routes, routes)])
+        route_significance = all_significance.loc[all_significance['Cluster'].isin(routes)]
+        group_significance = all_significance.loc[all_significance['Cluster'].isin(groups)]
+
+        # Per route
+        results = pd.DataFrame(route_results)
+        significance = route_significance
+        cis = bootstrap_proportions(results['Count'], results['n'], seed=0)
+        results[['CI Low','CI High']] = cis[['CI Low','CI High']].to_numpy()
+        results.to_excel(f'{out_path}{task}_PerRoute_Results.xlsx', index = False)
+        significance.to_excel(f'{out_path}{task}_PerRoute_Significance.xlsx', index = False)
+        significance = significance.drop_duplicates(subset=['Cluster','Groups'])
+
+        x_data = results['Route'].sort_values().drop_duplicates().tolist()
+        y_data = dict()
+        i = 0
+
+        for cluster in groups:
+            _data = results.loc[results['Cluster']==cluster].set_index('Route')
+            y_data[cluster] = dict()
+            y_data[cluster]['values'] = _data.loc[x_data]['Proportion'].values
+            y_data[cluster]['err'] = error_bars(_data.loc[x_data])
+            y_data[cluster]['label'] = cluster
+            y_data[cluster]['color'] = [route_colors[x] for x in x_data]
+            i += 1
 
         ### Add footnote for significance
-        sig = significance.loc[(significance['Cluster']==cluster) & (significance['pValue']<=0.055)]
-        footnote,footnoteLines = get_significance_footnote(sig)
-
-        plot.bar(out_path,
-                    _x_data,
-                    _prop_data,
-                    bar1_color =[route_colors[x] for x in _x_data],
+        sig = significance.loc[(significance['pValue']<=0.055)]
+        footnote,footnoteLines = get_significance_footnote( sig, clusters=True)
+        plot.multi_bar(out_path,
+                    x_data,
+                    y_data,
                     xlabel = '',
-                    y1label = 'Implicit Preference and Visual Salience (%)',
-                    title = cluster,
-                    y1lim = 100,
-                    tag = "",
+                    ylabel = 'Percentage Chosen (%)',
+                    title = f'Implicit Preference and Visual Salience Split By Pack Type',
+                    ylim = 100,
                     footnote = footnote,
                     footnoteLines = footnoteLines
                     )
+
+        # Per group
+        results = pd.DataFrame(group_results)
+        significance = group_significance
+        cis = bootstrap_proportions(results['Count'], results['n'], seed=0)
+        results[['CI Low','CI High']] = cis[['CI Low','CI High']].to_numpy()
+        results.to_excel(f'{out_path}{task}_PerGroup_Results.xlsx', index = False)
+        significance.to_excel(f'{out_path}{task}_PerGroup_Significance.xlsx', index = False)
+        significance = significance.drop_duplicates(subset=['Cluster','Groups'])
+
+        # Overall
+        significance = all_significance.loc[all_significance['Cluster']=='Overall']
+        overall_results = pd.DataFrame(overall_results)
+        cis = bootstrap_proportions(overall_results['Count'], overall_results['n'], seed=0)
+        overall_results[['CI Low','CI High']] = cis[['CI Low','CI High']].to_numpy()
+        overall_results.to_excel(f'{out_path}{task}_Results.xlsx', index = False)
+        significance.to_excel(f'{out_path}{task}_Significance.xlsx', index = False)
+        significance = significance.drop_duplicates(subset=['Cluster','pValue'])
+
+        #Plot results
+        results = pd.concat([results,overall_results])
+        clusters = results['Cluster'].drop_duplicates().tolist()
+        for cluster in clusters:
+            _data = results.loc[results['Cluster']==cluster]
+            _data = _data.sort_values(by='Proportion', ascending = False)
+            _x_data = _data['Route']
+            _prop_data = _data['Proportion'].values
+
+            ### Add footnote for significance
+            sig = significance.loc[(significance['Cluster']==cluster) & (significance['pValue']<=0.055)]
+            footnote,footnoteLines = get_significance_footnote(sig)
+
+            plot.bar(out_path,
+                        _x_data,
+                        _prop_data,
+                        bar1_color =[route_colors[x] for x in _x_data],
+                        xlabel = '',
+                        y1label = 'Implicit Preference and Visual Salience (%)',
+                        title = cluster,
+                        y1lim = 100,
+                        tag = "",
+                        footnote = footnote,
+                        footnoteLines = footnoteLines,
+                        yerr = error_bars(_data)
+                        )
         
-    return None
+        return None
 
 
 def get_packNavigation_data(in_folder, results_folder, key_path):
@@ -379,123 +404,50 @@ def get_packNavigation_data(in_folder, results_folder, key_path):
     
     # Create the necessary data structures
     calc = []
-    all_data = pd.DataFrame()
     key_df = pd.read_csv(key_path).drop_duplicates(subset=['Slide'])
     key_dict = key_df.set_index('Slide').to_dict(orient='index')
     slides = key_df['Slide'].drop_duplicates().tolist()
     
-    # Extracting all raw data for each participant
+    # Extracting all raw data for each participant, one row per fixation
     for f in files:
         try:
             path = f"{in_path}{f}"
-            df = read_imotions(path)
+            df, _ = read_imotions(path)
             df = df[df['SourceStimuliName'].isin(slides)]
-            stims = df['SourceStimuliName'].drop_duplicates()
 
-            res = '_'.join(f.split('.csv')[0].split('_')[1:])
-            
-            for stim in stims:
-                _stim = df[df['SourceStimuliName'] == stim]
-                aois = _stim['AOIs gazed at'].dropna().unique()
-                aois = [a for a in aois if ';' not in a]
-                _start_time = _stim.loc[_stim['SlideEvent'] == 'StartMedia', 'Timestamp'].iloc[0]
-
-                for aoi in aois:
-                    _aoi = _stim[_stim['AOIs gazed at'] == aoi]
-                    _aoi['Timestamp'] -= _start_time
-                    _pupil = _aoi[['Row', 'Timestamp', 'Fixation Index', 'Fixation Duration']]
-                    _pupil['Stim'] = stim
-                    _pupil['Respondent'] = f[:11]
-
-                    fixations = _pupil['Fixation Index'].drop_duplicates().dropna()
-
-                    for fix in fixations:
-                        _data = _pupil[_pupil['Fixation Index'] == fix]
-
-                        variant = key_dict[stim]['Variant']
-                        brand = key_dict[stim]['Brand']
-                        pack = f"{brand}_{variant}"
-
-                        try:
-                            aoi_fields = aoi.split('_')
-                            aoi_type = aoi_fields[0]
-                            aoi_variant = ' '.join(aoi_fields[1:])
-                            if aoi_variant.isdigit() and int(aoi_variant) == 0:
-                                aoi_variant = 'Main'
-
-                            _calc = {
-                                'Res': _data['Respondent'].iloc[0],
-                                'Stim': stim,
-                                'Variant': variant,
-                                'Pack': pack,
-                                'Brand': brand,
-                                'AOI_Type': aoi_type,
-                                'AOI_Variant': aoi_variant,
-                                'AOI': aoi,
-                                'Timestamp': _data['Timestamp'].iloc[0],
-                                'Index': _data['Fixation Index'].iloc[0],
-                                'Duration': _data['Timestamp'].iloc[-1] - _data['Timestamp'].iloc[0]
-                            }
-                            calc.append(_calc)
-
-                        except Exception as e:
-                            print(f'>>> Invalid AOI info on {aoi}: {e}')
-
-                print(f">> Completed Collection: {f} ")
+            # Fixations on overlapping AOIs count once for each AOI
+            fixations = build_fixation_table(df, f[:11])
+            fixations['AOI'] = fixations['AOI'].astype(str).str.split(';')
+            calc.append(fixations.explode('AOI', ignore_index=True))
+
+            print(f">> Completed Collection: {f} ")
 
         except Exception as e:
             print(f'Error processing file {f}: {e}')
     
-    calc_df = pd.DataFrame(calc)
-    calc_df.to_excel(f'{out_path}eye_metrics_raw.xlsx', index=False)
-    calcs = []
-
-    resps = calc_df['Res'].drop_duplicates()
+    calc_df = pd.concat(calc, ignore_index=True) if calc else pd.DataFrame(columns=FIXATION_COLUMNS)
 
-    # Calculating metrics from raw (FFD and TFD)
-    for res in resps:
-        _res = calc_df[calc_df['Res'] == res]
-        stims = _res['Stim'].drop_duplicates()
+    # Pack and AOI attributes, resolved once per slide and AOI
+    calc_df['Variant'] = calc_df['Stim'].map(lambda stim: key_dict[stim]['Variant'])
+    calc_df['Brand'] = calc_df['Stim'].map(lambda stim: key_dict[stim]['Brand'])
+    calc_df['Pack'] = calc_df['Brand'].astype(str) + '_' + calc_df['Variant'].astype(str)
 
-        for stim in stims:
-            _stim = _res[_res['Stim'] == stim].sort_values('Timestamp')
-            aois = _stim['AOI'].dropna().drop_duplicates()
+    aoi_fields = {aoi: aoi.split('_') for aoi in calc_df['AOI'].unique()}
+    aoi_variants = {aoi: ' '.join(fields[1:]) for aoi, fields in aoi_fields.items()}
+    aoi_variants = {aoi: 'Main' if v.isdigit() and int(v) == 0 else v for aoi, v in aoi_variants.items()}
+    calc_df['AOI_Type'] = calc_df['AOI'].map({aoi: fields[0] for aoi, fields in aoi_fields.items()})
+    calc_df['AOI_Variant'] = calc_df['AOI'].map(aoi_variants)
 
-            for aoi in aois:
-                _aoi = _stim[_stim['AOI'] == aoi].sort_values('Timestamp')
-
-                variant = key_dict[stim]['Variant']
-                brand = key_dict[stim]['Brand']
-                pack = f"{variant}_{brand}"
-
-                try:
-                    aoi_fields = aoi.split('_')
-                    aoi_type = aoi_fields[0]
-                    aoi_variant = ' '.join(aoi_fields[1:])
-                    if aoi_variant.isdigit() and int(aoi_variant) == 0:
-                        aoi_variant = 'Main'
-
-                    _calcs = {
-                        'Res': res,
-                        'Stim': stim,
-                        'Variant': variant,
-                        'Pack': pack,
-                        'Size': brand,
-                        'AOI_Type': aoi_type,
-                        'AOI_Variant': aoi_variant,
-                        'AOI': aoi,
-                        'Timestamp': _aoi['Timestamp'].iloc[0],
-                        'Index': _aoi['Index'].iloc[0],
-                        'TFD': _aoi['Duration'].sum(),
-                        'FFD': _aoi['Duration'].iloc[0]
-                    }
-
-                    calcs.append(_calcs)
-
-                except Exception as e:
-                    print(f'>>> Invalid AOI info on {aoi}: {e}')
-
-    calcs_df = pd.DataFrame(calcs)
+    calc_df = calc_df[['Res', 'Stim', 'Variant', 'Pack', 'Brand', 'AOI_Type', 'AOI_Variant', 'AOI',
+                       'Timestamp', 'Index', 'Duration']]
+    calc_df.to_excel(f'{out_path}eye_metrics_raw.xlsx', index=False)
+    # Calculating metrics from raw (FFD and TFD), one row per respondent, slide and AOI
+    calcs_df = gaze_metrics(calc_df, min_duration=None, max_duration=None,
+                            first=['Variant', 'Brand', 'AOI_Type', 'AOI_Variant'])
+    calcs_df['Pack'] = calcs_df['Variant'].astype(str) + '_' + calcs_df['Brand'].astype(str)
+    calcs_df = calcs_df.rename(columns={'Brand': 'Size', 'TTFF': 'Timestamp'})
+    calcs_df = calcs_df[['Res', 'Stim', 'Variant', 'Pack', 'Size', 'AOI_Type', 'AOI_Variant', 'AOI',
+                         'Timestamp', 'Index', 'TFD', 'FFD']]
     calcs_df.to_csv(f'{out_path}eye_metrics_final.csv', index=False)
 
     data = calcs_df
@@ -547,11 +499,13 @@ def get_packNavigation_results(results_folder):
     out_path = f"{results_folder}{task}/PerPack/"
     os.makedirs(out_path, exist_ok=True) 
 
+    #Collect the AOI comparisons of every pack and metric for one batch
+    tasks = []
+    plots = []
     for metric in metrics:
         packs = data['Pack'].drop_duplicates().tolist()
 
         results = pd.DataFrame()
-        significance = pd.DataFrame()
         for pack in packs:
             pack_data = data.loc[(data['Pack']==pack)]
             aois = pack_data['AOI'].drop_duplicates().tolist()
@@ -579,44 +533,49 @@ def get_packNavigation_results(results_folder):
 
                 results = pd.concat([results,result])
                 plot_data = pd.concat([plot_data,result])
-                                
-            significance = pd.concat([significance, get_significance(stats_routes, f'{pack}_{metric}', aois)])
-            ### Plot TFD Results
-            sig = significance.loc[(significance['Cluster']==f'{pack}_{metric}') & (significance['pValue']<=0.055)]
-            footnote,footnoteLines = get_significance_footnote(sig)
 
-            if metric == 'Timestamp':
-                x_data = plot_data.sort_values(by='Value',ascending=True)['AOI']
-                y1_data= plot_data.set_index('AOI').loc[x_data]['Value'].values
+            tasks.append((f'{pack}_{metric}', stats_routes, aois))
+            plots.append((pack, metric, plot_data))
 
-                plot.bar(out_path,
-                            x_data,
-                            y1_data,
-                            bar1_color ='deepskyblue',
-                            xlabel = '',
-                            y1label = f'Time to First Fixation (ms)',
-                            title = f'Attention Grabbing Power of {pack}',
-                            tag = "",
-                            footnote = footnote,
-                            footnoteLines = footnoteLines
-                            )
-            elif metric == 'TFD':
-                x_data = plot_data.sort_values(by='Value',ascending=False)['AOI']
-                y1_data= plot_data.set_index('AOI').loc[x_data]['Value'].values
+        results = results.sort_values(by=['Pack','Value'])   
 
-                plot.bar(out_path,
-                            x_data,
-                            y1_data,
-                            bar1_color ='deepskyblue',
-                            xlabel = '',
-                            y1label = f'Total Fixation Duration (ms)',
-                            title = f'Attention Holding Power of {pack}',
-                            tag = "",
-                            footnote = footnote,
-                            footnoteLines = footnoteLines
-                            )
+    significance = get_significance_batch(tasks)
 
-        results = results.sort_values(by=['Pack','Value'])   
+    for pack, metric, plot_data in plots:
+        ### Plot TFD Results
+        sig = significance.loc[(significance['Cluster']==f'{pack}_{metric}') & (significance['pValue']<=0.055)]
+        footnote,footnoteLines = get_significance_footnote(sig)
+
+        if metric == 'Timestamp':
+            x_data = plot_data.sort_values(by='Value',ascending=True)['AOI']
+            y1_data= plot_data.set_index('AOI').loc[x_data]['Value'].values
+
+            plot.bar(out_path,
+                        x_data,
+                        y1_data,
+                        bar1_color ='deepskyblue',
+                        xlabel = '',
+                        y1label = f'Time to First Fixation (ms)',
+                        title = f'Attention Grabbing Power of {pack}',
+                        tag = "",
+                        footnote = footnote,
+                        footnoteLines = footnoteLines
+                        )
+        elif metric == 'TFD':
+            x_data = plot_data.sort_values(by='Value',ascending=False)['AOI']
+            y1_data= plot_data.set_index('AOI').loc[x_data]['Value'].values
+
+            plot.bar(out_path,
+                        x_data,
+                        y1_data,
+                        bar1_color ='deepskyblue',
+                        xlabel = '',
+                        y1label = f'Total Fixation Duration (ms)',
+                        title = f'Attention Holding Power of {pack}',
+                        tag = "",
+                        footnote = footnote,
+                        footnoteLines = footnoteLines
+                        )
 
     ##########
 
@@ -625,13 +584,16 @@ def get_packNavigation_results(results_folder):
     out_path = f"{results_folder}{task}/PerAOIType/"
     os.makedirs(out_path, exist_ok=True) 
 
+    #Collect the brand comparisons of every variant, metric and AOI type for one batch
+    tasks = []
+    files = []
     variants = data['Variant'].drop_duplicates().tolist()
     for variant in variants:
         for metric in metrics:
             aoi_types = data['AOI'].drop_duplicates().tolist()
 
             results = pd.DataFrame()
-            significance = pd.DataFrame()
+            clusters = []
             for aoi_type in aoi_types:
                 aoi_type_data = data.loc[(data['AOI']==aoi_type) & 
                                          (data['Variant']==variant)]
@@ -663,10 +625,8 @@ def get_packNavigation_results(results_folder):
                         results = pd.concat([results,result])
                         plot_data = pd.concat([plot_data,result])
                                         
-                    significance = pd.concat([significance, get_significance(stats_routes, f'{variant}_{metric}_{aoi_type}', brands)])
-                    ### Plot TFD Results
-                    sig = significance.loc[(significance['Cluster']==f'{variant}_{metric}_{aoi_type}') & (significance['pValue']<=0.055)]
-                    footnote,footnoteLines = get_significance_footnote(sig)
+                    tasks.append((f'{variant}_{metric}_{aoi_type}', stats_routes, brands))
+                    clusters.append(f'{variant}_{metric}_{aoi_type}')
 
                     if metric == 'Timestamp':
                         x_data = plot_data.sort_values(by='Value',ascending=True)['Brand']
@@ -698,8 +658,14 @@ def get_packNavigation_results(results_folder):
                     
                 
             results.to_excel(f'{out_path}ET_{variant}_{metric}_Results.xlsx', index = False)
-            significance = significance.drop_duplicates(subset=['Cluster','Groups'])
-            significance.to_excel(f'{out_path}ET_{variant}_{metric}_Significance.xlsx', index = False)
+            files.append((variant, metric, clusters))
+
+    significance = get_significance_batch(tasks)
+    for variant, metric, clusters in files:
+        _significance = significance
+        if len(significance):
+            _significance = significance.loc[significance['Cluster'].isin(clusters)].drop_duplicates(subset=['Cluster','Groups'])
+        _significance.to_excel(f'{out_path}ET_{variant}_{metric}_Significance.xlsx', index = False)
  
 
 
@@ -719,13 +685,7 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
     #Intialise working dataframes
     data = pd.DataFrame()
     #keep = ['SourceStimuliName','Computer timestamp']
-    AOI_data = pd.DataFrame()
-    raw_AOI_data = pd.DataFrame()
-
-    eye = pd.DataFrame()
-    col  = ['Res','Slide','AOI','Timestamp','Index','Duration']
-    calc = pd.DataFrame(columns = col)
-    all_data = pd.DataFrame()
+    aoi_results = []
 
     for f in files:
         path = f"{in_path}{f}"
@@ -734,68 +694,36 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
         df['SourceStimuliName'] = df['SourceStimuliName'].str.replace('Every Valu','Every+Valu')
         df['SourceStimuliName'] = df['SourceStimuliName'].str.replace('Prem','Premium')
 
-        stims = df['SourceStimuliName'].drop_duplicates()
-
-        for stim in stims: 
-            _stim = df[df['SourceStimuliName']== stim]
-            #Get list of AOIs viewed by participant 
-            aois = _stim['AOIs gazed at'].dropna().drop_duplicates()
-            #Get start time
-            _stim.to_csv('temp.csv')
-            _start_time = _stim.loc[_stim['SlideEvent']=='StartMedia']['Timestamp'].values[0]
-            _stim.insert(0, 't', _stim['Timestamp']-_start_time, True)
-            _stim = _stim.loc[_stim['t']>=150]
-            #Get data per AOI
-            for aoi in aois:                    
-                #Collect all data for the AOI, adjust the timestamp to start of ad                 
-                _aoi = _stim.loc[_stim['AOIs gazed at']==aoi]
-                col = ['t','FixIndex']
-                _pupil = pd.DataFrame(columns= col)
-                _pupil['t']=_aoi['t']
-                _pupil['FixIndex']=_aoi['Fixation Index']
-
-                ### FIXATIONS IDENTIFIED BY INDEX
-                fixations_list = _pupil['FixIndex'].drop_duplicates().dropna()
-                fixations = pd.DataFrame() 
-                if len(fixations_list):
-                    #For each fixation
-                    for fix in fixations_list:                       
-                        _data = _pupil.loc[_pupil['FixIndex']==fix]
-                        duration = _data['t'].iloc[-1]-_data['t'].iloc[0]
-                        if (duration > 150) and (duration <900):
-                            result = {}
-                            result['Start'] = _data['t'].values[0]
-                            result['Duration'] = duration
-                            fixations = fixations.append(result, ignore_index=True)
-                if len(fixations):
-                    result = {}
-                    fields = aoi.split('_')
-                    fields[5] = fields[5][:2]
-                    result['ID']=aoi
-                    result['Respondent']=f
-                    result['Route']=fields[1]
-                    result['Category']=fields[2]
-                    result['Variant']=fields[3]
-                    result['AOI']= fields[4]
-                    result['Instance']=fields[5]
-                    result['Pack']=fields[5]
-                    result['TTFF']=fixations['Start'].values[0]
-                    result['TFD']=fixations['Duration'].sum()
-                    result['FFD']=fixations['Duration'].values[0]
-                    AOI_data = AOI_data.append(result, ignore_index=True)
-                    raw_AOI_data = raw_AOI_data.append(result, ignore_index=True)       
-
-                #BY THE END OF THIS, WE HAVE A TABLE WITH A ROW ENTRY FOR EACH FIXATION OF EACH PARTICIPANT
+        #Fixations from 150ms after stimulus start, metrics per AOI from fixations between 150ms and 900ms
+        fixations = build_fixation_table(df, f, min_time=150)
+        metrics = gaze_metrics(fixations, min_duration=150, max_duration=900, inclusive='neither')
+        if not len(metrics):
+            print_status('No fixations',path)
+            continue
+
+        #AOI names carry _Route_Category_Variant_AOI_Instance
+        fields = metrics['AOI'].astype(str).str.split('_', expand=True)
+        aoi_results.append(pd.DataFrame({'ID':metrics['AOI'].astype(str),
+                                         'Respondent':f,
+                                         'Route':fields[1],
+                                         'Category':fields[2],
+                                         'Variant':fields[3],
+                                         'AOI':fields[4],
+                                         'Instance':fields[5].str[:2],
+                                         'Pack':fields[5].str[:2],
+                                         'TTFF':metrics['TTFF'],
+                                         'TFD':metrics['TFD'],
+                                         'FFD':metrics['FFD']}))
         print_status('Extracted',path)
+
+    raw_AOI_data = pd.concat(aoi_results, ignore_index=True)
+    AOI_data = raw_AOI_data.copy()
     
-    data = pd.DataFrame()
-    for i, ID in raw_AOI_data.groupby(['ID']):
-        result = ID.iloc[0].to_dict()
-        result['TTFF']=ID['TTFF'].mean()
-        result['TFD']=ID['TFD'].mean()
-        result['FFD']=ID['FFD'].mean()
-        result['Count']=len(ID)
-        data = data.append(result, ignore_index=True)
+    #One row per AOI ID: labels of its first row, mean metrics and the number of respondents
+    labels = {c: 'first' for c in raw_AOI_data.columns if c not in ('ID', 'TTFF', 'TFD', 'FFD')}
+    data = raw_AOI_data.groupby('ID').agg({**labels, 'TTFF': 'mean', 'TFD': 'mean', 'FFD': 'mean'})
+    data['Count'] = raw_AOI_data.groupby('ID').size()
+    data = data.reset_index()
 
     ## We need raw_AOI_data
     ## We need AOI_data
@@ -811,88 +739,25 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
     routes = data['Route'].drop_duplicates().tolist()
 
     AOIs = raw_AOI_data['AOI'].drop_duplicates().tolist()
-    AOI_Results = pd.DataFrame()
+    AOI_Results = []
     variants = raw_AOI_data['Variant'].drop_duplicates().tolist()
 
-    for v in variants:
-        plot_data = pd.DataFrame()
-        stats_routes_TFD = {}
-        stats_routes_FFD = {}
-        stats_routes_TTFF = {}
-        for r in routes:
-            route = raw_AOI_data.loc[(raw_AOI_data['Route']==r) & (raw_AOI_data['Variant']==v)]
-            stats_routes_TFD[r] = route['TFD']
-            stats_routes_FFD[r] = route['FFD']
-            stats_routes_TTFF[r] = route['TTFF']
-            result = {}
-            result['Route'] = r
-            result['TFD'] = route['TFD'].mean()
-            result['FFD'] = route['FFD'].mean()
-            result['TTFF'] = route['TTFF'].mean()
-            result['Variant'] = v
-            plot_data = plot_data.append(result,ignore_index=True)
-            AOI_Results = AOI_Results.append(result,ignore_index=True)
-        significance = pd.concat([significance, get_significance(stats_routes_TFD, routes,f'{v}_TFD')])
-        significance = pd.concat([significance, get_significance(stats_routes_FFD, routes,f'{v}_FFD')])
-        significance = pd.concat([significance, get_significance(stats_routes_TTFF, routes,f'{v}_TTFF')])
-        significance = significance.drop_duplicates(subset=['Cluster','pValue'])
-
-        ### Add footnote for significance
-        sig = significance.loc[(significance['Cluster']==f'{v}_TFD') & (significance['pValue']<=0.055)]
-        footnote,footnoteLines = get_significance_footnote(sig)
-        _x_data = plot_data['Route']
-        _prop_data = plot_data['TFD'].values
-        plot.bar(out_path,
-                    _x_data,
-                    _prop_data,
-                    bar1_color ='deepskyblue',
-                    xlabel = '',
-                    y1label = 'Average Total Fixation Duration (ms)',
-                    title = f'Visual Hierarchy of {v}',
-                    tag = "",
-                    footnote = footnote,
-                    footnoteLines = footnoteLines
-                    )
-
-        sig = significance.loc[(significance['Cluster']==f'{v}_FFD') & (significance['pValue']<=0.055)]
-        footnote,footnoteLines = get_significance_footnote(sig)
-        _prop_data = plot_data['FFD'].values
-        plot.bar(out_path,
-                    _x_data,
-                    _prop_data,
-                    bar1_color ='deepskyblue',
-                    xlabel = '',
-                    y1label = 'Average First Fixation Duration (ms)',
-                    title = f'Attention Holding Power of {v}',
-                    tag = "",
-                    footnote = footnote,
-                    footnoteLines = footnoteLines
-                    )
-
-        sig = significance.loc[(significance['Cluster']==f'{v}_TTFF') & (significance['pValue']<=0.055)]
-        footnote,footnoteLines = get_significance_footnote(sig)
-        _prop_data = plot_data['TTFF'].values
-        plot.bar(out_path,
-                    _x_data,
-                    _prop_data,
-                    bar1_color ='deepskyblue',
-                    xlabel = '',
-                    y1label = 'Average Time to First Fixation (ms)',
-                    title = f'Attention Grabbing Power of {v}',
-                    tag = "",
-                    footnote = footnote,
-                    footnoteLines = footnoteLines
-                    )
-
-        categories = raw_AOI_data['Category'].drop_duplicates().tolist()
+    categories = raw_AOI_data['Category'].drop_duplicates().tolist()
 
-        for c in categories:
-            plot_data = pd.DataFrame()
+    #Collect the route comparisons of every variant, and every variant and category, for one batch
+    tasks = []
+    plots = []
+    for v in variants:
+        for c in [None] + categories:
+            plot_data = []
             stats_routes_TFD = {}
             stats_routes_FFD = {}
             stats_routes_TTFF = {}
             for r in routes:
-                route = raw_AOI_data.loc[(raw_AOI_data['Route']==r) & (raw_AOI_data['Variant']==v) & (raw_AOI_data['Category']==c)]
+                selection = (raw_AOI_data['Route']==r) & (raw_AOI_data['Variant']==v)
+                if c is not None:
+                    selection &= (raw_AOI_data['Category']==c)
+                route = raw_AOI_data.loc[selection]
                 stats_routes_TFD[r] = route['TFD']
                 stats_routes_FFD[r] = route['FFD']
                 stats_routes_TTFF[r] = route['TTFF']
@@ -902,61 +767,40 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
                 result['FFD'] = route['FFD'].mean()
                 result['TTFF'] = route['TTFF'].mean()
                 result['Variant'] = v
-                result['Category'] = c
-                plot_data = plot_data.append(result,ignore_index=True)
-                AOI_Results = AOI_Results.append(result,ignore_index=True)
-            significance = pd.concat([significance, get_significance(stats_routes_TFD, routes,f'{v}_{c}_TFD')])
-            significance = pd.concat([significance, get_significance(stats_routes_FFD, routes,f'{v}_{c}_FFD')])
-            significance = pd.concat([significance, get_significance(stats_routes_TTFF, routes,f'{v}_{c}_TTFF')])
-            significance = significance.drop_duplicates(subset=['Cluster','pValue'])
+                if c is not None:
+                    result['Category'] = c
+                plot_data.append(result)
+                AOI_Results.append(result)
+
+            cluster = v if c is None else f'{v}_{c}'
+            tasks += [(f'{cluster}_TFD', stats_routes_TFD, routes),
+                      (f'{cluster}_FFD', stats_routes_FFD, routes),
+                      (f'{cluster}_TTFF', stats_routes_TTFF, routes)]
+            plots.append((cluster, v if c is None else f'{v}-{c}', pd.DataFrame(plot_data)))
+
+    significance = get_significance_batch(tasks)
+    significance = significance.drop_duplicates(subset=['Cluster','pValue'])
 
+    for cluster, title, plot_data in plots:
+        for metric, ylabel, heading in [('TFD', 'Average Total Fixation Duration (ms)', 'Visual Hierarchy'),
+                                        ('FFD', 'Average First Fixation Duration (ms)', 'Attention Holding Power'),
+                                        ('TTFF', 'Average Time to First Fixation (ms)', 'Attention Grabbing Power')]:
             ### Add footnote for significance
-            sig = significance.loc[(significance['Cluster']==f'{v}_{c}_TFD') & (significance['pValue']<=0.055)]
-            footnote,footnoteLines = get_significance_footnote(sig)
-            _x_data = plot_data['Route']
-            _prop_data = plot_data['TFD'].values
-            plot.bar(out_path,
-                        _x_data,
-                        _prop_data,
-                        bar1_color ='deepskyblue',
-                        xlabel = '',
-                        y1label = 'Average Total Fixation Duration (ms)',
-                        title = f'Visual Hierarchy of {v}-{c}',
-                        tag = "",
-                        footnote = footnote,
-                        footnoteLines = footnoteLines
-                        )
-
-            sig = significance.loc[(significance['Cluster']==f'{v}_{c}_FFD') & (significance['pValue']<=0.055)]
+            sig = significance.loc[(significance['Cluster']==f'{cluster}_{metric}') & (significance['pValue']<=0.055)]
             footnote,footnoteLines = get_significance_footnote(sig)
-            _prop_data = plot_data['FFD'].values
             plot.bar(out_path,
-                        _x_data,
-                        _prop_data,
-                        bar1_color ='deepskyblue',
-                        xlabel = '',
-                        y1label = 'Average First Fixation Duration (ms)',
-                        title = f'Attention Holding Power of {v}-{c}',
-                        tag = "",
-                        footnote = footnote,
-                        footnoteLines = footnoteLines
-                        )
-
-            sig = significance.loc[(significance['Cluster']==f'{v}_{c}_TTFF') & (significance['pValue']<=0.055)]
-            footnote,footnoteLines = get_significance_footnote(sig)
-            _prop_data = plot_data['TTFF'].values
-            plot.bar(out_path,
-                        _x_data,
-                        _prop_data,
+                        plot_data['Route'],
+                        plot_data[metric].values,
                         bar1_color ='deepskyblue',
                         xlabel = '',
-                        y1label = 'Average Time to First Fixation (ms)',
-                        title = f'Attention Grabbing Power of {v}-{c}',
+                        y1label = ylabel,
+                        title = f'{heading} of {title}',
                         tag = "",
                         footnote = footnote,
                         footnoteLines = footnoteLines
                         )
     
+    AOI_Results = pd.DataFrame(AOI_Results)
     AOI_Results.to_excel(f'{out_path}{task}_AOI_Results.xlsx', index = False)
     
     if pack_graphs:
@@ -970,7 +814,7 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
                     variant = category.loc[category['Variant']==v]
                     AOIs = variant['AOI'].drop_duplicates().tolist()
                     #stats_AOIs= {}
-                    plot_data = pd.DataFrame()
+                    plot_data = []
                     for a in AOIs:
                         #AOI = raw_AOI_data.loc[(raw_AOI_data['Route']==r) & (raw_AOI_data['Category']==c) & (raw_AOI_data['Variant']==v) & (raw_AOI_data['AOI']==a)]
                         #stats_AOIs[a] = AOI['TTFF']
@@ -980,10 +824,10 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
                         result['FFD'] = AOI['FFD'].values[0]
                         result['TTFF']= AOI['TTFF'].values[0]
                         result['Count']= AOI['Count'].values[0]
-                        plot_data = plot_data.append(result,ignore_index=True) 
+                        plot_data.append(result)
                     #significance = pd.concat([significance, get_significance(stats_AOIs, AOIs, f'TTFF for {r} {c} {v}')])
                 
-                    plot_data = plot_data.sort_values(by=['TTFF'])
+                    plot_data = pd.DataFrame(plot_data).sort_values(by=['TTFF'])
                     x_data = plot_data['AOI'].tolist()
                     TTFF = plot_data['TTFF'].values
                     FFD = plot_data['FFD'].values
@@ -1021,6 +865,7 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
                             )
 
         categories = data['Category'].drop_duplicates().tolist()
+        tasks = []
         for c in categories:
             category = data.loc[data['Category']==c]
             variants = category['Variant'].drop_duplicates().tolist()   
@@ -1031,7 +876,7 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
                     aoi = variant.loc[variant['AOI']==a]
                     routes = aoi['Route'].drop_duplicates().tolist()
                     stats_routes= {}
-                    plot_data = pd.DataFrame()
+                    plot_data = []
                     for r in routes:
                         route = raw_AOI_data.loc[(raw_AOI_data['Route']==r) & (raw_AOI_data['Category']==c) & (raw_AOI_data['Variant']==v) & (raw_AOI_data['AOI']==a)]
                         stats_routes[r] = route['TFD']
@@ -1041,9 +886,10 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
                         result['FFD'] = route['FFD'].values[0]
                         result['TTFF']= route['TTFF'].values[0]
                         result['Count']= route['Count'].values[0]
-                        plot_data = plot_data.append(result,ignore_index=True) 
-                    significance = pd.concat([significance, get_significance(stats_routes, routes, f'TTFF for {a} {c} {v}')])
+                        plot_data.append(result)
+                    tasks.append((f'TTFF for {a} {c} {v}', stats_routes, routes))
                 
+                    plot_data = pd.DataFrame(plot_data)
                     x_data = plot_data['Route'].tolist()
                     TTFF = plot_data['TTFF'].values
                     FFD = plot_data['FFD'].values
@@ -1079,6 +925,7 @@ def shelf_navigation(in_folder,results_folder,task_tag=None,pack_graphs=False):
                             title = f"Pack navigation for {a} on {c} {v}",
                             tag = 'line'
                             )
+        significance = pd.concat([significance, get_significance_batch(tasks)])
 
     significance.to_excel(f'{out_path}{task}_Significance.xlsx', index = False)
     significance = significance.drop_duplicates(subset=['Cluster','pValue'])
@@ -1236,6 +1083,7 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
 
     goals = keyboard_data['Goal'].drop_duplicates().tolist()
 
+    tasks = []
     for g in goals:
         if isAOIData:
             goal_AOI = AOI_mean_data.loc[AOI_mean_data['Goal']==g]
@@ -1259,8 +1107,9 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
                 AOI = AOI_mean_data.loc[(AOI_mean_data['Goal']==g) & (AOI_mean_data['AOI']==r)]['TFD'].values[0] if len(AOI) else 0
                 result['TFD'] = AOI
             results = results.append(result,ignore_index = True)     
-        significance = pd.concat([significance, get_significance(stats_routes, routes, g)])  
+        tasks.append((g, stats_routes, routes))
 
+    significance = get_significance_batch(tasks)
     results.to_excel(f'{out_path}{task}_Results.xlsx', index = False)
     significance.to_excel(f'{out_path}{task}_Significance.xlsx', index = False)
     significance = significance.drop_duplicates(subset=['Cluster','pValue'])
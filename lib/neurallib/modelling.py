@@ -0,0 +1,273 @@
+"""
+Covariate-adjusted models fitted across many outcome columns.
+
+A formula template such as '{outcome} ~ C(subset) + Age + PSQI_Overall' is
+parsed once into a design matrix that every outcome reuses. OLS / ANCOVA fits
+of all outcomes sharing a missing-value pattern are one least squares solve
+with a shared pseudo-inverse. Mixed models (random intercept per subject) run
+per outcome in a process pool; each worker receives the design once, fits a
+contiguous chunk of outcomes and warm-starts every fit from the previous
+outcome's variance components. Results come back as one tidy table with a row
+per outcome and term.
+"""
+
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import patsy
+from scipy import stats
+from concurrent.futures import ProcessPoolExecutor
+
+KINDS = ('ols', 'mixedlm')
+
+
+def ancova_formula(group: str, covariates=(), *, categorical: bool = True) -> str:
+    """
+    Builds a formula template with an '{outcome}' placeholder, e.g. '{outcome} ~ C(subset) + Age'.
+    """
+    terms = [f"C({group})" if categorical else group, *covariates]
+    return "{outcome} ~ " + " + ".join(terms)
+
+
+def design(df: pd.DataFrame, formula: str) -> pd.DataFrame:
+    """
+    Builds the design matrix of a formula template's right hand side once.
+
+    Rows with a missing predictor are dropped; the index keeps the rows of df used.
+
+    Raises:
+    - ValueError: If formula has no '~'
+    """
+    if '~' not in formula:
+        raise ValueError(f"Formula template must look like '{{outcome}} ~ ...', not {formula!r}")
+    rhs = formula.split('~', 1)[1]
+    return patsy.dmatrix(rhs, df, return_type='dataframe', NA_action='drop')
+
+
+def _outcomes(df: pd.DataFrame, outcomes, index) -> np.ndarray:
+    missing = [c for c in outcomes if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+    return df.loc[index, list(outcomes)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+
+def _patterns(y: np.ndarray):
+    """
+    Groups outcome columns by which rows they observe.
+
+    Yields:
+    - tuple: (rows, columns) for every distinct missing-value pattern
+    """
+    observed = ~np.isnan(y)
+    masks, inverse = np.unique(observed.T, axis=0, return_inverse=True)
+    for i, mask in enumerate(masks):
+        yield np.flatnonzero(mask), np.flatnonzero(inverse.ravel() == i)
+
+
+def _ssr(x: np.ndarray, y: np.ndarray):
+    """
+    Least squares of every column of y on x through one pseudo-inverse.
+
+    Returns:
+    - tuple: (coefficients, residual sum of squares, pseudo-inverse, rank)
+    """
+    pinv = np.linalg.pinv(x)
+    beta = pinv @ y
+    residuals = y - x @ beta
+    return beta, (residuals ** 2).sum(axis=0), pinv, np.linalg.matrix_rank(x)
+
+
+def ols_outcomes(df: pd.DataFrame, outcomes, formula: str, *, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Fits one OLS model per outcome column, batched over outcomes.
+
+    Parameters:
+    - df: Wide table, one row per respondent
+    - outcomes: Outcome columns substituted for '{outcome}'
+    - formula: Formula template, see ancova_formula
+    - confidence: Coefficient interval coverage
+
+    Returns:
+    - pd.DataFrame: 'Outcome', 'Term', 'Coef', 'SE', 'T', 'p-val', 'CI Low', 'CI High', 'n' and 'dof',
+      one row per outcome and design column, as statsmodels OLS
+    """
+    x = design(df, formula)
+    y = _outcomes(df, outcomes, x.index)
+    names = list(x.columns)
+    xv = x.to_numpy(dtype=float)
+
+    parts = []
+    for rows, columns in _patterns(y):
+        beta, ssr, pinv, rank = _ssr(xv[rows], y[np.ix_(rows, columns)])
+        dof = len(rows) - rank
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = ssr / dof
+            se = np.sqrt(np.einsum('ij,ij->i', pinv, pinv)[:, None] * scale[None, :])
+            t = beta / se
+        p = 2 * stats.t.sf(np.abs(t), dof) if dof > 0 else np.full(t.shape, np.nan)
+        q = stats.t.ppf(0.5 + confidence / 2, dof) if dof > 0 else np.nan
+        parts.append(pd.DataFrame({
+            'Outcome': np.repeat(np.asarray(outcomes, dtype=object)[columns], len(names)),
+            'Term': np.tile(names, len(columns)),
+            'Coef': beta.T.ravel(), 'SE': se.T.ravel(), 'T': t.T.ravel(), 'p-val': p.T.ravel(),
+            'CI Low': (beta - q * se).T.ravel(), 'CI High': (beta + q * se).T.ravel(),
+            'n': len(rows), 'dof': dof}))
+    return _ordered(parts, outcomes)
+
+
+def term_tests(df: pd.DataFrame, outcomes, formula: str) -> pd.DataFrame:
+    """
+    F test of every model term (e.g. the group in an ANCOVA) for every outcome column.
+
+    Each term is tested by dropping its design columns from the full model, which
+    matches a Type II ANCOVA table for models without interactions.
+
+    Returns:
+    - pd.DataFrame: 'Outcome', 'Term', 'F', 'ddof1', 'ddof2', 'p-val' and 'np2' (partial eta squared)
+    """
+    x = design(df, formula)
+    y = _outcomes(df, outcomes, x.index)
+    xv = x.to_numpy(dtype=float)
+    slices = {name: s for name, s in x.design_info.term_name_slices.items() if name != 'Intercept'}
+
+    parts = []
+    for rows, columns in _patterns(y):
+        yp = y[np.ix_(rows, columns)]
+        _, ssr, _, rank = _ssr(xv[rows], yp)
+        ddof2 = len(rows) - rank
+        for name, s in slices.items():
+            keep = np.ones(xv.shape[1], dtype=bool)
+            keep[s] = False
+            _, reduced, _, reduced_rank = _ssr(xv[np.ix_(rows, keep)], yp)
+            ddof1 = rank - reduced_rank
+            with np.errstate(invalid='ignore', divide='ignore'):
+                f = ((reduced - ssr) / ddof1) / (ssr / ddof2)
+                np2 = (reduced - ssr) / reduced
+            parts.append(pd.DataFrame({
+                'Outcome': np.asarray(outcomes, dtype=object)[columns], 'Term': name, 'F': f,
+                'ddof1': ddof1, 'ddof2': ddof2,
+                'p-val': stats.f.sf(f, ddof1, ddof2) if ddof1 > 0 and ddof2 > 0 else np.nan, 'np2': np2}))
+    return _ordered(parts, outcomes)
+
+
+def _ordered(parts, outcomes) -> pd.DataFrame:
+    """
+    Concatenates per pattern results back into outcome order.
+    """
+    if not parts:
+        return pd.DataFrame()
+    result = pd.concat(parts, ignore_index=True)
+    order = pd.Categorical(result['Outcome'], categories=list(dict.fromkeys(outcomes)))
+    return result.iloc[np.argsort(order.codes, kind='stable')].reset_index(drop=True)
+
+
+# Design shared by every task of a worker process, set once by _init_worker
+_shared = {}
+
+
+def _init_worker(exog, names, groups, exog_re, reml):
+    _shared.update(exog=exog, names=names, groups=groups, exog_re=exog_re, reml=reml)
+
+
+def _fit_mixed_chunk(chunk):
+    """
+    Fits a chunk of outcomes in order, starting each fit from the previous solution.
+    """
+    from statsmodels.regression.mixed_linear_model import MixedLM
+    exog, names, groups, exog_re = _shared['exog'], _shared['names'], _shared['groups'], _shared['exog_re']
+    rows, start = [], None
+    for outcome, y in chunk:
+        keep = ~np.isnan(y)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                model = MixedLM(y[keep], exog[keep], groups[keep],
+                                exog_re=None if exog_re is None else exog_re[keep])
+                fit = model.fit(start_params=start, reml=_shared['reml'])
+        except (np.linalg.LinAlgError, ValueError) as z:
+            print(f'Failed to fit {outcome}: {z!r}')
+            start = None
+            continue
+        if fit.converged:
+            start = fit.params_object
+        k = len(names)
+        ci = np.asarray(fit.conf_int())[:k]
+        rows.append(pd.DataFrame({'Outcome': outcome, 'Term': names, 'Coef': fit.fe_params,
+                                  'SE': fit.bse_fe, 'Z': fit.tvalues[:k], 'p-val': fit.pvalues[:k],
+                                  'CI Low': ci[:, 0], 'CI High': ci[:, 1], 'n': int(keep.sum()),
+                                  'Group Var': float(np.atleast_2d(fit.cov_re)[0, 0]), 'Scale': fit.scale,
+                                  'Converged': fit.converged}))
+    return rows
+
+
+def mixedlm_outcomes(df: pd.DataFrame, outcomes, formula: str, groups: str, *, re_formula: str = None,
+                     reml: bool = True, workers: int = None, chunksize: int = None) -> pd.DataFrame:
+    """
+    Fits one linear mixed model per outcome column in a process pool.
+
+    Parameters:
+    - df: Long table, one row per observation (e.g. subject x period)
+    - outcomes: Outcome columns substituted for '{outcome}'
+    - formula: Fixed effects formula template, e.g. '{outcome} ~ Drink * Period + Age'
+    - groups: Subject column for the random effects
+    - re_formula: Optional random effects formula, defaults to a random intercept
+    - reml: Restricted maximum likelihood, as statsmodels
+    - workers: Number of processes, defaults to the number of cores. 1 runs in this process.
+    - chunksize: Outcomes fitted in sequence by one task (warm-started from each other);
+      defaults to splitting the outcomes evenly over twice the workers
+
+    Returns:
+    - pd.DataFrame: 'Outcome', 'Term', 'Coef', 'SE', 'Z', 'p-val', 'CI Low', 'CI High', 'n', 'Group Var',
+      'Scale' and 'Converged', one row per outcome and fixed effect
+
+    Raises:
+    - KeyError: If groups cannot be found in df
+    """
+    if groups not in df.columns:
+        raise KeyError(f"{[groups]} columns missing from DataFrame")
+    x = design(df, formula)
+    y = _outcomes(df, outcomes, x.index)
+    group_values = df.loc[x.index, groups].to_numpy()
+    exog_re = None
+    if re_formula is not None:
+        exog_re = patsy.dmatrix(re_formula, df.loc[x.index], return_type='dataframe').to_numpy(dtype=float)
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, int(np.ceil(len(outcomes) / (2 * workers))))
+    tasks = [[(outcomes[i], y[:, i]) for i in range(start, min(start + chunksize, len(outcomes)))]
+             for start in range(0, len(outcomes), chunksize)]
+    shared = (x.to_numpy(dtype=float), list(x.columns), group_values, exog_re, reml)
+
+    if workers == 1 or len(tasks) < 2:
+        _init_worker(*shared)
+        results = [_fit_mixed_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=shared) as pool:
+            results = list(pool.map(_fit_mixed_chunk, tasks))
+
+    frames = [frame for chunk in results for frame in chunk]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def fit_outcomes(df: pd.DataFrame, outcomes, formula: str, *, kind: str = 'ols', **kwargs) -> pd.DataFrame:
+    """
+    Fits a formula template to every outcome column.
+
+    Parameters:
+    - kind: 'ols' (see ols_outcomes) or 'mixedlm' (see mixedlm_outcomes, needs groups=)
+    - kwargs: Passed to the fitting function
+
+    Returns:
+    - pd.DataFrame: Tidy coefficient table, one row per outcome and term
+
+    Raises:
+    - ValueError: If kind is unknown
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {list(KINDS)}, not {kind!r}")
+    outcomes = list(outcomes)
+    if kind == 'ols':
+        return ols_outcomes(df, outcomes, formula, **kwargs)
+    return mixedlm_outcomes(df, outcomes, formula, **kwargs)
@@ -89,7 +89,7 @@ def time_proportions(input_folder,results_folder, tags = ['',]):
     #header("> Completed: Plotting Proportions Time Series")
 
 
-def bar(out_folder, xcol, y1col, bar1_color = [], xlabel = '', y1label = '', title = '', tags =['',], highlight = {'':'',}, y1lim =None, tag = None, footnote = None, footnoteLines=None, minorTicks = None, rotate_ticks = None):
+def bar(out_folder, xcol, y1col, bar1_color = [], xlabel = '', y1label = '', title = '', tags =['',], highlight = {'':'',}, y1lim =None, tag = None, footnote = None, footnoteLines=None, minorTicks = None, rotate_ticks = None, yerr = None):
     plt.rcParams['font.family'] = "Century Gothic"
     out_path = f"{out_folder}"
     os.makedirs(out_path, exist_ok=True)    
@@ -116,6 +116,10 @@ def bar(out_folder, xcol, y1col, bar1_color = [], xlabel = '', y1label = '', tit
 
     bar1 = ax1.bar(x_data,y1_data, width= width, color= bar1_color, label = y1label)
 
+    # yerr: symmetric errors or (2, n) lower/upper distances, e.g. proportions.error_bars
+    if yerr is not None:
+        ax1.errorbar(x_data, y1_data, yerr=yerr, fmt='none', ecolor='black', elinewidth=0.8, capsize=3)
+
     if rotate_ticks is not None:
         plt.xticks(rotation=45, ha = 'right', color= 'black')
 
@@ -333,6 +337,50 @@ def heatmap(out_folder, df, xcol, y1col, metric, cmap = 'YlOrRd', linewidths=0.5
     
 
 
+def gaze_heatmap(out_folder, grid, background = None, size = None, cmap = 'jet', alpha = 0.6, threshold = 0.05, title = '', tag = None):
+    """
+    Generates and saves a gaze heatmap, optionally over the stimulus image.
+
+    Parameters:
+    - out_folder (str): The output directory where the heatmap image will be saved.
+    - grid (numpy.ndarray): Heatmap grid, e.g. from heatmap.GazeHeatmap.result, row 0 at the top.
+    - background (str, optional): Path to the stimulus image drawn underneath. Defaults to None.
+    - size (tuple, optional): Screen (width, height) in pixels the grid spans. Defaults to the background size, or the grid shape.
+    - cmap (str, optional): The colormap for the heatmap. Defaults to 'jet'.
+    - alpha (float, optional): Opacity of the heatmap over the background. Defaults to 0.6.
+    - threshold (float, optional): Cells below this fraction of the peak are left transparent. Defaults to 0.05.
+    - title (str, optional): The title of the heatmap. Defaults to an empty string.
+    - tag (str, optional): An additional tag for the output filename. Defaults to None.
+
+    Returns:
+    - None: This function does not return a value but saves the generated heatmap to a file.
+    """
+    plt.rcParams['font.family'] = "Century Gothic"
+    out_path = f"{out_folder}"
+    os.makedirs(out_path, exist_ok=True)
+
+    print(f">> Running: Plotting Gaze Heatmap for {title}")
+
+    fig, ax = plt.subplots()
+    image = Image.open(background) if background is not None else None
+    if size is None:
+        size = image.size if image is not None else (grid.shape[1], grid.shape[0])
+    if image is not None:
+        ax.imshow(image, extent=(0, size[0], size[1], 0))
+
+    peak = np.nanmax(grid) if grid.size else 0
+    masked = np.ma.masked_less_equal(grid, threshold * peak)
+    ax.imshow(masked, cmap=cmap, alpha=alpha if image is not None else 1, extent=(0, size[0], size[1], 0),
+              interpolation='bilinear')
+    ax.set_axis_off()
+    ax.set_title(title)
+
+    plt.savefig(f"{out_path}plot_gaze_heatmap_{title}{tag if tag else ''}.png", dpi=300, transparent=True, bbox_inches="tight")
+    plt.close()
+
+    print(f">>> Plotted: {title}")
+
+
 def double_bar(out_folder, xcol, y1col, y2col, bar1_color ='#dadfe2', bar2_color='#dadfe2', xlabel = '', ylabel='', y1label = '', y2label = '', title = '', tags =['',], highlight = {'':'',}, y1lim =None, ymin =None ,ymax =None  ):
     out_path = f"{out_folder}"
     os.makedirs(out_path, exist_ok=True)    
@@ -869,7 +917,8 @@ def multi_bar(out_folder, x_data, y_data, xlabel='', ylabel='', title='', tags=[
         A list of labels for the x-axis.
     y_data : dict
         A dictionary containing data for the y-axis. Each key should map to a dictionary with keys 'values' (a list of y-values),
-        'color' (the color of the bars), and 'label' (the label for the legend).
+        'color' (the color of the bars), and 'label' (the label for the legend). An optional 'err' key holds
+        error bars as taken by matplotlib's yerr, e.g. proportions.error_bars.
     xlabel : str, optional
         The label for the x-axis (default is an empty string).
     ylabel : str, optional
@@ -931,6 +980,8 @@ def multi_bar(out_folder, x_data, y_data, xlabel='', ylabel='', title='', tags=[
     for y in y_data:
         x_adjusted = x+[x_placement[i]]
         ax1.bar(x_adjusted ,y_data[y]['values'],width, color= y_data[y]['color'], label = y_data[y]['label'])
+        if y_data[y].get('err') is not None:
+            ax1.errorbar(x_adjusted, y_data[y]['values'], yerr=y_data[y]['err'], fmt='none', ecolor='black', elinewidth=0.8, capsize=2)
         i += 1
     
     if legend:
@@ -0,0 +1,276 @@
+"""
+Monte-Carlo power and sample size for study designs.
+
+Synthetic datasets are generated from group means and standard deviations
+(e.g. the effect sizes and spreads of an earlier study) or resampled from pilot
+data, thousands at a time: every dataset is one column of a (respondents,
+datasets) matrix, as in screening. Each column then goes through the same test
+selection as stats.get_significance - Shapiro-Wilk per group, median Levene,
+then ANOVA / Kruskal-Wallis / Welch ANOVA or a t-test / Mann-Whitney U /
+Wilcoxon - as array expressions over all columns, so sweeping sample sizes and
+designs takes seconds.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.special import ndtri
+
+from .screening import group_moments, ttests, anovas, kruskals
+
+# Royston (1992) polynomials for the two largest Shapiro-Wilk coefficients
+_SW_C1 = [-2.706056, 4.434685, -2.07119, -0.147981, 0.221157, 0]
+_SW_C2 = [-3.582633, 5.682633, -1.752461, -0.293762, 0.042981, 0]
+
+
+def shapiro(x) -> tuple:
+    """
+    Shapiro-Wilk test of every column, as scipy.stats.shapiro (AS R94).
+
+    Parameters:
+    - x: (n, n_columns) samples without missing values, n >= 3
+
+    Returns:
+    - tuple: (W, p-value) arrays, one value per column
+    """
+    x = np.sort(np.asarray(x, dtype=float), axis=0)
+    n = x.shape[0]
+    half = n // 2
+    if n == 3:
+        a = np.array([np.sqrt(0.5)])
+    else:
+        m = -ndtri((np.arange(1, half + 1) - 0.375) / (n + 0.25))
+        summ2 = 2 * (m ** 2).sum()
+        u = 1 / np.sqrt(n)
+        a1 = np.polyval(_SW_C1, u) + m[0] / np.sqrt(summ2)
+        if n > 5:
+            a2 = np.polyval(_SW_C2, u) + m[1] / np.sqrt(summ2)
+            fac = np.sqrt((summ2 - 2 * m[0] ** 2 - 2 * m[1] ** 2) / (1 - 2 * a1 ** 2 - 2 * a2 ** 2))
+            a = np.r_[a1, a2, m[2:] / fac]
+        else:
+            fac = np.sqrt((summ2 - 2 * m[0] ** 2) / (1 - 2 * a1 ** 2))
+            a = np.r_[a1, m[1:] / fac]
+
+    ss = ((x - x.mean(axis=0)) ** 2).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = np.minimum((a @ (x[::-1][:half] - x[:half])) ** 2 / ss, 1.0)
+        if n == 3:
+            return w, np.maximum(6 / np.pi * (np.arcsin(np.sqrt(w)) - np.arcsin(np.sqrt(0.75))), 0.0)
+        y = np.log1p(-w)
+        if n <= 11:
+            gamma = np.polyval([0.459, -2.273], n)
+            mu = np.polyval([-6.714e-4, 0.025054, -0.39978, 0.544], n)
+            sigma = np.exp(np.polyval([-0.0020322, 0.062767, -0.77857, 1.3822], n))
+            p = np.where(y >= gamma, 1e-99, stats.norm.sf((-np.log(gamma - y) - mu) / sigma))
+        else:
+            mu = np.polyval([0.0038915, -0.083751, -0.31082, -1.5861], np.log(n))
+            sigma = np.exp(np.polyval([0.0030302, -0.082676, -0.4803], np.log(n)))
+            p = stats.norm.sf((y - mu) / sigma)
+    return w, p
+
+
+def _indicator(sizes) -> np.ndarray:
+    return np.repeat(np.eye(len(sizes)), sizes, axis=0)
+
+
+def _welch_anova(n: np.ndarray, mean: np.ndarray, ss: np.ndarray) -> np.ndarray:
+    """
+    Welch ANOVA p-value of every column from group moments, as stats_kernels.welch_anova.
+    """
+    r = len(n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights = n / (ss / (n - 1))
+        total = weights.sum(axis=0)
+        adjusted = (weights * mean).sum(axis=0) / total
+        numerator = (weights * (mean - adjusted) ** 2).sum(axis=0) / (r - 1)
+        lamb = 3 * ((1 - weights / total) ** 2 / (n - 1)).sum(axis=0) / (r ** 2 - 1)
+        f = numerator / (1 + 2 * lamb * (r - 2) / 3)
+        return stats.f.sf(f, r - 1, 1 / lamb)
+
+
+def simulated_significance(samples, *, paired: bool = False, alpha: float = 0.05) -> pd.DataFrame:
+    """
+    Runs the test selection of stats.get_significance on every column of the group samples.
+
+    Groups with fewer than three values are not tested (p-value 1) and groups of exactly three
+    get a 0 appended, as get_significance does. With more than two groups only the omnibus test
+    is run; the Wilcoxon test is not swapped for a bootstrap when scipy warns about ties.
+
+    Parameters:
+    - samples: One (n_group, n_datasets) array per group, datasets in columns
+    - paired: Paired design (two equal sized groups with matching rows)
+    - alpha: Level of the normality and equal variance checks
+
+    Returns:
+    - pd.DataFrame: 'p-val' and 'Type' (the test get_significance would report) per dataset
+
+    Raises:
+    - ValueError: If fewer than two groups are given, or paired groups differ in size
+    """
+    samples = [np.asarray(s, dtype=float) for s in samples]
+    if len(samples) < 2:
+        raise ValueError(f"At least two groups are needed, not {len(samples)}")
+    columns = samples[0].shape[1]
+    if any(len(s) < 3 for s in samples):
+        return pd.DataFrame({'p-val': np.ones(columns), 'Type': np.full(columns, np.nan, dtype=object)})
+    samples = [np.vstack([s, np.zeros((1, columns))]) if len(s) == 3 else s for s in samples]
+
+    normal = np.logical_and.reduce([shapiro(s)[1] > alpha for s in samples])
+    sizes = [len(s) for s in samples]
+    indicator = _indicator(sizes)
+    values = np.vstack(samples)
+    spread = np.vstack([np.abs(s - np.median(s, axis=0)) for s in samples])
+    equal_var = anovas(spread, indicator)['p-val'].to_numpy() > alpha
+
+    if len(samples) > 2:
+        n, mean, ss = group_moments(values, indicator)
+        residuals_normal = shapiro(values - indicator @ mean)[1] > alpha
+        p_anova = anovas(values, indicator)['p-val'].to_numpy()
+        p_kruskal = kruskals(values, indicator)['p-val'].to_numpy()
+        p_welch = _welch_anova(n, mean, ss)
+        use_anova = equal_var & residuals_normal
+        use_kruskal = equal_var & ~residuals_normal
+        p = np.select([use_anova, use_kruskal], [p_anova, p_kruskal], default=p_welch)
+        kind = np.select([use_anova, use_kruskal], ['ANOVA', 'Kruskal-Wallis'], default='ANOVA Welch')
+    elif paired:
+        if sizes[0] != sizes[1]:
+            raise ValueError(f"Paired groups need the same size, not {sizes}")
+        control, treatment = samples[1], samples[0]
+        d = control - treatment
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = d.mean(axis=0) / (d.std(axis=0, ddof=1) / np.sqrt(len(d)))
+        p_t = 2 * stats.t.sf(np.abs(t), len(d) - 1)
+        p_wilcoxon = stats.wilcoxon(control, treatment, axis=0, correction=True).pvalue
+        p = np.where(normal, p_t, p_wilcoxon)
+        kind = np.where(normal, 'Paired T-Test', 'Wilcoxin')
+    else:
+        control, treatment = samples[1], samples[0]
+        p_t = ttests(np.vstack([control, treatment]), _indicator(sizes[::-1]))['p-val'].to_numpy()
+        p_mwu = stats.mannwhitneyu(control, treatment, axis=0, use_continuity=True,
+                                   alternative='two-sided').pvalue
+        p = np.where(normal, p_t, p_mwu)
+        kind = np.where(normal, 'Independent T-Test', 'Mann-Whitney U')
+    return pd.DataFrame({'p-val': p, 'Type': kind.astype(object)})
+
+
+def _sizes(n, groups: int) -> list:
+    sizes = [int(n)] * groups if np.isscalar(n) else [int(v) for v in n]
+    if len(sizes) != groups:
+        raise ValueError(f"Got {len(sizes)} group sizes for {groups} groups")
+    return sizes
+
+
+def _sampler(means, sds, pilot, paired: bool, correlation: float):
+    """
+    Returns a function drawing (n_group, n_datasets) samples for every group.
+    """
+    if pilot is not None:
+        pilot = [np.asarray(v, dtype=float)[~np.isnan(np.asarray(v, dtype=float))] for v in pilot.values()]
+
+        def draw(rng, sizes, columns):
+            if paired:
+                rows = rng.integers(0, min(len(v) for v in pilot), size=(sizes[0], columns))
+                return [v[rows] for v in pilot]
+            return [rng.choice(v, size=(size, columns)) for v, size in zip(pilot, sizes)]
+        return draw, len(pilot)
+
+    means = np.asarray(means, dtype=float)
+    sds = np.broadcast_to(np.asarray(sds, dtype=float), means.shape)
+
+    def draw(rng, sizes, columns):
+        if paired:
+            # Equal correlation between the repeated measures of a respondent
+            shared = rng.standard_normal((sizes[0], columns))
+            return [m + s * (np.sqrt(correlation) * shared
+                             + np.sqrt(1 - correlation) * rng.standard_normal((sizes[0], columns)))
+                    for m, s in zip(means, sds)]
+        return [m + s * rng.standard_normal((size, columns)) for m, s, size in zip(means, sds, sizes)]
+    return draw, len(means)
+
+
+def power_curve(ns, means=None, sds=1.0, *, effect: float = None, pilot: dict = None, paired: bool = False,
+                correlation: float = 0.5, n_sim: int = 2000, alpha: float = 0.05, confidence: float = 0.95,
+                seed=None, block: int = 1000) -> pd.DataFrame:
+    """
+    Simulated power of get_significance for a range of sample sizes.
+
+    The design is given by one of:
+    - means (and sds): Normal groups, e.g. the group means and standard deviations of an earlier study
+    - effect: A standardised difference between two groups, e.g. 'Hedges g' from a significance table
+    - pilot: Dictionary of group name to observed values, resampled with replacement
+
+    Parameters:
+    - ns: Sample sizes to simulate, each one size for every group or a size per group
+    - paired: Paired (repeated measures) design; normal groups then share a respondent effect
+    - correlation: Correlation between a respondent's paired measures
+    - n_sim: Synthetic datasets per sample size
+    - alpha: Significance level, also used for the normality and equal variance checks
+    - confidence: Coverage of the power interval (Wilson)
+    - seed: Seed or np.random.Generator
+    - block: Datasets simulated per batch, bounds memory to block * total size values
+
+    Returns:
+    - pd.DataFrame: 'n' (as given), 'N' (total respondents), 'Power' with 'CI Low' and 'CI High',
+      and the share of datasets analysed by each test, one row per sample size
+
+    Raises:
+    - ValueError: If no design, or more than one, is given
+    """
+    if sum(v is not None for v in (means, effect, pilot)) != 1:
+        raise ValueError("Give exactly one of means, effect or pilot")
+    if effect is not None:
+        means, sds = [effect, 0.0], 1.0
+    draw, groups = _sampler(means, sds, pilot, paired, correlation)
+    rng = np.random.default_rng(seed)
+    z = stats.norm.ppf(0.5 + confidence / 2)
+
+    rows = []
+    for n in ns:
+        sizes = _sizes(n, groups)
+        significant = 0
+        types = {}
+        for start in range(0, n_sim, block):
+            columns = min(block, n_sim - start)
+            result = simulated_significance(draw(rng, sizes, columns), paired=paired, alpha=alpha)
+            significant += int((result['p-val'] < alpha).sum())
+            for kind, count in result['Type'].value_counts().items():
+                types[kind] = types.get(kind, 0) + count
+        power = significant / n_sim
+        # Wilson score interval of the simulated proportion
+        centre = (power + z ** 2 / (2 * n_sim)) / (1 + z ** 2 / n_sim)
+        half = z / (1 + z ** 2 / n_sim) * np.sqrt(power * (1 - power) / n_sim + z ** 2 / (4 * n_sim ** 2))
+        rows.append({'n': n, 'N': sum(sizes), 'Power': power, 'CI Low': centre - half, 'CI High': centre + half,
+                     **{kind: count / n_sim for kind, count in types.items()}})
+    curve = pd.DataFrame(rows)
+    kinds = [c for c in curve.columns if c not in ('n', 'N', 'Power', 'CI Low', 'CI High')]
+    curve[kinds] = curve[kinds].fillna(0.0)
+    return curve
+
+
+def sample_size(curve: pd.DataFrame, power: float = 0.8):
+    """
+    Smallest simulated sample size reaching the target power, NaN if none does.
+    """
+    reached = curve.loc[curve['Power'] >= power, 'n']
+    return reached.iloc[0] if len(reached) else np.nan
+
+
+def power_grid(designs: dict, ns, **kwargs) -> pd.DataFrame:
+    """
+    Power curves of many designs.
+
+    Parameters:
+    - designs: Design name to keyword arguments of power_curve (e.g. {'means': [...], 'sds': [...]})
+    - ns: Sample sizes, see power_curve
+    - kwargs: Settings shared by every design (n_sim, paired, seed, ...)
+
+    Returns:
+    - pd.DataFrame: The curves with a 'Design' column
+    """
+    rng = np.random.default_rng(kwargs.pop('seed', None))
+    curves = []
+    for name, design in designs.items():
+        curve = power_curve(ns, **{**kwargs, **design}, seed=rng)
+        curve.insert(0, 'Design', name)
+        curves.append(curve)
+    return pd.concat(curves, ignore_index=True) if curves else pd.DataFrame()
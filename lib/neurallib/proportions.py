@@ -0,0 +1,190 @@
+"""
+Bootstrap confidence intervals for choice proportions.
+
+Choice tasks report the percentage of trials a route, category or variant was
+chosen. A row-resampling bootstrap of a proportion only depends on its counts,
+so resamples are drawn directly as binomial (chosen of n) or multinomial (shares
+of several options) counts for all clusters at once, one array per block of
+clusters, and percentile or BCa intervals are read off the sorted resamples.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+METHODS = ('percentile', 'bca')
+
+
+def _row_quantiles(ordered: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    Linear interpolated quantiles of sorted rows, with a separate level per row.
+    """
+    position = np.clip(q, 0, 1) * (ordered.shape[-1] - 1)
+    lo = np.floor(position).astype(np.int64)
+    hi = np.minimum(lo + 1, ordered.shape[-1] - 1)
+    frac = position - lo
+    lower = np.take_along_axis(ordered, lo[..., None], axis=-1)[..., 0]
+    upper = np.take_along_axis(ordered, hi[..., None], axis=-1)[..., 0]
+    return lower + (upper - lower) * frac
+
+
+def _intervals(boot: np.ndarray, estimate: np.ndarray, jackknife: np.ndarray, weights: np.ndarray,
+               confidence: float, method: str) -> tuple:
+    """
+    Percentile or BCa interval of every row of boot.
+
+    Parameters:
+    - boot: Resampled estimates, resamples on the last axis
+    - estimate: Estimate from the observed counts
+    - jackknife, weights: Leave-one-out estimates and how many observations give each
+      (the jackknife of a proportion takes one value per outcome)
+    - confidence, method: See bootstrap_proportions
+
+    Returns:
+    - tuple: (low, high)
+    """
+    ordered = np.sort(boot, axis=-1)
+    tail = (1 - confidence) / 2
+    q = np.broadcast_to(np.array([tail, 1 - tail]), estimate.shape + (2,))
+    if method == 'bca':
+        # Bias correction and acceleration as scipy.stats.bootstrap(method='BCa')
+        z0 = ndtri(((boot < estimate[..., None]).mean(axis=-1) + (boot <= estimate[..., None]).mean(axis=-1)) / 2)
+        mean = (weights * jackknife).sum(axis=-1) / weights.sum(axis=-1)
+        d = mean[..., None] - jackknife
+        with np.errstate(invalid='ignore', divide='ignore'):
+            a = (weights * d ** 3).sum(axis=-1) / (6 * (weights * d ** 2).sum(axis=-1) ** 1.5)
+        a = np.nan_to_num(a)
+        z = ndtri(q)
+        with np.errstate(invalid='ignore'):
+            adjusted = ndtr(z0[..., None] + (z0[..., None] + z) / (1 - a[..., None] * (z0[..., None] + z)))
+        # A resample distribution entirely above or below the estimate has no usable correction
+        q = np.where(np.isfinite(adjusted), adjusted, q)
+    low = _row_quantiles(ordered, q[..., 0])
+    high = _row_quantiles(ordered, q[..., 1])
+    return low, high
+
+
+def bootstrap_proportions(chosen, total, *, n_boot: int = 10000, confidence: float = 0.95,
+                          method: str = 'bca', seed=None, block: int = 256) -> pd.DataFrame:
+    """
+    Bootstrap intervals of many proportions, resampling counts binomially.
+
+    Parameters:
+    - chosen: Number of trials each option was chosen, one per cluster
+    - total: Number of trials each option was shown, one per cluster
+    - n_boot: Resamples per cluster
+    - confidence: Interval coverage
+    - method: 'percentile' or 'bca'
+    - seed: Seed or np.random.Generator
+    - block: Clusters resampled together, bounds memory to block * n_boot counts
+
+    Returns:
+    - pd.DataFrame: 'Proportion', 'CI Low' and 'CI High' in percent, and 'n', one row per cluster
+      (NaN where total is 0)
+
+    Raises:
+    - ValueError: If method is unknown or chosen exceeds total
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {list(METHODS)}, not {method!r}")
+    chosen = np.asarray(chosen, dtype=np.int64).ravel()
+    total = np.asarray(total, dtype=np.int64).ravel()
+    if np.any(chosen > total) or np.any(chosen < 0):
+        raise ValueError("chosen must be between 0 and total")
+    rng = np.random.default_rng(seed)
+
+    low = np.full(len(total), np.nan)
+    high = np.full(len(total), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = chosen / total
+        # Removing a chosen trial gives (c - 1) / (n - 1), removing another one c / (n - 1)
+        jackknife = np.stack([(chosen - 1) / (total - 1), chosen / (total - 1)], axis=-1)
+    weights = np.stack([chosen, total - chosen], axis=-1).astype(float)
+
+    valid = np.flatnonzero(total > 0)
+    for start in range(0, len(valid), block):
+        rows = valid[start:start + block]
+        boot = rng.binomial(total[rows, None], p[rows, None], size=(len(rows), n_boot)) / total[rows, None]
+        low[rows], high[rows] = _intervals(boot, p[rows], jackknife[rows], weights[rows], confidence, method)
+
+    return pd.DataFrame({'Proportion': p * 100, 'CI Low': low * 100, 'CI High': high * 100, 'n': total})
+
+
+def bootstrap_shares(counts, *, n_boot: int = 10000, confidence: float = 0.95, method: str = 'bca',
+                     seed=None, block: int = 64) -> tuple:
+    """
+    Bootstrap intervals of choice shares, resampling each cluster's counts multinomially.
+
+    Use this when every trial ends in exactly one of several options, so the shares
+    of a cluster sum to 100 and vary together.
+
+    Parameters:
+    - counts: (n_clusters, n_options) times each option was chosen, or a DataFrame of them
+    - n_boot, confidence, method, seed: See bootstrap_proportions
+    - block: Clusters resampled together
+
+    Returns:
+    - tuple: (share, low, high) arrays of shape (n_clusters, n_options) in percent,
+      DataFrames with the index and columns of counts if counts was one
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {list(METHODS)}, not {method!r}")
+    frame = counts if isinstance(counts, pd.DataFrame) else None
+    counts = np.atleast_2d(np.asarray(counts, dtype=np.int64))
+    rng = np.random.default_rng(seed)
+    total = counts.sum(axis=1)
+
+    share = np.full(counts.shape, np.nan)
+    low = np.full(counts.shape, np.nan)
+    high = np.full(counts.shape, np.nan)
+    valid = np.flatnonzero(total > 0)
+    share[valid] = counts[valid] / total[valid, None]
+
+    eye = np.eye(counts.shape[1])
+    for start in range(0, len(valid), block):
+        rows = valid[start:start + block]
+        n = total[rows]
+        boot = rng.multinomial(n[:, None], share[rows, None, :], size=(len(rows), n_boot)) / n[:, None, None]
+        boot = np.moveaxis(boot, 1, -1)
+        # Removing a trial of option j changes option m to (c_m - [m == j]) / (n - 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            jackknife = (counts[rows, :, None] - eye[None]) / (n[:, None, None] - 1)
+        weights = np.broadcast_to(counts[rows, None, :].astype(float), jackknife.shape)
+        low[rows], high[rows] = _intervals(boot, share[rows], jackknife, weights, confidence, method)
+
+    share, low, high = share * 100, low * 100, high * 100
+    if frame is not None:
+        return tuple(pd.DataFrame(v, index=frame.index, columns=frame.columns) for v in (share, low, high))
+    return share, low, high
+
+
+def proportion_table(df: pd.DataFrame, by, chosen_col: str = 'Preferred', **kwargs) -> pd.DataFrame:
+    """
+    Proportion chosen and its bootstrap interval for every group of a trial table.
+
+    Parameters:
+    - df: One row per trial with a 0/1 chosen_col
+    - by: Column or columns defining the clusters (e.g. ['Cluster', 'Route'])
+    - chosen_col: Column marking a choice
+    - kwargs: Passed to bootstrap_proportions
+
+    Returns:
+    - pd.DataFrame: The by columns with 'Proportion', 'CI Low', 'CI High' and 'n'
+
+    Raises:
+    - KeyError: If a column cannot be found in df
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    missing = [c for c in [*by, chosen_col] if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+    counts = df.groupby(by, sort=False)[chosen_col].agg(['sum', 'count']).reset_index()
+    cis = bootstrap_proportions(counts['sum'].to_numpy(), counts['count'].to_numpy(), **kwargs)
+    return pd.concat([counts[by], cis], axis=1)
+
+
+def error_bars(table: pd.DataFrame, value_col: str = 'Proportion') -> np.ndarray:
+    """
+    Converts value_col, 'CI Low' and 'CI High' into the (2, n) yerr matplotlib's bar takes.
+    """
+    return np.vstack([table[value_col] - table['CI Low'], table['CI High'] - table[value_col]])
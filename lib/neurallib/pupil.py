@@ -0,0 +1,180 @@
+"""
+Pupil response metrics per fixation.
+
+All fixation segments are concatenated into one ragged array with offsets
+(see segments), each respondent's pupil trace is low-pass filtered once, and
+the per-fixation tonic mean, dPD, peak count and ICA-like peak rate are
+np.add.reduceat reductions over the segments, instead of a filter and
+find_peaks call per fixation.
+"""
+
+import numpy as np
+import pandas as pd
+import scipy.signal as signal
+
+
+def segments(codes, n: int = None):
+    """
+    Orders samples into contiguous per-fixation segments.
+
+    Parameters:
+    - codes: Fixation of every sample, -1 for none (as returned by
+      fixations.build_fixation_table(..., samples=True))
+    - n: Number of fixations, defaults to codes.max() + 1
+
+    Returns:
+    - tuple: (order, offsets) where order gives the sample positions grouped by fixation
+      (original order kept within a fixation) and fixation i is order[offsets[i]:offsets[i + 1]]
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    n = int(codes.max()) + 1 if n is None and len(codes) else (n or 0)
+    used = np.flatnonzero(codes >= 0)
+    order = used[np.argsort(codes[used], kind='stable')]
+    offsets = np.r_[0, np.cumsum(np.bincount(codes[used], minlength=n))]
+    return order, offsets
+
+
+def lowpass(values, *, rate: float = 60, cutoff: float = 2, order: int = 8, groups=None, times=None) -> np.ndarray:
+    """
+    Zero-phase Butterworth low-pass filter, applied once per trace.
+
+    Gaps are linearly interpolated before filtering and set back to NaN after.
+    With times, the valid samples of each trace are first resampled onto a
+    regular grid at rate, so rows of other sensors in an interleaved export do
+    not change the filter's time scale.
+
+    Parameters:
+    - values: Pupil samples in time order
+    - rate: Sampling rate (Hz)
+    - cutoff: Cutoff frequency (Hz)
+    - order: Filter order
+    - groups: Optional trace label of every sample (e.g. respondent); each trace is filtered separately
+    - times: Optional time (ms) of every sample
+
+    Returns:
+    - np.ndarray: Filtered values, NaN where values were missing
+    """
+    values = np.asarray(values, dtype=float)
+    times = None if times is None else np.asarray(times, dtype=float)
+    sos = signal.butter(order, cutoff / (0.5 * rate), 'lowpass', output='sos')
+    result = np.full(len(values), np.nan)
+    if groups is None:
+        traces = [np.arange(len(values))]
+    else:
+        traces = pd.Series(np.asarray(groups)).groupby(np.asarray(groups), sort=False).indices.values()
+    for rows in traces:
+        if times is not None:
+            result[rows] = _resampled_lowpass(values[rows], times[rows], sos, rate)
+            continue
+        y = values[rows]
+        valid = ~np.isnan(y)
+        if valid.sum() < 2:
+            result[rows] = y
+            continue
+        filled = y if valid.all() else np.interp(np.arange(len(y)), np.flatnonzero(valid), y[valid])
+        padlen = min(3 * (2 * len(sos) + 1), len(y) - 1)
+        result[rows] = np.where(valid, signal.sosfiltfilt(sos, filled, padlen=padlen), np.nan)
+    return result
+
+
+def _resampled_lowpass(y: np.ndarray, t: np.ndarray, sos: np.ndarray, rate: float) -> np.ndarray:
+    """
+    Filters the valid samples of one trace on a regular grid and reads the result back at their times.
+    """
+    result = np.full(len(y), np.nan)
+    valid = np.flatnonzero(~np.isnan(y) & np.isfinite(t))
+    valid = valid[np.argsort(t[valid], kind='stable')]
+    if len(valid) < 2 or t[valid[-1]] <= t[valid[0]]:
+        result[valid] = y[valid]
+        return result
+    step = 1000 / rate
+    grid = np.arange(t[valid[0]], t[valid[-1]] + step, step)
+    resampled = np.interp(grid, t[valid], y[valid])
+    padlen = min(3 * (2 * len(sos) + 1), len(grid) - 1)
+    result[valid] = np.interp(t[valid], grid, signal.sosfiltfilt(sos, resampled, padlen=padlen))
+    return result
+
+
+def segment_peaks(values, starts) -> np.ndarray:
+    """
+    Counts local maxima (height >= 0) within each segment of a concatenated array.
+
+    Matches scipy.signal.find_peaks(segment, height=0) per segment: flat peaks
+    count once and segment edges are never peaks.
+
+    Parameters:
+    - values: Concatenated segment values
+    - starts: Start offset of every segment, plus len(values) at the end
+
+    Returns:
+    - np.ndarray: Peak count per segment
+    """
+    values = np.asarray(values, dtype=float)
+    starts = np.asarray(starts, dtype=np.int64)
+    n = len(starts) - 1
+    if not len(values):
+        return np.zeros(n, dtype=np.int64)
+    seg = np.repeat(np.arange(n), np.diff(starts))
+
+    # Collapse runs of equal values so plateaus become single points
+    run = np.r_[True, (seg[1:] != seg[:-1]) | (values[1:] != values[:-1])]
+    v, s = values[run], seg[run]
+    peak = np.zeros(len(v), dtype=bool)
+    peak[1:-1] = (s[:-2] == s[1:-1]) & (s[2:] == s[1:-1]) & (v[:-2] < v[1:-1]) & (v[2:] < v[1:-1]) & (v[1:-1] >= 0)
+    return np.bincount(s[peak], minlength=n)
+
+
+def pupil_metrics(pupil, codes, *, n: int = None, duration=None, groups=None, times=None, rate: float = 60,
+                  cutoff: float = 2, order: int = 8) -> pd.DataFrame:
+    """
+    Computes pupil response metrics for every fixation at once.
+
+    Only samples with a pupil value belong to a fixation's segment, so missing
+    samples (and rows of other sensors) neither dilute nor break the reductions.
+
+    Parameters:
+    - pupil: Pupil diameter of every sample (e.g. mean of 'ET_PupilLeft' and 'ET_PupilRight')
+    - codes: Fixation of every sample, -1 for none
+    - n: Number of fixations, defaults to codes.max() + 1
+    - duration: Optional duration (ms) of every fixation, used for 'ICA'
+    - groups: Optional respondent of every sample; each respondent's trace is filtered separately
+    - times: Optional time (ms) of every sample, needed for interleaved multi-sensor exports (see lowpass)
+    - rate, cutoff, order: Low-pass filter settings, see lowpass
+
+    Returns:
+    - pd.DataFrame: One row per fixation with 'Tonic' (mean diameter), 'dPD' (filtered change from
+      first to last sample), 'Peaks' (local maxima of the raw trace) and 'ICA' (peaks per second,
+      NaN without duration)
+    """
+    pupil = np.asarray(pupil, dtype=float)
+    filtered = lowpass(pupil, rate=rate, cutoff=cutoff, order=order, groups=groups, times=times)
+    codes = np.asarray(codes, dtype=np.int64)
+    if n is None:
+        n = int(codes.max()) + 1 if len(codes) else 0
+    index, offsets = segments(np.where(np.isnan(pupil), -1, codes), n)
+    n = len(offsets) - 1
+
+    raw = pupil[index]
+    valid = ~np.isnan(raw)
+    starts = offsets[:-1]
+    filled = np.diff(offsets) > 0
+    sums = np.zeros(n)
+    counts = np.zeros(n)
+    if len(raw):
+        # reduceat on non-empty segments only, an empty one would repeat its neighbour
+        sums[filled] = np.add.reduceat(np.where(valid, raw, 0.0), starts[filled])
+        counts[filled] = np.add.reduceat(valid.astype(float), starts[filled])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tonic = sums / counts
+
+    smooth = filtered[index]
+    dpd = np.full(n, np.nan)
+    dpd[filled] = smooth[offsets[1:][filled] - 1] - smooth[starts[filled]]
+
+    peaks = segment_peaks(raw, offsets)
+    ica = np.full(n, np.nan)
+    if duration is not None:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ica = peaks / np.asarray(duration, dtype=float) * 1000
+
+    return pd.DataFrame({'Tonic': tonic, 'dPD': dpd, 'Peaks': peaks, 'ICA': ica})
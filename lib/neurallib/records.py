@@ -0,0 +1,183 @@
+"""
+Compact structured-array records for fixation and AOI tables.
+
+Records stores a table as one NumPy structured array: label columns (respondent,
+stimulus, AOI, variant, ...) become small integer codes into per-column
+dictionaries, and times become float32. A fixation row takes about 20 bytes
+instead of several hundred for object columns, and converts back to pandas
+through pd.Categorical.from_codes without materialising any strings.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+FIXATION_SCHEMA = {'Res': 'category', 'Stim': 'category', 'AOI': 'category', 'Timestamp': 'f4',
+                   'Index': 'i4', 'Duration': 'f4', 'End': 'f4'}
+
+
+def _code_dtype(size: int) -> str:
+    """
+    Smallest signed integer dtype holding size codes and -1 for missing.
+    """
+    for dtype in ('i1', 'i2', 'i4'):
+        if size < np.iinfo(dtype).max:
+            return dtype
+    return 'i8'
+
+
+class Records:
+    """
+    Structured array of rows with dictionary coded label columns.
+    """
+
+    def __init__(self, data: np.ndarray, categories: dict = None):
+        """
+        Initializes a new Records.
+
+        :param data: Structured array, one field per column.
+        :param categories: Dictionary of column name to its labels, for the code columns.
+        """
+        self.data = data
+        self.categories = {k: list(v) for k, v in (categories or {}).items()}
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def columns(self) -> list:
+        return list(self.data.dtype.names)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, schema: dict = None) -> 'Records':
+        """
+        Builds records from a DataFrame.
+
+        Parameters:
+        - df: The table, e.g. from fixations.build_fixation_table
+        - schema: Column name to 'category' or a NumPy dtype (e.g. 'f4'). Defaults to FIXATION_SCHEMA
+          for the columns it covers, 'category' for other non-numeric columns and 'f4' for the rest.
+
+        Returns:
+        - Records: The coded table
+
+        Raises:
+        - KeyError: If a schema column cannot be found in df
+        """
+        if schema is None:
+            schema = {c: FIXATION_SCHEMA.get(c, 'f4' if pd.api.types.is_numeric_dtype(df[c]) else 'category')
+                      for c in df.columns}
+        missing = [c for c in schema if c not in df.columns]
+        if missing:
+            raise KeyError(f"{missing} columns missing from DataFrame")
+
+        fields, values, categories = [], {}, {}
+        for c, dtype in schema.items():
+            if dtype == 'category':
+                codes, labels = pd.factorize(df[c])
+                categories[c] = list(labels)
+                dtype = _code_dtype(len(labels))
+                values[c] = codes
+            else:
+                values[c] = pd.to_numeric(df[c], errors='coerce').to_numpy()
+                if np.dtype(dtype).kind in 'iu':
+                    values[c] = np.nan_to_num(values[c], nan=-1)
+            fields.append((c, dtype))
+
+        data = np.empty(len(df), dtype=fields)
+        for c in schema:
+            data[c] = values[c]
+        return cls(data, categories)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Converts back to a DataFrame; coded columns become pd.Categorical without copying labels per row.
+        """
+        frame = {}
+        for c in self.columns:
+            if c in self.categories:
+                frame[c] = pd.Categorical.from_codes(self.data[c].astype(np.int64, copy=False),
+                                                     categories=pd.Index(self.categories[c], dtype=object))
+            else:
+                frame[c] = self.data[c]
+        return pd.DataFrame(frame)
+
+    def codes(self, column: str) -> np.ndarray:
+        """
+        Returns the integer codes of a coded column (labels in categories[column]).
+        """
+        return self.data[column]
+
+    @staticmethod
+    def concat(records: list) -> 'Records':
+        """
+        Concatenates records with the same columns, merging their dictionaries.
+
+        Codes of every part are remapped onto the merged dictionary with one
+        get_indexer per part and column.
+        """
+        records = [r for r in records if r is not None]
+        if not records:
+            raise ValueError("No records to concatenate")
+        columns = records[0].columns
+        categories = {}
+        for c in records[0].categories:
+            labels = pd.Index([])
+            for r in records:
+                labels = labels.append(pd.Index(r.categories[c]).difference(labels, sort=False))
+            categories[c] = list(labels)
+
+        fields = [(c, _code_dtype(len(categories[c])) if c in categories else records[0].data.dtype[c])
+                  for c in columns]
+        data = np.empty(sum(len(r) for r in records), dtype=fields)
+        position = 0
+        for r in records:
+            if r.columns != columns:
+                raise ValueError("Cannot concatenate records with different columns")
+            part = slice(position, position + len(r))
+            for c in columns:
+                if c in categories:
+                    lookup = np.r_[pd.Index(categories[c]).get_indexer(r.categories[c]), -1]
+                    data[c][part] = lookup[r.data[c]]
+                else:
+                    data[c][part] = r.data[c]
+            position += len(r)
+        return Records(data, categories)
+
+    def save(self, path: str) -> None:
+        """
+        Writes the array to path (.npy) and the dictionaries to a JSON sidecar.
+
+        Each dictionary is stored with the dtype of its labels, so numeric, boolean
+        and datetime labels come back as such from load. Labels of mixed types are
+        stored as strings.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as file:
+            np.save(file, self.data, allow_pickle=False)
+        sidecar = {}
+        for k, labels in self.categories.items():
+            index = pd.Index(labels)
+            values = index.tolist() if index.dtype.kind in 'biuf' else [str(v) for v in labels]
+            sidecar[k] = {'dtype': str(index.dtype), 'labels': values}
+        with open(f"{path}.json", 'w') as file:
+            json.dump(sidecar, file)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = None) -> 'Records':
+        """
+        Reads records written by save, optionally memory-mapped.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No records at {path}")
+        with open(f"{path}.json", 'r') as file:
+            sidecar = json.load(file)
+        #Sidecars without a dtype hold string labels
+        categories = {k: v if isinstance(v, list) else pd.Index(v['labels']).astype(v['dtype']).tolist()
+                      for k, v in sidecar.items()}
+        return cls(np.load(path, mmap_mode=mmap_mode, allow_pickle=False), categories)
@@ -0,0 +1,174 @@
+"""
+Timestamp based resampling of irregular sensor streams.
+
+iMotions exports interleave samples from every sensor on one row index, so the
+'Row' column is not a clock: EEG metrics arrive at ~1 Hz, raw EEG at 256 Hz,
+GSR and eye tracking at their own rates. The functions in this module place a
+stream on a uniform grid using its 'Timestamp' column (milliseconds) instead.
+"""
+
+import numpy as np
+import pandas as pd
+
+HOW = ('mean', 'last', 'interpolate')
+
+
+def uniform_grid(start: float, stop: float, rate: float, *, units_per_second: float = 1000.0) -> np.ndarray:
+    """
+    Builds a uniform time grid.
+
+    Parameters:
+    - start: First grid time
+    - stop: Grid times are strictly below this value
+    - rate: Grid rate in Hz
+    - units_per_second: Number of time units per second (1000 for iMotions ms)
+
+    Returns:
+    - np.ndarray: Grid times in the same units as start and stop
+    """
+    if rate <= 0:
+        raise ValueError(f"Expected a positive rate, got {rate}")
+    step = units_per_second / rate
+    n = max(int(np.ceil((stop - start) / step)), 0)
+    return start + step * np.arange(n)
+
+
+def resample(times, values, rate: float, *, how: str = 'mean', max_gap: float = None, start: float = None,
+             stop: float = None, units_per_second: float = 1000.0):
+    """
+    Resamples irregularly timed samples onto a uniform grid.
+
+    Every grid point t_k owns the bin [t_k, t_k + step). NaNs in values are
+    treated as missing per channel, so sparse channels sharing a timestamp
+    column with dense ones are handled correctly.
+
+    Parameters:
+    - times: 1-D array of sample times
+    - values: Array of shape (n_samples,) or (n_samples, n_channels)
+    - rate: Output rate in Hz
+    - how: 'mean' (bin average), 'last' (sample and hold) or 'interpolate' (linear)
+    - max_gap: Grid points inside a gap between valid samples longer than this
+      (same units as times) are set to NaN. Ignored for 'mean', where empty
+      bins are already NaN.
+    - start, stop: Grid limits, defaulting to the first and last sample time
+    - units_per_second: Number of time units per second (1000 for iMotions ms)
+
+    Returns:
+    - tuple: (grid, resampled) where resampled has shape (n_grid,) or (n_grid, n_channels)
+
+    Raises:
+    - ValueError: If how is unknown or times and values do not line up
+    """
+    if how not in HOW:
+        raise ValueError(f"Expected how to be one of {HOW}, got '{how}'")
+
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+    if len(times) != len(values):
+        raise ValueError(f"Got {len(times)} times for {len(values)} samples")
+
+    finite = np.isfinite(times)
+    times, values = times[finite], values[finite]
+    if len(times) and np.any(np.diff(times) < 0):
+        order = np.argsort(times, kind='stable')
+        times, values = times[order], values[order]
+
+    if start is None:
+        start = times[0] if len(times) else 0.0
+    if stop is None:
+        stop = times[-1] + units_per_second / rate if len(times) else start
+
+    grid = uniform_grid(start, stop, rate, units_per_second=units_per_second)
+    n_grid, n_channels = len(grid), values.shape[1]
+    out = np.full((n_grid, n_channels), np.nan)
+
+    if n_grid and len(times):
+        if how == 'mean':
+            # Bucket every sample once, then reduce all channels with a single bincount
+            step = units_per_second / rate
+            bins = np.floor((times - start) / step).astype(np.int64)
+            inside = (bins >= 0) & (bins < n_grid)
+            bins, _values = bins[inside], values[inside]
+            valid = ~np.isnan(_values)
+            flat = (bins[:, None] + n_grid * np.arange(n_channels))[valid]
+            sums = np.bincount(flat, weights=_values[valid], minlength=n_grid * n_channels)
+            counts = np.bincount(flat, minlength=n_grid * n_channels)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out = (sums / counts).reshape(n_channels, n_grid).T
+        else:
+            for ch in range(n_channels):
+                valid = ~np.isnan(values[:, ch])
+                t, v = times[valid], values[valid, ch]
+                if not len(t):
+                    continue
+                # Index of the last valid sample at or before each grid point
+                prev = np.searchsorted(t, grid, side='right') - 1
+                has_prev = prev >= 0
+                if how == 'last':
+                    out[has_prev, ch] = v[prev[has_prev]]
+                    if max_gap is not None:
+                        nxt = np.minimum(prev + 1, len(t) - 1)
+                        span = np.where(nxt > prev, t[nxt] - t[np.maximum(prev, 0)], grid - t[np.maximum(prev, 0)])
+                        out[has_prev & (span > max_gap), ch] = np.nan
+                else:
+                    inside = (grid >= t[0]) & (grid <= t[-1])
+                    out[inside, ch] = np.interp(grid[inside], t, v)
+                    if max_gap is not None:
+                        nxt = np.minimum(prev + 1, len(t) - 1)
+                        span = t[nxt] - t[np.maximum(prev, 0)]
+                        out[inside & (span > max_gap), ch] = np.nan
+
+    return grid, (out[:, 0] if squeeze else out)
+
+
+def resample_stream(df: pd.DataFrame, columns: list, rate: float, *, time_col: str = 'Timestamp', by=None,
+                    how: str = 'mean', max_gap: float = None, start: float = None, stop: float = None,
+                    units_per_second: float = 1000.0) -> pd.DataFrame:
+    """
+    Resamples sensor columns of a DataFrame onto a uniform grid.
+
+    Parameters:
+    - df: Input DataFrame containing time_col and columns
+    - columns: Sensor columns to resample (e.g. ['GSR Raw (microSiemens)'])
+    - rate: Output rate in Hz
+    - time_col: Column holding sample times
+    - by: Optional column or list of columns (e.g. 'Respondent') resampled independently
+    - how, max_gap, start, stop, units_per_second: See resample
+
+    Returns:
+    - pd.DataFrame: One row per grid point (per group), with time_col, the by columns and columns
+
+    Raises:
+    - KeyError: If time_col, by or columns cannot be found in df
+    """
+    keys = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    missing = [c for c in [time_col] + keys + list(columns) if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    values = df[list(columns)].apply(pd.to_numeric, errors='coerce')
+
+    def _frame(times, data, key=None):
+        grid, out = resample(times, data, rate, how=how, max_gap=max_gap, start=start, stop=stop,
+                             units_per_second=units_per_second)
+        result = pd.DataFrame(out, columns=list(columns))
+        result.insert(0, time_col, grid)
+        for i, k in enumerate(keys):
+            result.insert(i, k, key[i])
+        return result
+
+    times = pd.to_numeric(df[time_col], errors='coerce').to_numpy(dtype=float)
+    values = values.to_numpy(dtype=float)
+    if not keys:
+        return _frame(times, values)
+
+    frames = []
+    for key, index in df.groupby(keys, sort=True).indices.items():
+        key = key if isinstance(key, tuple) else (key,)
+        frames.append(_frame(times[index], values[index], key))
+    if not frames:
+        return pd.DataFrame(columns=keys + [time_col] + list(columns))
+    return pd.concat(frames, ignore_index=True)
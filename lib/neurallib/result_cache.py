@@ -0,0 +1,141 @@
+"""
+Content-addressed on-disk cache of analysis results.
+
+A result is stored under a fingerprint of its inputs: the bytes of every group
+array, the test configuration and the versions of the libraries computing it.
+Identical splits tested again in another loop, or in a rerun of the same
+notebook, hit the cache instead of recomputing. Entries are pickled DataFrames,
+one file per fingerprint, and the least recently used ones are evicted once the
+cache exceeds its entry or size limit.
+"""
+
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+
+
+def _versions() -> dict:
+    """
+    Versions of the libraries results depend on, so upgrades invalidate old entries.
+    """
+    import scipy
+    import pingouin
+    from . import __version__
+    return {'neurallib': __version__, 'numpy': np.__version__, 'scipy': scipy.__version__,
+            'pandas': pd.__version__, 'pingouin': pingouin.__version__}
+
+
+def fingerprint(group_data: dict, **config) -> str:
+    """
+    Hashes group arrays and a test configuration into a cache key.
+
+    Parameters:
+    - group_data: Dictionary of group name to values, hashed in order as float64
+    - config: Test settings that change the result (e.g. groups, paired, engine)
+
+    Returns:
+    - str: Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(sorted(_versions().items())).encode())
+    digest.update(repr(sorted(config.items())).encode())
+    for key, values in group_data.items():
+        values = np.ascontiguousarray(np.asarray(values, dtype=float).ravel())
+        digest.update(repr((key, len(values))).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Least recently used cache of DataFrames in a folder, keyed by fingerprint.
+    """
+
+    def __init__(self, folder: str, *, max_entries: int = 10000, max_bytes: int = None):
+        """
+        Initializes a new ResultCache, indexing entries already in folder.
+
+        :param folder: Folder holding the cache entries, created if needed.
+        :param max_entries: Maximum number of entries kept.
+        :param max_bytes: Optional maximum total size of the entries in bytes.
+        """
+        self.folder = folder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+        # Usage order is the file modification time, refreshed on every hit
+        entries = []
+        for name in os.listdir(folder):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(folder, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key: str):
+        return key in self._index
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self._index.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.pkl")
+
+    def get(self, key: str):
+        """
+        Returns the cached DataFrame for key, or None.
+        """
+        path = self._path(key)
+        if key not in self._index or not os.path.exists(path):
+            self._index.pop(key, None)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        os.utime(path)
+        self.hits += 1
+        return pd.read_pickle(path)
+
+    def put(self, key: str, frame: pd.DataFrame) -> None:
+        """
+        Stores frame under key and evicts the least recently used entries over the limits.
+        """
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        frame.to_pickle(temporary)
+        os.replace(temporary, path)
+        self._index[key] = os.path.getsize(path)
+        self._index.move_to_end(key)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries until the cache is within its limits.
+        """
+        total = self.nbytes
+        while self._index and (len(self._index) > self.max_entries
+                               or (self.max_bytes is not None and total > self.max_bytes)):
+            key, size = self._index.popitem(last=False)
+            total -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """
+        Removes every entry.
+        """
+        for key in list(self._index):
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        self._index.clear()
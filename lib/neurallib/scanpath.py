@@ -0,0 +1,216 @@
+"""
+AOI scanpaths built from fixation tables.
+
+A scanpath is the time ordered sequence of AOIs a respondent fixated on a
+stimulus. Scanpaths are held as one integer coded array with offsets, so
+transition counts, entropies and sequence similarities for thousands of
+respondent x stimulus pairs are computed with np.add.at, bincount and sparse
+accumulation instead of per-sequence loops.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class Scanpaths:
+    """
+    Integer coded AOI sequences, one per respondent and stimulus.
+    """
+
+    def __init__(self, codes: np.ndarray, offsets: np.ndarray, keys: pd.DataFrame, aois: list):
+        """
+        Initializes a new Scanpaths.
+
+        :param codes: Concatenated AOI codes of every sequence.
+        :param offsets: Start of every sequence in codes, plus len(codes) at the end.
+        :param keys: One row of key values (e.g. 'Res', 'Stim') per sequence.
+        :param aois: AOI name of every code.
+        """
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.keys = keys.reset_index(drop=True)
+        self.aois = list(aois)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def sequence(self) -> np.ndarray:
+        """
+        Sequence number of every element of codes.
+        """
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def sequences(self) -> pd.DataFrame:
+        """
+        Returns the keys with each scanpath as a list of AOI names.
+        """
+        names = np.asarray(self.aois, dtype=object)[self.codes]
+        result = self.keys.copy()
+        result['Scanpath'] = [list(names[a:b]) for a, b in zip(self.offsets[:-1], self.offsets[1:])]
+        return result
+
+    def _pairs(self):
+        seq = self.sequence
+        same = seq[1:] == seq[:-1]
+        return seq[1:][same], self.codes[:-1][same], self.codes[1:][same]
+
+    def transitions(self, *, per_sequence: bool = False, normalize: bool = False):
+        """
+        Counts AOI to AOI transitions.
+
+        Parameters:
+        - per_sequence: Return one flattened (n_aois * n_aois) row per sequence as a
+          scipy.sparse.csr_matrix instead of one pooled matrix
+        - normalize: Divide each 'from' row by its total, giving transition probabilities
+
+        Returns:
+        - np.ndarray or scipy.sparse.csr_matrix: Pooled (n_aois, n_aois) matrix, or
+          (n_sequences, n_aois * n_aois) matrix where column i * n_aois + j counts i -> j
+        """
+        n = len(self.aois)
+        seq, a, b = self._pairs()
+        if not per_sequence:
+            counts = np.zeros((n, n))
+            np.add.at(counts, (a, b), 1)
+            if normalize:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    counts = np.nan_to_num(counts / counts.sum(axis=1, keepdims=True))
+            return counts
+
+        counts = sparse.csr_matrix((np.ones(len(seq)), (seq, a * n + b)), shape=(len(self), n * n))
+        if normalize:
+            coo = counts.tocoo()
+            totals = np.bincount(coo.row * n + coo.col // n, weights=coo.data, minlength=len(self) * n)
+            coo.data = coo.data / totals[coo.row * n + coo.col // n]
+            counts = coo.tocsr()
+        return counts
+
+    def entropy(self) -> pd.DataFrame:
+        """
+        Computes stationary and transition entropy (bits) per sequence.
+
+        The stationary distribution is taken as the share of fixations on each AOI.
+        Transition entropy is the entropy of the next AOI given the current one,
+        weighted by that stationary distribution.
+
+        Returns:
+        - pd.DataFrame: The keys with 'Stationary Entropy' and 'Transition Entropy'
+        """
+        n = len(self.aois)
+        seq = self.sequence
+        visits = np.bincount(seq * n + self.codes, minlength=len(self) * n).reshape(len(self), n).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = visits / visits.sum(axis=1, keepdims=True)
+            stationary = -np.nansum(np.where(share > 0, share * np.log2(share), 0.0), axis=1)
+
+        coo = self.transitions(per_sequence=True, normalize=True).tocoo()
+        origin = coo.col // n
+        weighted = share[coo.row, origin] * coo.data * np.log2(coo.data)
+        transition = -np.bincount(coo.row, weights=weighted, minlength=len(self))
+
+        result = self.keys.copy()
+        result['Stationary Entropy'] = stationary
+        result['Transition Entropy'] = transition
+        return result
+
+    def similarity(self, *, within=None) -> pd.DataFrame:
+        """
+        Compares scanpaths pairwise with a normalised edit (Levenshtein) distance.
+
+        All pairs are solved together: the dynamic programme advances one row
+        at a time for every pair at once, and the insertion recurrence along
+        each row is resolved with a cumulative minimum.
+
+        Parameters:
+        - within: Optional key column(s); only sequences sharing these keys are compared
+          (e.g. 'Stim' to compare respondents on the same stimulus)
+
+        Returns:
+        - pd.DataFrame: One row per pair with the keys of both sequences (suffixed ' A' and ' B'),
+          'Distance' and 'Similarity' (1 - distance / longer length)
+        """
+        groups = [] if within is None else ([within] if isinstance(within, str) else list(within))
+        if groups:
+            members = self.keys.groupby(groups, sort=False, dropna=False).indices.values()
+        else:
+            members = [np.arange(len(self))]
+        pairs = [np.column_stack([m[i] for i in np.triu_indices(len(m), k=1)]) for m in members if len(m) > 1]
+        pairs = np.vstack(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+        first, second = pairs[:, 0], pairs[:, 1]
+
+        # Pad every sequence to the longest one, -1 never matches a real code
+        lengths = self.lengths
+        width = int(lengths.max()) if len(lengths) else 0
+        padded = np.full((len(self), width), -1, dtype=np.int64)
+        padded[self.sequence, np.arange(len(self.codes)) - np.repeat(self.offsets[:-1], lengths)] = self.codes
+        a, b = padded[first], padded[second]
+        la, lb = lengths[first], lengths[second]
+
+        steps = np.arange(width + 1)
+        row = np.tile(steps, (len(pairs), 1)).astype(float)
+        distance = np.where(la == 0, lb, 0).astype(float)
+        for i in range(1, width + 1):
+            cost = (a[:, i - 1:i] != b).astype(float)
+            candidate = np.empty_like(row)
+            candidate[:, 0] = i
+            candidate[:, 1:] = np.minimum(row[:, 1:] + 1, row[:, :-1] + cost)
+            row = np.minimum.accumulate(candidate - steps, axis=1) + steps
+            done = la == i
+            distance[done] = row[done, lb[done]]
+
+        longer = np.maximum(la, lb)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            similarity = np.where(longer > 0, 1 - distance / longer, 1.0)
+
+        result = pd.concat([self.keys.iloc[first].reset_index(drop=True).add_suffix(' A'),
+                            self.keys.iloc[second].reset_index(drop=True).add_suffix(' B')], axis=1)
+        result['Distance'] = distance
+        result['Similarity'] = similarity
+        return result
+
+
+def build_scanpaths(table: pd.DataFrame, *, keys: list = None, aoi_col: str = 'AOI', time_col: str = 'Timestamp',
+                    collapse: bool = False, aois: list = None) -> Scanpaths:
+    """
+    Builds scanpaths from a fixation table.
+
+    Parameters:
+    - table: Fixation table as returned by fixations.build_fixation_table
+    - keys: Columns identifying a sequence, defaults to ['Res', 'Stim']
+    - aoi_col, time_col: AOI label and fixation start columns
+    - collapse: Merge consecutive fixations on the same AOI into one dwell
+    - aois: Optional fixed AOI list; fixations on other AOIs are dropped
+
+    Returns:
+    - Scanpaths: Integer coded sequences ordered by keys then time
+
+    Raises:
+    - KeyError: If a required column cannot be found in table
+    """
+    keys = list(keys or ['Res', 'Stim'])
+    missing = [c for c in keys + [aoi_col, time_col] if c not in table.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    data = table.dropna(subset=[aoi_col]).sort_values(keys + [time_col], kind='stable')
+    if aois is None:
+        codes, aois = pd.factorize(data[aoi_col], sort=True)
+        aois = list(aois)
+    else:
+        aois = list(aois)
+        codes = pd.Index(aois).get_indexer(data[aoi_col])
+        data, codes = data.loc[codes >= 0], codes[codes >= 0]
+
+    sequence = data.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    if collapse and len(codes):
+        keep = np.r_[True, (sequence[1:] != sequence[:-1]) | (codes[1:] != codes[:-1])]
+        data, codes, sequence = data.loc[keep], codes[keep], sequence[keep]
+
+    offsets = np.r_[0, np.flatnonzero(np.diff(sequence)) + 1, len(codes)] if len(codes) else np.zeros(1, np.int64)
+    return Scanpaths(codes, offsets, data[keys].iloc[offsets[:-1]], aois)
@@ -0,0 +1,234 @@
+"""
+Column-wise group tests over wide outcome tables.
+
+A UV table holds hundreds of outcome columns (iam_*, sns_*, ...) next to a
+grouping column such as 'subset', 'median_split' or 'extreme_split'. Instead of
+one pingouin call per column, the per-group counts, sums and sums of squares of
+every column are two matrix products with a group indicator matrix, ranks are
+taken for all columns in one rankdata call, and the t-test, one-way ANOVA and
+Kruskal-Wallis statistics follow as array expressions. Missing values are
+dropped per column, and Benjamini-Hochberg FDR is applied over the whole family.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+TESTS = ('ttest', 'anova', 'kruskal')
+
+
+def _design(df: pd.DataFrame, columns, group_col: str, groups=None):
+    """
+    Builds the value matrix and group indicator matrix of a wide table.
+
+    Rows without a group (or outside groups) are dropped.
+
+    Returns:
+    - tuple: (values (n_rows, n_columns) float with NaN for missing, indicator (n_rows, n_groups) float,
+      group labels)
+    """
+    missing = [c for c in [group_col, *columns] if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} columns missing from DataFrame")
+
+    labels = df[group_col]
+    if groups is None:
+        groups = [g for g in pd.unique(labels.dropna())]
+        try:
+            groups = sorted(groups)
+        except TypeError:
+            pass
+    codes = pd.Index(list(groups)).get_indexer(labels)
+    keep = codes >= 0
+
+    values = df.loc[keep, list(columns)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    indicator = np.zeros((int(keep.sum()), len(groups)))
+    indicator[np.arange(len(indicator)), codes[keep]] = 1.0
+    return values, indicator, list(groups)
+
+
+def group_moments(values: np.ndarray, indicator: np.ndarray):
+    """
+    Per-group count, mean and sum of squared deviations of every column.
+
+    Parameters:
+    - values: (n_rows, n_columns) values, NaN for missing
+    - indicator: (n_rows, n_groups) one-hot group membership
+
+    Returns:
+    - tuple: (n, mean, ss), each of shape (n_groups, n_columns)
+    """
+    valid = ~np.isnan(values)
+    # Shift every column by its mean so the sums of squares do not cancel
+    shift = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    centred = np.where(valid, values - shift, 0.0)
+    n = indicator.T @ valid.astype(float)
+    sums = indicator.T @ centred
+    squares = indicator.T @ centred ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / n
+        ss = np.maximum(squares - sums * mean, 0.0)
+    return n, mean + shift, ss
+
+
+def ttests(values: np.ndarray, indicator: np.ndarray, *, correction='auto') -> pd.DataFrame:
+    """
+    Two-sample t-test of every column between two groups.
+
+    Parameters:
+    - values, indicator: See group_moments, indicator must have two columns
+    - correction: True for Welch, False for Student, 'auto' for Welch when a column's group sizes
+      differ (as pingouin.ttest)
+
+    Returns:
+    - pd.DataFrame: 'T', 'dof', 'p-val' and 'cohen-d' (pooled standard deviation) per column
+    """
+    if indicator.shape[1] != 2:
+        raise ValueError(f"A t-test needs exactly 2 groups, not {indicator.shape[1]}")
+    (nx, ny), (mx, my), (sx, sy) = group_moments(values, indicator)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vx, vy = sx / (nx - 1), sy / (ny - 1)
+        pooled_dof = nx + ny - 2
+        pooled = (sx + sy) / pooled_dof
+        welch = np.full(nx.shape, bool(correction)) if correction != 'auto' else nx != ny
+        se = np.where(welch, np.sqrt(vx / nx + vy / ny), np.sqrt(pooled * (1 / nx + 1 / ny)))
+        dof = np.where(welch, (vx / nx + vy / ny) ** 2 / ((vx / nx) ** 2 / (nx - 1) + (vy / ny) ** 2 / (ny - 1)),
+                       pooled_dof)
+        t = (mx - my) / se
+        d = (mx - my) / np.sqrt(pooled)
+    valid = (nx > 1) & (ny > 1)
+    p = np.where(valid, 2 * stats.t.sf(np.abs(t), dof), np.nan)
+    return pd.DataFrame({'T': np.where(valid, t, np.nan), 'dof': np.where(valid, dof, np.nan),
+                         'p-val': p, 'cohen-d': np.where(valid, d, np.nan)})
+
+
+def anovas(values: np.ndarray, indicator: np.ndarray) -> pd.DataFrame:
+    """
+    One-way ANOVA of every column across groups.
+
+    Returns:
+    - pd.DataFrame: 'F', 'ddof1', 'ddof2', 'p-val' and 'np2' (eta squared) per column
+    """
+    n, mean, ss = group_moments(values, indicator)
+    total = n.sum(axis=0)
+    k = (n > 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        grand = np.nansum(n * mean, axis=0) / total
+        between = np.nansum(n * (mean - grand) ** 2, axis=0)
+        within = ss.sum(axis=0)
+        ddof1, ddof2 = k - 1, total - k
+        f = (between / ddof1) / (within / ddof2)
+        np2 = between / (between + within)
+    valid = (ddof1 > 0) & (ddof2 > 0)
+    return pd.DataFrame({'F': np.where(valid, f, np.nan), 'ddof1': ddof1, 'ddof2': ddof2,
+                         'p-val': np.where(valid, stats.f.sf(f, ddof1, ddof2), np.nan),
+                         'np2': np.where(valid, np2, np.nan)})
+
+
+def kruskals(values: np.ndarray, indicator: np.ndarray) -> pd.DataFrame:
+    """
+    Kruskal-Wallis H test of every column across groups, with tie correction.
+
+    All columns are ranked in one call; missing values are ranked last so they
+    do not shift the ranks of the observed ones.
+
+    Returns:
+    - pd.DataFrame: 'H', 'ddof1', 'p-val' and 'eps2' (epsilon squared, (H - k + 1) / (n - k)) per column
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, np.inf)
+    average = stats.rankdata(filled, axis=0, method='average')
+    # A tie of size t has average - min rank (t - 1) / 2; summing t^2 - 1 over its members gives t^3 - t
+    ties = 2 * (average - stats.rankdata(filled, axis=0, method='min')) + 1
+    ties = np.where(valid, ties ** 2 - 1, 0.0).sum(axis=0)
+
+    n = indicator.T @ valid.astype(float)
+    sums = indicator.T @ np.where(valid, average, 0.0)
+    total = n.sum(axis=0)
+    k = (n > 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        h = 12 / (total * (total + 1)) * np.where(n > 0, sums ** 2 / n, 0.0).sum(axis=0) - 3 * (total + 1)
+        h /= 1 - ties / (total ** 3 - total)
+        eps2 = (h - k + 1) / (total - k)
+    ok = (k > 1) & (total > k)
+    return pd.DataFrame({'H': np.where(ok, h, np.nan), 'ddof1': k - 1,
+                         'p-val': np.where(ok, stats.chi2.sf(h, k - 1), np.nan),
+                         'eps2': np.where(ok, eps2, np.nan)})
+
+
+def fdr(pvals, alpha: float = 0.05):
+    """
+    Benjamini-Hochberg correction, ignoring NaN p-values.
+
+    Returns:
+    - tuple: (reject, corrected p-values), NaN stays NaN and is never rejected
+    """
+    pvals = np.asarray(pvals, dtype=float)
+    corrected = np.full(pvals.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(pvals))
+    if len(valid):
+        order = valid[np.argsort(pvals[valid], kind='stable')]
+        scaled = pvals[order] * len(order) / np.arange(1, len(order) + 1)
+        corrected[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return np.nan_to_num(corrected, nan=1.0) <= alpha, corrected
+
+
+def screen(df: pd.DataFrame, columns, group_col: str, *, groups=None, by: str = None, tests=None,
+           correction='auto', alpha: float = 0.05) -> pd.DataFrame:
+    """
+    Tests group differences in every outcome column at once.
+
+    Parameters:
+    - df: Wide table, one row per respondent
+    - columns: Outcome columns to test
+    - group_col: Grouping column, e.g. 'subset' or 'median_split'; rows with a missing group are dropped
+    - groups: Optional groups to compare, in order (defaults to all, sorted)
+    - by: Optional stratifying column (e.g. 'subset'), tests are run within each of its levels
+    - tests: Any of 'ttest', 'anova' and 'kruskal'; defaults to all, without 'ttest' for more than two groups
+    - correction: Welch correction for the t-test, see ttests
+    - alpha: FDR level
+
+    Returns:
+    - pd.DataFrame: One row per column (and stratum), with (test, value) columns, e.g. ('anova', 'F'),
+      ('anova', 'p-val'), plus ('<test>', 'p-corr') and ('<test>', 'significant') from the
+      Benjamini-Hochberg correction over the whole family
+
+    Raises:
+    - KeyError: If a column cannot be found in df
+    - ValueError: If a requested test is unknown
+    """
+    columns = list(columns)
+    if by is not None and by not in df.columns:
+        raise KeyError(f"{[by]} columns missing from DataFrame")
+    strata = [(None, df)] if by is None else list(df.groupby(by, sort=True))
+
+    parts = []
+    for level, part in strata:
+        values, indicator, labels = _design(part, columns, group_col, groups)
+        chosen = tests or [t for t in TESTS if t != 'ttest' or len(labels) == 2]
+        unknown = [t for t in chosen if t not in TESTS]
+        if unknown:
+            raise ValueError(f"Unknown tests {unknown}, expected any of {list(TESTS)}")
+
+        results = {}
+        for name in chosen:
+            if name == 'ttest':
+                results[name] = ttests(values, indicator, correction=correction)
+            elif name == 'anova':
+                results[name] = anovas(values, indicator)
+            else:
+                results[name] = kruskals(values, indicator)
+        result = pd.concat(results, axis=1)
+        index = pd.Index(columns, name='Column')
+        if by is not None:
+            index = pd.MultiIndex.from_arrays([[level] * len(columns), columns], names=[by, 'Column'])
+        result.index = index
+        parts.append(result)
+
+    result = pd.concat(parts)
+    for name in result.columns.get_level_values(0).unique():
+        reject, corrected = fdr(result[(name, 'p-val')], alpha)
+        result[(name, 'p-corr')] = corrected
+        result[(name, 'significant')] = reject
+    return result[[c for name in result.columns.get_level_values(0).unique()
+                   for c in result.columns if c[0] == name]]
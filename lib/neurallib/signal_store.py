@@ -0,0 +1,175 @@
+"""
+Memory-mapped storage of raw sensor recordings.
+
+Each recording is a directory holding one flat binary file per channel
+(float32, timestamps float64) and a small schema.json. Recordings are written
+in chunks, so a long export never has to sit in memory as a whole, and are read
+back through np.memmap, so analyses only touch the slices they use.
+"""
+
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+SCHEMA = 'schema.json'
+
+
+class SignalStore:
+    """
+    Directory of recordings stored as per-channel memory-mapped arrays.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initializes a new SignalStore.
+
+        :param root: Directory holding the recordings. Created if missing.
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, recording: str) -> str:
+        return os.path.join(self.root, re.sub(r'[^\w\-. ]', '_', str(recording)))
+
+    def schema(self, recording: str) -> dict:
+        """
+        Returns the schema of a recording: its name, length, time column and channel files.
+        """
+        path = os.path.join(self._dir(recording), SCHEMA)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No recording '{recording}' in {self.root}")
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    def recordings(self) -> list:
+        """
+        Lists the recordings held in the store.
+        """
+        names = []
+        for d in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, d, SCHEMA)
+            if os.path.exists(path):
+                with open(path, 'r') as file:
+                    names.append(json.load(file)['recording'])
+        return names
+
+    def append(self, recording: str, df: pd.DataFrame, columns: list = None, *, time_col: str = 'Timestamp') -> int:
+        """
+        Appends samples to a recording, creating it on first use.
+
+        Parameters:
+        - recording: Recording name (e.g. the respondent file name)
+        - df: Chunk of samples holding time_col and columns
+        - columns: Channels to store, fixed by the first chunk. Defaults to every
+          column of the first chunk other than time_col.
+        - time_col: Column holding sample times
+
+        Returns:
+        - int: Number of samples in the recording after the append
+
+        Raises:
+        - KeyError: If time_col or a stored channel is missing from df
+        """
+        folder = self._dir(recording)
+        path = os.path.join(folder, SCHEMA)
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                schema = json.load(file)
+        else:
+            os.makedirs(folder, exist_ok=True)
+            columns = [c for c in (columns or df.columns) if c != time_col]
+            files = {time_col: {'file': 'time.bin', 'dtype': 'float64'}}
+            for i, c in enumerate(columns):
+                files[c] = {'file': f"{i}.bin", 'dtype': 'float32'}
+            schema = {'recording': recording, 'length': 0, 'time_col': time_col, 'columns': files}
+
+        missing = [c for c in schema['columns'] if c not in df.columns]
+        if missing:
+            raise KeyError(f"{missing} columns missing from DataFrame")
+
+        for c, info in schema['columns'].items():
+            values = pd.to_numeric(df[c].replace(to_replace=' ', value=np.nan), errors='coerce')
+            with open(os.path.join(folder, info['file']), 'ab') as file:
+                values.to_numpy(dtype=info['dtype']).tofile(file)
+        schema['length'] += len(df)
+        with open(path, 'w') as file:
+            json.dump(schema, file)
+        return schema['length']
+
+    def ingest_csv(self, path: str, recording: str, columns: list, *, time_col: str = 'Timestamp',
+                   chunksize: int = 100000, **kwargs) -> int:
+        """
+        Streams a CSV export into a new recording, one chunk at a time.
+
+        Parameters:
+        - path: CSV file to read
+        - recording: Recording name, replaced if it already exists
+        - columns: Channels to store
+        - time_col: Column holding sample times
+        - chunksize: Rows read per chunk
+        - kwargs: Passed to pd.read_csv (e.g. header=, skiprows=)
+
+        Returns:
+        - int: Number of samples stored
+        """
+        self.remove(recording)
+        length = 0
+        for chunk in pd.read_csv(path, usecols=[time_col] + list(columns), chunksize=chunksize,
+                                 low_memory=False, **kwargs):
+            length = self.append(recording, chunk, columns, time_col=time_col)
+        return length
+
+    def remove(self, recording: str) -> None:
+        """
+        Deletes a recording if it exists.
+        """
+        folder = self._dir(recording)
+        if os.path.isdir(folder):
+            for f in os.listdir(folder):
+                os.remove(os.path.join(folder, f))
+            os.rmdir(folder)
+
+    def open(self, recording: str, columns: list = None) -> dict:
+        """
+        Opens channels of a recording as read-only memory maps.
+
+        :param recording: The recording name.
+        :param columns: Channels to open, defaults to all including the time column.
+        :return: Dictionary of column name to np.memmap.
+        """
+        schema = self.schema(recording)
+        folder = self._dir(recording)
+        columns = list(schema['columns']) if columns is None else [schema['time_col']] + list(columns)
+        arrays = {}
+        for c in dict.fromkeys(columns):
+            info = schema['columns'][c]
+            if schema['length'] == 0:
+                arrays[c] = np.empty(0, dtype=info['dtype'])
+            else:
+                arrays[c] = np.memmap(os.path.join(folder, info['file']), dtype=info['dtype'], mode='r',
+                                      shape=(schema['length'],))
+        return arrays
+
+    def read(self, recording: str, columns: list = None, start: float = None, stop: float = None) -> pd.DataFrame:
+        """
+        Reads a time slice of a recording into a DataFrame.
+
+        Only the requested slice is copied out of the memory maps. The slice is
+        found by binary search, which assumes samples were appended in time order.
+
+        Parameters:
+        - recording: The recording name
+        - columns: Channels to read, defaults to all
+        - start, stop: Time limits, start <= time < stop
+
+        Returns:
+        - pd.DataFrame: The time column and the requested channels
+        """
+        arrays = self.open(recording, columns)
+        time_col = self.schema(recording)['time_col']
+        times = arrays[time_col]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        hi = len(times) if stop is None else int(np.searchsorted(times, stop, side='left'))
+        return pd.DataFrame({c: np.asarray(a[lo:hi]) for c, a in arrays.items()})
@@ -6,6 +6,13 @@ from itertools import permutations
 import warnings
 import statsmodels.api as sm
 from statsmodels.formula.api import ols
+from scipy.stats import beta
+from concurrent.futures import ProcessPoolExecutor
+from . import stats_kernels as kernels
+from .result_cache import ResultCache, fingerprint
+from .effect_sizes import pair_effects
+
+_cache = None
 
 BAR_COLORS = ['lightgrey',
               'lightskyblue',
@@ -13,32 +20,144 @@ BAR_COLORS = ['lightgrey',
               'slategrey',
               'deepskyblue']
 
-def bootstrap_test(pre, post, n_bootstrap=10000):
-    observed_difference = np.mean(post) - np.mean(pre)
+def _permutation_diffs(pre, post, n_permutations, rng, block=1000):
+    """Generates permuted mean differences (post - pre) in blocks
+
+    Each block permutes a (block x n) matrix of the pooled values row-wise with
+    the generator, so every permutation is a row and all mean differences come
+    from one sum over the first len(pre) columns.
+
+    Args:
+        pre, post: The two samples
+        n_permutations: Total number of permutations
+        rng: A np.random.Generator
+        block: Permutations per block, reduced for long samples to bound memory
+
+    Yields:
+        array: Mean differences of one block of permutations
+    """
+    pre = np.asarray(pre, dtype=float)
+    post = np.asarray(post, dtype=float)
     combined = np.concatenate([pre, post])
-    count = 0
+    total = combined.sum()
+    n_pre, n_post = len(pre), len(post)
+    block = int(max(1, min(block, 20_000_000 // max(len(combined), 1))))
 
-    for _ in range(n_bootstrap):
-        # Resampling without replacement to maintain data integrity
-        np.random.shuffle(combined)
-        new_pre = combined[:len(pre)]
-        new_post = combined[len(pre):]
-        new_difference = np.mean(new_post) - np.mean(new_pre)
-        
-        # Count how often the bootstrap difference is greater than the observed
-        if np.abs(new_difference) >= np.abs(observed_difference):
-            count += 1
+    done = 0
+    while done < n_permutations:
+        size = min(block, n_permutations - done)
+        permuted = rng.permuted(np.broadcast_to(combined, (size, len(combined))), axis=1)
+        pre_sums = permuted[:, :n_pre].sum(axis=1)
+        yield (total - pre_sums) / n_post - pre_sums / n_pre
+        done += size
 
-    # P-value estimation
-    p_value = count / n_bootstrap
+
+def bootstrap_test(pre, post, n_bootstrap=10000, alternative='two-sided', seed=None, block=1000,
+                   early_stop=False, alpha=0.05, confidence=0.99):
+    """Permutation test of the difference in means between two samples
+
+    Permutations are drawn in vectorised blocks from a seeded np.random.Generator,
+    so the global NumPy random state is left untouched.
+
+    Args:
+        pre, post: The two samples, the statistic is mean(post) - mean(pre)
+        n_bootstrap: Maximum number of permutations
+        alternative: 'two-sided', 'greater' (post > pre) or 'less'
+        seed: Seed or np.random.Generator, None for fresh entropy
+        block: Permutations drawn per block
+        early_stop: Stop once the Clopper-Pearson interval of the p-value lies wholly above or below alpha
+        alpha: Significance level used for early stopping
+        confidence: Confidence level of the p-value interval
+
+    Returns:
+        dataframe: 'p-val' and 'n_bootstrap' (the permutations actually used)
+    """
+    if alternative not in ('two-sided', 'greater', 'less'):
+        raise ValueError(f"alternative must be 'two-sided', 'greater' or 'less', not {alternative!r}")
+    rng = np.random.default_rng(seed)
+    pre = np.asarray(pre, dtype=float)
+    post = np.asarray(post, dtype=float)
+    observed = post.mean() - pre.mean()
+    # Permuted differences are summed in another order, allow for rounding
+    tolerance = 1e-12 * max(1.0, abs(observed))
+
+    count = 0
+    used = 0
+    for diffs in _permutation_diffs(pre, post, n_bootstrap, rng, block=block):
+        if alternative == 'two-sided':
+            count += int(np.sum(np.abs(diffs) >= abs(observed) - tolerance))
+        elif alternative == 'greater':
+            count += int(np.sum(diffs >= observed - tolerance))
+        else:
+            count += int(np.sum(diffs <= observed + tolerance))
+        used += len(diffs)
+
+        if early_stop and used < n_bootstrap:
+            tail = (1 - confidence) / 2
+            lower = beta.ppf(tail, count, used - count + 1) if count else 0.0
+            upper = beta.ppf(1 - tail, count + 1, used - count) if count < used else 1.0
+            if upper < alpha or lower > alpha:
+                break
 
     result = pd.DataFrame()
-    result['p-val']=[p_value]
-    result['n_bootstrap']=[n_bootstrap]
+    result['p-val'] = [count / used]
+    result['n_bootstrap'] = [used]
 
     return result
 
-def get_significance(group_data: dict, cluster: str, groups = [], paired = False, one_sample = False):
+def _col(frame, name):
+    """Column of a pingouin result, accepting the 'p-unc' (< 0.7) and 'p_unc' (>= 0.7) spellings"""
+    return frame[name] if name in frame.columns else frame[name.replace('-', '_')]
+
+
+def _pval(result):
+    """Wraps a kernel (statistic, p-value) in the one row frame the pingouin tests return"""
+    return pd.DataFrame({'p-val': [result[1]]})
+
+
+def long_format(group_data: dict):
+    """Stacks a dictionary of group arrays into one long 'Group'/'Value' frame
+
+    Args:
+        group_data: A dictionary containg arrays, with keys set as group name
+
+    Returns:
+        dataframe: 'Group' and 'Value' columns, built with one concatenate and one repeat
+    """
+    keys = np.empty(len(group_data), dtype=object)
+    keys[:] = list(group_data.keys())
+    values = [np.asarray(v, dtype=float).ravel() for v in group_data.values()]
+    return pd.DataFrame({'Group': np.repeat(keys, [len(v) for v in values]),
+                         'Value': np.concatenate(values) if values else np.empty(0)})
+
+
+def set_significance_cache(cache):
+    """Sets the result cache get_significance uses by default
+
+    Args:
+        cache: A ResultCache, a folder to keep one in, or None to disable caching
+
+    Returns:
+        ResultCache: The cache now in use, or None
+    """
+    global _cache
+    _cache = ResultCache(cache) if isinstance(cache, str) else cache
+    return _cache
+
+
+def _significance_key(group_data, groups, paired, one_sample, engine):
+    return fingerprint(group_data, groups=list(groups or []), paired=paired, one_sample=one_sample, engine=engine)
+
+
+def _relabel(significance, cluster):
+    """Cached rows carry the cluster they were computed for; the result is the same for any label"""
+    significance = significance.copy()
+    if 'Cluster' in significance.columns:
+        significance['Cluster'] = cluster
+    return significance
+
+
+def get_significance(group_data: dict, cluster: str, groups = [], paired = False, one_sample = False, engine = 'pingouin', cache = None):
     """Analysis of significance between arrays
 
     Args:
@@ -46,11 +165,32 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
         cluster: The label attatched to this analysis
         groups: A list of all the groups
         paired: indicating is paired sample across groups
+        engine: 'pingouin' (reference) or 'fast' to run the screening, omnibus and two-sample
+            tests with stats_kernels on plain arrays. Post-hoc tests always use pingouin.
+        cache: ResultCache to look the result up in, keyed by the group arrays and settings.
+            None uses the cache set with set_significance_cache, False disables caching.
 
     Returns:
         dataframe: containing results
     """
 
+    #Groups of 3 get padded below; work on a copy so the caller's dict is the same
+    #whether or not the result came from the cache
+    group_data = dict(group_data)
+    if cache is None:
+        cache = _cache
+    if isinstance(cache, ResultCache):
+        key = _significance_key(group_data, groups, paired, one_sample, engine)
+        cached = cache.get(key)
+        if cached is not None:
+            return _relabel(cached, cluster)
+        significance = get_significance(group_data, cluster, groups, paired, one_sample, engine, cache=False)
+        cache.put(key, significance)
+        return significance
+
+    if engine not in ('pingouin', 'fast'):
+        raise ValueError(f"engine must be 'pingouin' or 'fast', not {engine!r}")
+    fast = engine == 'fast'
 
     if not isinstance(groups, list) and groups is not None:
         raise TypeError("Expected 'groups' to be a list or None, got {}".format(type(groups).__name__))
@@ -77,24 +217,31 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
 
         if sample_check:
 
-            data = pd.DataFrame()
-            for key,value in group_data.items():
-                res = pd.DataFrame()
-                res['Group']=[key]*len(value)
-                res['Value']=value
-                data = pd.concat([data,res])
+            data = long_format(group_data)
 
             ### Test for parametric or non-parametric
-            normality = pg.normality(data=data, dv='Value', group='Group')
-            homoscedasticity = pg.homoscedasticity(data=data, dv='Value', group='Group')
-            normal = all(normality['normal'])
-            equal_var = all(homoscedasticity['equal_var'])
+            if fast:
+                arrays = [data['Value'].to_numpy()[data['Group'].to_numpy() == k] for k in group_data]
+                normal = all(kernels.normality(arrays))
+                equal_var = kernels.homoscedasticity(arrays)
+            else:
+                normality = pg.normality(data=data, dv='Value', group='Group')
+                homoscedasticity = pg.homoscedasticity(data=data, dv='Value', group='Group')
+                normal = all(normality['normal'])
+                equal_var = all(homoscedasticity['equal_var'])
             
             if len(groups)>2:            
-                if equal_var:
+                if equal_var and fast:
+                    pval = kernels.anova(arrays)[1]
+                    test_type = 'ANOVA'
+                    if not kernels.residuals_normal(arrays):
+                        pval = kernels.kruskal(arrays)[1]
+                        test_type = 'Kruskal-Wallis'
+
+                elif equal_var:
                     aov = pg.anova(dv='Value', between='Group', data=data,
                         detailed=True)
-                    pval = aov['p-unc'].values[0]
+                    pval = _col(aov, 'p-unc').values[0]
                     test_type = 'ANOVA'
                     
                     # Check if residuals are normally distributed
@@ -105,12 +252,16 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
 
                     if not residuals_normal:
                         kru = pg.kruskal(dv='Value', between='Group', data=data)
-                        pval = kru['p-unc'].values[0]
+                        pval = _col(kru, 'p-unc').values[0]
                         test_type = 'Kruskal-Wallis'
         
+                elif fast:
+                    pval = kernels.welch_anova(arrays)[1]
+                    test_type = 'ANOVA Welch'
+
                 else:
                     wel = pg.welch_anova(dv='Value', between='Group', data=data)
-                    pval = wel['p-unc'].values[0]
+                    pval = _col(wel, 'p-unc').values[0]
                     test_type = 'ANOVA Welch'
 
                 sig = True if pval<0.05 else False  
@@ -129,7 +280,7 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
                             ph = pg.pairwise_tukey(dv='Value', between='Group', data=data, effsize = 'r')
                             ph['Control']= ph['A']
                             ph['Treatment']= ph['B']
-                            ph['pval']=ph['p-tukey']
+                            ph['pval']=_col(ph, 'p-tukey')
                             test_type = 'Post-Hoc Tukey'
                         else:
                             ph = pg.pairwise_gameshowell(dv='Value', between='Group', data=data, effsize='r')
@@ -172,12 +323,12 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
                 
                 if paired:
                     if normal:
-                        res = pg.ttest(control,treatment, paired=True)
+                        res = _pval(kernels.ttest(control, treatment, paired=True)) if fast else pg.ttest(control,treatment, paired=True)
                         test_type = 'Paired T-Test'
                     else:
                         with warnings.catch_warnings(record=True) as caught_warnings:
                             warnings.simplefilter("always")  # Catch any warnings
-                            res = pg.wilcoxon(control, treatment)
+                            res = _pval(kernels.wilcoxon(control, treatment)) if fast else pg.wilcoxon(control, treatment)
                             test_type = 'Wilcoxin'
                             # Check if any caught warnings are UserWarning
                             user_warning_issued = any(issubclass(w.category, UserWarning) for w in caught_warnings)
@@ -185,14 +336,14 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
                             if user_warning_issued:
                                 print("UserWarning detected, proceeding with bootstrap analysis.")
                                 # Assume pre_scores and post_scores are defined or obtained as needed
-                                res = bootstrap_test(control,treatment)
+                                res = bootstrap_test(control,treatment, seed=0)
                                 test_type = 'Bootstrap'
                     
                 elif normal:
-                    res = pg.ttest(control,treatment, paired=False)
+                    res = _pval(kernels.ttest(control, treatment)) if fast else pg.ttest(control,treatment, paired=False)
                     test_type = 'Independent T-Test'
                 else:
-                    res = pg.mwu(control,treatment)
+                    res = _pval(kernels.mwu(control, treatment)) if fast else pg.mwu(control,treatment)
                     test_type = 'Mann-Whitney U'
                     
                 groups = [f'{groups[1]}',f'{groups[0]}']
@@ -201,7 +352,7 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
                 result = {'Groups':(' and ').join(groups),
                         'Control':groups[1],
                         'Treatment':groups[0],
-                        'pValue':res['p-val'].values[0],
+                        'pValue':_col(res, 'p-val').values[0],
                         'Type':test_type,
                         'nC':len(control),
                         'nT':len(treatment),
@@ -221,6 +372,98 @@ def get_significance(group_data: dict, cluster: str, groups = [], paired = False
 
         return significance
 
+def _significance_task(task):
+    cluster, group_data, groups, paired, engine = task
+    return get_significance(group_data, cluster, groups, paired=paired, engine=engine, cache=False)
+
+
+def get_significance_batch(tasks, paired = False, workers = None, chunksize = 8, engine = 'pingouin', cache = None, effect_size = True, min_parallel = 16):
+    """Runs get_significance over many clusters, in parallel across processes
+
+    Args:
+        tasks: Iterable of (cluster, group_data) or (cluster, group_data, groups) tuples
+        paired: indicating is paired sample across groups, for every task
+        workers: Number of processes, defaults to the number of cores. 1 runs in this process.
+        chunksize: Tasks sent to a process at a time
+        engine: 'pingouin' or 'fast', see get_significance
+        cache: ResultCache, see get_significance. Cached tasks are not sent to the processes.
+        effect_size: Add Cohen's d, Hedges' g and rank-biserial r (Treatment relative to Control)
+            with their CIs and an 'Effect' label to every pairwise row, computed in one batch
+        min_parallel: Fewer uncached tasks than this run in this process, as starting the
+            processes costs more than a handful of tests
+
+    Returns:
+        dataframe: The results of every task, in task order
+    """
+    if cache is None:
+        cache = _cache
+    if not isinstance(cache, ResultCache):
+        cache = None
+
+    jobs = []
+    for task in tasks:
+        cluster, group_data = task[0], task[1]
+        groups = list(task[2]) if len(task) > 2 and task[2] is not None else []
+        # Plain arrays pickle cheaply and are not shared with the caller
+        group_data = {k: np.asarray(v, dtype=float).ravel() for k, v in group_data.items()}
+        jobs.append((cluster, group_data, groups, paired, engine))
+
+    results = [None] * len(jobs)
+    keys = [None] * len(jobs)
+    if cache is not None:
+        for i, (cluster, group_data, groups, _, _) in enumerate(jobs):
+            keys[i] = _significance_key(group_data, groups, paired, False, engine)
+            cached = cache.get(keys[i])
+            if cached is not None:
+                results[i] = _relabel(cached, cluster)
+    pending = [i for i, r in enumerate(results) if r is None]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pending) < max(min_parallel, 2):
+        computed = [_significance_task(jobs[i]) for i in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            computed = list(pool.map(_significance_task, [jobs[i] for i in pending], chunksize=chunksize))
+    for i, significance in zip(pending, computed):
+        results[i] = significance
+        if cache is not None:
+            cache.put(keys[i], significance)
+
+    if effect_size:
+        results = [_add_effect_sizes(results, jobs)]
+    results = [r for r in results if len(r)]
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+
+def _add_effect_sizes(results, jobs):
+    """Joins the rows of every task and adds the effect sizes of all Control/Treatment pairs in one batch"""
+    frames = [r.assign(_task=i) for i, r in enumerate(results) if len(r)]
+    if not frames:
+        return pd.DataFrame()
+    significance = pd.concat(frames, ignore_index=True)
+    if 'Control' not in significance.columns or 'Treatment' not in significance.columns:
+        return significance.drop(columns='_task')
+
+    # Group labels are stringified in the results, look the samples up the same way
+    samples = [{str(k): v for k, v in job[1].items()} for job in jobs]
+    rows, pairs = [], []
+    for row, (task, control, treatment) in enumerate(zip(significance['_task'], significance['Control'],
+                                                         significance['Treatment'])):
+        groups = samples[task]
+        if str(control) in groups and str(treatment) in groups:
+            rows.append(row)
+            pairs.append((groups[str(treatment)], groups[str(control)]))
+
+    effects = pair_effects(pairs)
+    columns = ['Cohen d', 'd CI Low', 'd CI High', 'Hedges g', 'g CI Low', 'g CI High',
+               'Rank-biserial r', 'r CI Low', 'r CI High', 'Effect']
+    for c in columns:
+        significance[c] = pd.Series(np.nan, index=significance.index, dtype=object if c == 'Effect' else float)
+        if len(rows):
+            significance.loc[rows, c] = effects[c].to_numpy()
+    return significance.drop(columns='_task')
+
+
 def get_significance_one_sample(data,x,cluster):
 
     sample_check = True
@@ -249,7 +492,7 @@ def get_significance_one_sample(data,x,cluster):
         result = {'Groups':cluster,
                 'Control':x,
                 'Treatment':cluster,
-                'pValue':res['p-val'].values[0],
+                'pValue':_col(res, 'p-val').values[0],
                 'Type':test_type,
                 'nC':len(data),
                 'nT':len(data),
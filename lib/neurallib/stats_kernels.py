@@ -0,0 +1,161 @@
+"""
+Lean statistical kernels on plain arrays.
+
+get_significance screens every cluster with normality and equal variance
+tests before an omnibus or two-sample test. Through pingouin each step builds
+and validates a DataFrame; these kernels run the same tests directly on a list
+of group arrays with NumPy/SciPy and return the values get_significance reads.
+They are selected with get_significance(..., engine='fast'); pingouin stays
+the reference implementation.
+"""
+
+import numpy as np
+from scipy import stats
+
+
+def _groups(groups) -> list:
+    """
+    Converts group samples to float arrays without NaNs.
+    """
+    arrays = [np.asarray(g, dtype=float).ravel() for g in groups]
+    return [g[~np.isnan(g)] for g in arrays]
+
+
+def normality(groups, *, alpha: float = 0.05) -> np.ndarray:
+    """
+    Shapiro-Wilk test per group, as pingouin.normality.
+
+    Returns:
+    - np.ndarray: True for every group whose p-value exceeds alpha
+    """
+    return np.array([stats.shapiro(g).pvalue > alpha for g in _groups(groups)], dtype=bool)
+
+
+def homoscedasticity(groups, *, alpha: float = 0.05) -> bool:
+    """
+    Levene test (median centred) across groups, as pingouin.homoscedasticity.
+
+    Returns:
+    - bool: True if the p-value exceeds alpha
+    """
+    return bool(stats.levene(*_groups(groups), center='median').pvalue > alpha)
+
+
+def _moments(groups):
+    n = np.array([len(g) for g in groups], dtype=float)
+    means = np.array([g.mean() for g in groups])
+    ss = np.array([((g - m) ** 2).sum() for g, m in zip(groups, means)])
+    return n, means, ss
+
+
+def anova(groups) -> tuple:
+    """
+    One-way ANOVA, as pingouin.anova(between=...).
+
+    Returns:
+    - tuple: (F, p-value)
+    """
+    groups = _groups(groups)
+    n, means, ss = _moments(groups)
+    grand = (n * means).sum() / n.sum()
+    df_between, df_within = len(groups) - 1, n.sum() - len(groups)
+    f = ((n * (means - grand) ** 2).sum() / df_between) / (ss.sum() / df_within)
+    return f, stats.f.sf(f, df_between, df_within)
+
+
+def residuals_normal(groups, *, alpha: float = 0.05) -> bool:
+    """
+    Shapiro-Wilk test of the one-way model residuals (value minus group mean),
+    as the ols('Value ~ C(Group)') residual check.
+    """
+    groups = _groups(groups)
+    residuals = np.concatenate([g - g.mean() for g in groups])
+    return bool(stats.shapiro(residuals).pvalue > alpha)
+
+
+def welch_anova(groups) -> tuple:
+    """
+    Welch ANOVA for unequal variances, as pingouin.welch_anova.
+
+    Returns:
+    - tuple: (F, p-value)
+    """
+    groups = _groups(groups)
+    n, means, ss = _moments(groups)
+    r = len(groups)
+    weights = n / (ss / (n - 1))
+    adjusted = (weights * means).sum() / weights.sum()
+    numerator = (weights * (means - adjusted) ** 2).sum() / (r - 1)
+    lamb = 3 * ((1 - weights / weights.sum()) ** 2 / (n - 1)).sum() / (r ** 2 - 1)
+    f = numerator / (1 + 2 * lamb * (r - 2) / 3)
+    return f, stats.f.sf(f, r - 1, 1 / lamb)
+
+
+def kruskal(groups) -> tuple:
+    """
+    Kruskal-Wallis H test with tie correction, as pingouin.kruskal.
+
+    Returns:
+    - tuple: (H, p-value)
+    """
+    groups = _groups(groups)
+    values = np.concatenate(groups)
+    ranks = stats.rankdata(values)
+    n = np.array([len(g) for g in groups])
+    sums = np.add.reduceat(ranks, np.r_[0, np.cumsum(n)[:-1]])
+    total = len(values)
+    h = 12 / (total * (total + 1)) * (sums ** 2 / n).sum() - 3 * (total + 1)
+    _, ties = np.unique(values, return_counts=True)
+    h /= 1 - (ties ** 3 - ties).sum() / (total ** 3 - total)
+    return h, stats.chi2.sf(h, len(groups) - 1)
+
+
+def ttest(x, y, *, paired: bool = False) -> tuple:
+    """
+    Two-sample t-test, as pingouin.ttest with correction='auto' (Welch when sizes differ).
+
+    Returns:
+    - tuple: (T, p-value)
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if paired:
+        keep = ~np.isnan(x) & ~np.isnan(y)
+        d = x[keep] - y[keep]
+        t = d.mean() / (d.std(ddof=1) / np.sqrt(len(d)))
+        return t, 2 * stats.t.sf(abs(t), len(d) - 1)
+    x, y = _groups([x, y])
+    vx, vy = x.var(ddof=1), y.var(ddof=1)
+    nx, ny = len(x), len(y)
+    if nx == ny:
+        dof = nx + ny - 2
+        se = np.sqrt(((nx - 1) * vx + (ny - 1) * vy) / dof * (1 / nx + 1 / ny))
+    else:
+        se = np.sqrt(vx / nx + vy / ny)
+        dof = (vx / nx + vy / ny) ** 2 / ((vx / nx) ** 2 / (nx - 1) + (vy / ny) ** 2 / (ny - 1))
+    t = (x.mean() - y.mean()) / se
+    return t, 2 * stats.t.sf(abs(t), dof)
+
+
+def mwu(x, y) -> tuple:
+    """
+    Two-sided Mann-Whitney U test, as pingouin.mwu.
+
+    Returns:
+    - tuple: (U, p-value)
+    """
+    x, y = _groups([x, y])
+    result = stats.mannwhitneyu(x, y, use_continuity=True, alternative='two-sided')
+    return result.statistic, result.pvalue
+
+
+def wilcoxon(x, y) -> tuple:
+    """
+    Two-sided Wilcoxon signed-rank test, as pingouin.wilcoxon.
+
+    Returns:
+    - tuple: (W, p-value)
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = ~np.isnan(x) & ~np.isnan(y)
+    result = stats.wilcoxon(x[keep], y[keep], alternative='two-sided', correction=True)
+    return result.statistic, result.pvalue
@@ -7,6 +7,8 @@ from matplotlib import font_manager
 from wordcloud import WordCloud, ImageColorGenerator
 from PIL import Image
 from nltk.stem import WordNetLemmatizer
+from .fixations import aoi_hit_metrics
+from .proportions import bootstrap_proportions, error_bars
 
 #'deepskyblue'
 BAR_COLORS = ['lightgrey',
@@ -35,8 +37,11 @@ BAR_COLORS = ['lightgrey',
               'slategrey',
               ]
 
+SIGNIFICANCE_COLUMNS = ['Test', 'Control', 'Treatment', 'pValue', 'Confidence', 'EffectSize',
+                        'CorrectedEffectSize', 'nC', 'nT', 'Cluster']
+
 def get_significance(data, list, cluster):
-    significance = pd.DataFrame()
+    significance = []
     for e in list:
         try:
             treatment = data[e]
@@ -57,10 +62,10 @@ def get_significance(data, list, cluster):
                             'nC':len(control),
                             'nT':len(treatment),
                             'Cluster':cluster}
-                    significance = significance.append(result, ignore_index= True)
+                    significance.append(result)
         except:
             pass
-    return significance
+    return pd.DataFrame(significance, columns=SIGNIFICANCE_COLUMNS)
 
 
 def get_significance_footnote(sig,clusters = False):
@@ -150,7 +155,7 @@ def flash_exposure(in_folder,results_folder,key_path = None):
     data.to_excel(f'{out_path}{task}_Raw.xlsx', index = False)
     
     #Initialise results dataframes
-    results = pd.DataFrame()
+    results = []
     significance = pd.DataFrame()
     
     routes = pd.concat([keys['Left'], keys['Right']]).drop_duplicates().tolist()
@@ -169,9 +174,11 @@ def flash_exposure(in_folder,results_folder,key_path = None):
         result = dict()
         result['Route'] = r
         result['Proportion'] = chosen/len(route)*100
+        result['Count'] = chosen
+        result['n'] = len(route)
         result['Type'] = 'Overall'
         result['Cluster'] = 'Overall'
-        results = results.append(result,ignore_index = True)     
+        results.append(result)
     significance = pd.concat([significance, get_significance(stats_routes, routes, 'Overall')])  
 
     categories = data['Category'].drop_duplicates().tolist()
@@ -188,9 +195,11 @@ def flash_exposure(in_folder,results_folder,key_path = None):
             result = dict()
             result['Route'] = r
             result['Proportion'] = chosen/len(route)*100
+            result['Count'] = chosen
+            result['n'] = len(route)
             result['Type'] = 'Category'
             result['Cluster'] = f'{c}'
-            results = results.append(result,ignore_index = True)        
+            results.append(result)
         significance = pd.concat([significance, get_significance(stats_routes, routes, c)])
 
         variants = category['Variant'].drop_duplicates().tolist()   
@@ -207,12 +216,19 @@ def flash_exposure(in_folder,results_folder,key_path = None):
                 result = dict()
                 result['Route'] = r
                 result['Proportion'] = chosen/len(route)*100
+                result['Count'] = chosen
+                result['n'] = len(route)
                 result['Type'] = 'Variant'
                 result['Cluster'] = f'{c}- {v}'
-                results = results.append(result,ignore_index = True) 
+                results.append(result)
         
             significance = pd.concat([significance, get_significance(stats_routes, routes, f'{c}- {v}')])
 
+    # Bootstrap intervals of every route proportion, all clusters at once
+    results = pd.DataFrame(results)
+    cis = bootstrap_proportions(results['Count'], results['n'], seed=0)
+    results[['CI Low','CI High']] = cis[['CI Low','CI High']].to_numpy()
+
     results.to_excel(f'{out_path}{task}_Results.xlsx', index = False)
     significance.to_excel(f'{out_path}{task}_Significance.xlsx', index = False)
     significance = significance.drop_duplicates(subset=['Cluster','pValue'])
@@ -238,7 +254,8 @@ def flash_exposure(in_folder,results_folder,key_path = None):
                     y1lim = 100,
                     tag = "",
                     footnote = footnote,
-                    footnoteLines = footnoteLines
+                    footnoteLines = footnoteLines,
+                    yerr = error_bars(_data)
                     )
     
     return None
@@ -260,8 +277,7 @@ def pack_navigation(in_folder,results_folder,task_tag=None):
     #Intialise working dataframes
     data = pd.DataFrame()
     keep = ['Presented Stimulus name','Computer timestamp']
-    AOI_data = pd.DataFrame()
-    raw_AOI_data = pd.DataFrame()
+    aoi_results = []
 
     for f in files:
         path = f"{in_path}{f}"
@@ -276,40 +292,27 @@ def pack_navigation(in_folder,results_folder,task_tag=None):
         AOI_cols = [c for c in df.columns if 'AOI' in c]
         AOI_cols = [c for c in AOI_cols if task_tag in c]
         #print(AOI_cols)
-        for c in AOI_cols:
-            data = df[keep+[c,]].dropna()
-            if len(data):
-                start_time = data['Computer timestamp'].values[0]
-                data.insert(0, 't', data['Computer timestamp']-start_time, True)
-                data = data.loc[data['t']>=150]
-                fixation_count = 0
-                fixations = pd.DataFrame()
-                for i, event in data.groupby([(data[c] != data[c].shift()).cumsum()]):
-                    if event[c].sum():
-                        duration = event.t.values[-1]-event.t.values[0]
-                        if (duration > 150) and (duration <900):
-                            result = {}
-                            result['Start'] = event.t.values[0]
-                            result['Duration'] = duration
-                            fixations = fixations.append(result, ignore_index=True)
-                if len(fixations):
-                    result = {}
-                    fields = c.split(task_tag)[1][:-1]
-                    fields = fields.split('_')
-                    result['ID']=c
-                    result['Respondent']=f
-                    result['Route']=fields[1]
-                    result['Category']=fields[2]
-                    result['Variant']=fields[3]
-                    result['AOI']= fields[4]
-                    result['Instance']=fields[5]
-                    result['TTFF']=fixations['Start'].values[0]
-                    result['TFD']=fixations['Duration'].sum()
-                    result['FFD']=fixations['Duration'].values[0]
-                    AOI_data = AOI_data.append(result, ignore_index=True)
-                    raw_AOI_data = raw_AOI_data.append(result, ignore_index=True)
+        metrics = aoi_hit_metrics(df, AOI_cols, mask=df[keep].notna().all(axis=1))
+        for c, TTFF, FFD, TFD in metrics[['ID','TTFF','FFD','TFD']].itertuples(index=False):
+            result = {}
+            fields = c.split(task_tag)[1][:-1]
+            fields = fields.split('_')
+            result['ID']=c
+            result['Respondent']=f
+            result['Route']=fields[1]
+            result['Category']=fields[2]
+            result['Variant']=fields[3]
+            result['AOI']= fields[4]
+            result['Instance']=fields[5]
+            result['TTFF']=TTFF
+            result['TFD']=TFD
+            result['FFD']=FFD
+            aoi_results.append(result)
         print_status('Extracted',path)
     
+    AOI_data = pd.DataFrame(aoi_results)
+    raw_AOI_data = pd.DataFrame(aoi_results)
+    
     data = pd.DataFrame()
     for i, ID in AOI_data.groupby(['ID']):
         result = ID.iloc[0].to_dict()
@@ -544,8 +547,7 @@ def mobile_shelf_exposure(in_folder,results_folder,task_tag=None,pack_graphs=Fal
     #Intialise working dataframes
     data = pd.DataFrame()
     keep = ['Computer timestamp','Event']
-    AOI_data = pd.DataFrame()
-    raw_AOI_data = pd.DataFrame()
+    aoi_results = []
 
     for f in files:
         path = f"{in_path}{f}"
@@ -554,53 +556,45 @@ def mobile_shelf_exposure(in_folder,results_folder,task_tag=None,pack_graphs=Fal
         #For each aoi, get FFD and TTFF
         AOI_cols = [c for c in df.columns if 'AOI' in c]
         AOI_cols = [c for c in AOI_cols if task_tag in c]
-        for c in AOI_cols:
-            data = df[keep+[c,]].dropna(subset=[c,])
-
-            ####
-            task_ID = c.split('[')[1].split(' ')[0]
-            interval = data.dropna().loc[data.dropna()['Event'].str.contains(task_ID)]
-            if len(interval):
-                start_time = interval['Computer timestamp'].values[0]
-                ####
-                data.insert(0, 't', data['Computer timestamp']-start_time, True)
-                data = data.loc[data['t']>=150]
-                fixation_count = 0
-                fixations = pd.DataFrame()
-                for i, event in data.groupby([(data[c] != data[c].shift()).cumsum()]):
-                    if event[c].sum():
-                        duration = event.t.values[-1]-event.t.values[0]
-                        if (duration > 150) and (duration <900):
-                            result = {}
-                            result['Start'] = event.t.values[0]
-                            result['Duration'] = duration
-                            fixations = fixations.append(result, ignore_index=True)
-                if len(fixations):
-                    result = {}
-                    fields = c.split('-')[1].split(' ')[1].split('_')
-                    
-                    
-                    result['ID']=c
-                    result['Respondent']=f
-                    result['Route']=fields[3]
-                    result['Category']=fields[2]
-
-                    ### Adjustment for KOO
-                    #result['Variant']=fields[3]
-
-                    #result['Variant']='_'.join(fields[4:])
-                    result['Variant']=fields[0]
-                    result['AOI']= fields[3]
-                    result['Instance']=fields[4][:-1]
-                    result['TTFF']=fixations['Start'].values[0]
-                    result['TFD']=fixations['Duration'].sum()
-                    result['FFD']=fixations['Duration'].values[0]
-                    AOI_data = AOI_data.append(result, ignore_index=True)
-                    raw_AOI_data = raw_AOI_data.append(result, ignore_index=True)
-            else:
-                pass
+
+        #Start time per AOI from the first event of its task, searched once per task
+        times = df['Computer timestamp'].to_numpy()
+        events = df[keep].notna().all(axis=1)
+        task_IDs = [c.split('[')[1].split(' ')[0] for c in AOI_cols]
+        task_events = {task_ID: (events & df['Event'].astype(str).str.contains(task_ID, regex=False)).to_numpy()
+                       for task_ID in set(task_IDs)}
+        starts = []
+        for c, task_ID in zip(AOI_cols, task_IDs):
+            interval = task_events[task_ID] & df[c].notna().to_numpy()
+            starts.append(times[interval.argmax()] if interval.any() else np.nan)
+
+        metrics = aoi_hit_metrics(df, AOI_cols, start=starts)
+        for c, TTFF, FFD, TFD in metrics[['ID','TTFF','FFD','TFD']].itertuples(index=False):
+            result = {}
+            fields = c.split('-')[1].split(' ')[1].split('_')
+            
+            
+            result['ID']=c
+            result['Respondent']=f
+            result['Route']=fields[3]
+            result['Category']=fields[2]
+
+            ### Adjustment for KOO
+            #result['Variant']=fields[3]
+
+            #result['Variant']='_'.join(fields[4:])
+            result['Variant']=fields[0]
+            result['AOI']= fields[3]
+            result['Instance']=fields[4][:-1]
+            result['TTFF']=TTFF
+            result['TFD']=TFD
+            result['FFD']=FFD
+            aoi_results.append(result)
         print_status('Extracted',path)
     
+    AOI_data = pd.DataFrame(aoi_results)
+    raw_AOI_data = pd.DataFrame(aoi_results)
+    
     data = pd.DataFrame()
     for i, ID in raw_AOI_data.groupby(['ID']):
         result = ID.iloc[0].to_dict()
@@ -1047,7 +1041,7 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
 
 
     #Initialise results dataframes
-    results = pd.DataFrame()
+    results = []
     significance = pd.DataFrame()
     stats_routes = {}
 
@@ -1071,17 +1065,23 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
                 result = dict()
                 result['Route'] = r
                 result['Chosen'] = chosen/len(route)*100
+                result['Count'] = chosen
+                result['n'] = len(route)
                 result['Cluster'] = g
 
                 if isAOIData:
                     AOI = AOI_mean_data.loc[(AOI_mean_data['Goal']==g) & (AOI_mean_data['AOI']==r)]
                     AOI = AOI_mean_data.loc[(AOI_mean_data['Goal']==g) & (AOI_mean_data['AOI']==r)]['TFD'].values[0] if len(AOI) else 0
                     result['TFD'] = AOI
-                results = results.append(result,ignore_index = True)     
+                results.append(result)
         significance = pd.concat([significance, get_significance(stats_routes, routes, g)])
         
 
 
+    results = pd.DataFrame(results)
+    cis = bootstrap_proportions(results['Count'], results['n'], seed=0)
+    results[['CI Low','CI High']] = cis[['CI Low','CI High']].to_numpy()
+
     results.to_excel(f'{out_path}{task}_Results.xlsx', index = False)
     significance.to_excel(f'{out_path}{task}_Significance.xlsx', index = False)
     significance = significance.drop_duplicates(subset=['Cluster','pValue'])
@@ -1106,7 +1106,8 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
                     y1lim = 100,
                     tag = "",
                     footnote = footnote,
-                    footnoteLines = footnoteLines
+                    footnoteLines = footnoteLines,
+                    yerr = error_bars(_data, 'Chosen')
                     )
     
     results = results.sort_values(by='Route')
@@ -1118,8 +1119,9 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
         _data = results.loc[results['Cluster']==cluster].sort_values(by='Route')
         y_data[cluster] = dict()
         y_data[cluster]['values'] = _data['Chosen'].values
+        y_data[cluster]['err'] = error_bars(_data, 'Chosen')
         y_data[cluster]['label'] = cluster
-        y_data[cluster]['bar_color'] = BAR_COLORS[i]
+        y_data[cluster]['color'] = BAR_COLORS[i]
         i += 1
 
     ### Add footnote for significance
@@ -1139,7 +1141,7 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
     ###########################
     # For each category:::
     #Initialise results dataframes
-    results = pd.DataFrame()
+    results = []
     significance = pd.DataFrame()
     stats_routes = {}
 
@@ -1166,17 +1168,23 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
                     result['Category'] = c
                     result['Route'] = r
                     result['Chosen'] = chosen/len(route)*100
+                    result['Count'] = chosen
+                    result['n'] = len(route)
                     result['Cluster'] = f"{r}-{c}"
 
                     if isAOIData:
                         AOI = AOI_mean_data.loc[(AOI_mean_data['Goal']==g) & (AOI_mean_data['Category']==c) & (AOI_mean_data['AOI']==r)]
                         AOI = AOI_mean_data.loc[(AOI_mean_data['Goal']==g) & (AOI_mean_data['Category']==c) & (AOI_mean_data['AOI']==r)]['TFD'].values[0] if len(AOI) else 0
                         result['TFD'] = AOI
-                    results = results.append(result,ignore_index = True)     
+                    results.append(result)
             significance = pd.concat([significance, get_significance(stats_routes, routes,c)])
         
 
 
+    results = pd.DataFrame(results)
+    cis = bootstrap_proportions(results['Count'], results['n'], seed=0)
+    results[['CI Low','CI High']] = cis[['CI Low','CI High']].to_numpy()
+
     results.to_excel(f'{out_path}{task}Category_Results.xlsx', index = False)
     significance.to_excel(f'{out_path}{task}Category_Significance.xlsx', index = False)
     significance = significance.drop_duplicates(subset=['Cluster','pValue'])
@@ -1201,7 +1209,8 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
                     y1lim = 100,
                     tag = "",
                     footnote = footnote,
-                    footnoteLines = footnoteLines
+                    footnoteLines = footnoteLines,
+                    yerr = error_bars(_data, 'Chosen')
                     )
     
     results = results.sort_values(by='Cluster')
@@ -1213,8 +1222,9 @@ def top_down_preferance(in_folder,results_folder,task_tag=None,keyboards = None,
         _data = results.loc[results['Cluster']==cluster].sort_values(by='Route')
         y_data[cluster] = dict()
         y_data[cluster]['values'] = _data['Chosen'].values
+        y_data[cluster]['err'] = error_bars(_data, 'Chosen')
         y_data[cluster]['label'] = cluster
-        y_data[cluster]['bar_color'] = BAR_COLORS[i]
+        y_data[cluster]['color'] = BAR_COLORS[i]
         i += 1
 
     ### Add footnote for significance
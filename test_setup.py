@@ -82,6 +82,26 @@ def test_neurallib():
         'neurallib.batch',
         'neurallib.signal_processing',
         'neurallib.project_management',
+        'neurallib.resample',
+        'neurallib.align',
+        'neurallib.epochs',
+        'neurallib.baseline',
+        'neurallib.signal_store',
+        'neurallib.fixations',
+        'neurallib.aoi',
+        'neurallib.scanpath',
+        'neurallib.heatmap',
+        'neurallib.geometry',
+        'neurallib.pupil',
+        'neurallib.records',
+        'neurallib.stats_kernels',
+        'neurallib.screening',
+        'neurallib.result_cache',
+        'neurallib.proportions',
+        'neurallib.cluster_permutation',
+        'neurallib.effect_sizes',
+        'neurallib.modelling',
+        'neurallib.power',
     ]
     
     failed = []
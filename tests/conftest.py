@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+lib_path = Path(__file__).parent.parent / 'lib'
+if str(lib_path) not in sys.path:
+    sys.path.insert(0, str(lib_path))
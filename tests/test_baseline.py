@@ -0,0 +1,29 @@
+import numpy as np
+
+from neurallib.baseline import apply_baseline, cached_baselines, compute_baselines
+from neurallib.epochs import Epochs, EpochStore
+
+
+def _epochs(offset=0.0):
+    data = np.arange(2 * 4 * 1, dtype=float).reshape(2, 4, 1) + offset
+    return Epochs('Blank', data, ['001', '002'], np.arange(4) * 10.0, ['GSR'])
+
+
+def test_cached_baselines_keep_respondent_labels(tmp_path):
+    store = EpochStore(str(tmp_path))
+    store.save(_epochs())
+    first = cached_baselines(store, 'Blank')
+    cached = cached_baselines(store, 'Blank')
+    assert list(cached.index) == ['001', '002']
+    corrected = apply_baseline(_epochs(), cached)
+    assert not np.isnan(corrected.data).any()
+    np.testing.assert_allclose(cached.to_numpy(), first.to_numpy())
+
+
+def test_cached_baselines_follow_saved_epochs(tmp_path):
+    store = EpochStore(str(tmp_path))
+    store.save(_epochs())
+    cached_baselines(store, 'Blank')
+    store.save(_epochs(offset=100.0))
+    cached = cached_baselines(store, 'Blank')
+    np.testing.assert_allclose(cached.to_numpy(), compute_baselines(_epochs(offset=100.0)).to_numpy())
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from neurallib import batch
+
+
+def _export(path, rng, n=300):
+    frames = []
+    for stim in ['AdA', 'AdB']:
+        fixation = np.repeat(np.arange(n // 30), 30).astype(float)
+        frames.append(pd.DataFrame({'SourceStimuliName': stim,
+                                    'Timestamp': np.arange(n) * 1000 / 60 + (0 if stim == 'AdA' else 50000),
+                                    'Fixation Index': fixation,
+                                    'AOIs gazed at': np.array(['Logo', 'KeyVisual', 'Text'])[fixation.astype(int) % 3],
+                                    'Fixation Duration': 500.0,
+                                    'ET_PupilLeft': 3 + 0.1 * rng.standard_normal(n),
+                                    'ET_PupilRight': 3 + 0.1 * rng.standard_normal(n),
+                                    'SlideEvent': np.where(np.arange(n) == 0, 'StartMedia', '')}))
+    pd.concat(frames).to_csv(path, index=False)
+
+
+def test_eye_metrics_saliency_og_writes_percentiles(tmp_path):
+    rng = np.random.default_rng(0)
+    (tmp_path / 'in').mkdir()
+    for r in range(3):
+        _export(tmp_path / 'in' / f'resp{r}.csv', rng)
+
+    results = f"{tmp_path}/results/"
+    batch.eye_metrics_saliency_og(f"{tmp_path}/in/", f"{tmp_path}/out/", results, exclude=['Text'])
+
+    aois = pd.read_excel(f"{results}RESULT_saliency_AOI_percentiles.xlsx")
+    assert len(aois) == 4
+    assert not aois['AOI'].str.contains('Text').any()
+    stims = pd.read_excel(f"{results}RESULT_saliency_stims_percentiles.xlsx")
+    assert stims['Stim'].tolist() == ['AdA', 'AdB']
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from neurallib.fixations import detect_fixations
+
+
+def _gaze(rate=60.0, seconds=3.0):
+    """Three fixations of one second at different positions, sampled at rate Hz."""
+    times = np.arange(0, seconds * 1000, 1000 / rate)
+    target = np.floor(times / 1000)
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'Timestamp': times,
+                         'Gaze X': 200 + 300 * target + rng.normal(0, 1, len(times)),
+                         'Gaze Y': 300 + 100 * target + rng.normal(0, 1, len(times)),
+                         'SourceStimuliName': 'Ad',
+                         'AOIs gazed at': 'Pack',
+                         'Fixation Index': np.nan})
+
+
+def _interleave(gaze, rate=128.0):
+    """Adds GSR rows without gaze, as in an iMotions export of several sensors."""
+    times = np.arange(0, gaze['Timestamp'].max(), 1000 / rate)
+    gsr = pd.DataFrame({'Timestamp': times, 'GSR Raw': 1.0, 'SourceStimuliName': 'Ad',
+                        'AOIs gazed at': np.nan, 'Fixation Index': np.nan})
+    return pd.concat([gaze, gsr]).sort_values('Timestamp', kind='stable').reset_index(drop=True)
+
+
+def test_ivt_ignores_interleaved_sensor_rows():
+    gaze = _gaze()
+    alone = detect_fixations(gaze, 'R1', method='ivt')
+    interleaved = detect_fixations(_interleave(gaze), 'R1', method='ivt')
+    assert len(alone) == 3
+    pd.testing.assert_frame_equal(interleaved, alone)
+
+
+def test_idt_ignores_interleaved_sensor_rows():
+    gaze = _gaze()
+    alone = detect_fixations(gaze, 'R1', method='idt')
+    interleaved = detect_fixations(_interleave(gaze), 'R1', method='idt')
+    assert len(alone) == 3
+    pd.testing.assert_frame_equal(interleaved, alone)
+
+
+def test_sample_labels_map_back_to_original_rows():
+    data = _interleave(_gaze())
+    _, codes = detect_fixations(data, 'R1', samples=True)
+    assert (codes[data['Gaze X'].isna().to_numpy()] == -1).all()
+    assert (codes[data['Gaze X'].notna().to_numpy()] >= 0).mean() > 0.9
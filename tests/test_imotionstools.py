@@ -0,0 +1,69 @@
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+from neurallib.imotionstools import FlashExposure, shelf_navigation
+
+
+def _presses(n=120, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        left, right = rng.choice(['A', 'B', 'C'], 2, replace=False)
+        press = rng.choice(['Left', 'Right'])
+        for side, route in (('Left', left), ('Right', right)):
+            rows.append({'Slide': f'Slide{i}', 'Respondent': f'Resp{i % 20}', 'Data': press,
+                         'Category': ['X', 'Y'][i % 2], 'Route': route, 'Chosen': int(press == side)})
+    return pd.DataFrame(rows)
+
+
+def test_flash_exposure_results_have_intervals(tmp_path):
+    key = tmp_path / 'key.csv'
+    pd.DataFrame({'Slide': ['Slide0'], 'Left': ['A'], 'Right': ['B']}).to_csv(key, index=False)
+    flash = FlashExposure('Flash', str(tmp_path), str(tmp_path / 'out'), task_key_path=str(key))
+    flash._data = _presses()
+    flash._data_processed = True
+
+    flash.get_results()
+
+    out = tmp_path / 'out' / 'Flash'
+    results = pd.read_excel(out / 'Flash_Results.xlsx')
+    data = flash.data
+    expected = data.groupby('Route')['Chosen'].mean() * 100
+    np.testing.assert_allclose(results.set_index('Route')['Proportion'], expected[results['Route']])
+    assert (results['CI Low'] <= results['Proportion']).all()
+    assert (results['Proportion'] <= results['CI High']).all()
+    per_group = pd.read_excel(out / 'Flash_PerGroup_Results.xlsx')
+    assert set(per_group['Cluster']) == {'X', 'Y'}
+    assert {'Count', 'n', 'CI Low', 'CI High'} <= set(per_group.columns)
+    assert os.path.exists(out / 'plot_bar_Overall.png')
+
+
+def test_shelf_navigation_runs_on_pandas_without_append(tmp_path):
+    rng = np.random.default_rng(0)
+    aois = [f'Shelf_{r}_{c}_V1_{a}_01' for r in ['R1', 'R2'] for c in ['Fruit', 'Dairy'] for a in ['Logo', 'Pack']]
+    (tmp_path / 'in').mkdir()
+    for respondent in range(4):
+        n = 1200
+        df = pd.DataFrame({'SourceStimuliName': 'Shelf',
+                           'Timestamp': np.arange(n) * 1000 / 60,
+                           'Fixation Index': np.repeat(np.arange(n // 20), 20).astype(float),
+                           'AOIs gazed at': np.array(aois)[rng.integers(0, len(aois), n // 20)].repeat(20),
+                           'SlideEvent': np.where(np.arange(n) == 0, 'StartMedia', '')})
+        with open(tmp_path / 'in' / f'resp{respondent}.csv', 'w') as file:
+            file.write('#Export header\n')
+            df.to_csv(file, index=False)
+
+    shelf_navigation(f"{tmp_path}/in/", f"{tmp_path}/", task_tag='T')
+
+    out = tmp_path / 'ShelfNavigation_T'
+    raw = pd.read_excel(out / 'ShelfNavigation_Raw.xlsx')
+    results = pd.read_excel(out / 'ShelfNavigation_Results.xlsx')
+    counts = raw.groupby('ID').size()
+    assert results.set_index('ID')['Count'].to_dict() == counts.to_dict()
+    aoi_results = pd.read_excel(out / 'ShelfNavigation_AOI_Results.xlsx')
+    # Every variant on its own, then split by each category
+    assert len(aoi_results) == 2 * (1 + 2)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from neurallib.pupil import lowpass, pupil_metrics
+
+
+def _trace(rate=60.0, seconds=4.0):
+    times = np.arange(0, seconds * 1000, 1000 / rate)
+    rng = np.random.default_rng(0)
+    pupil = 3 + 0.3 * np.sin(2 * np.pi * 0.5 * times / 1000) + rng.normal(0, 0.05, len(times))
+    codes = np.minimum((times // 500).astype(np.int64), 7)
+    return times, pupil, codes
+
+
+def _interleave(times, pupil, codes, rate=256.0):
+    """Adds EEG rows without pupil or fixation, as in an iMotions export of several sensors."""
+    other = np.arange(0, times.max(), 1000 / rate)
+    frame = pd.DataFrame({'Timestamp': np.r_[times, other], 'Pupil': np.r_[pupil, np.full(len(other), np.nan)],
+                          'Code': np.r_[codes, np.full(len(other), -1)]})
+    return frame.sort_values('Timestamp', kind='stable').reset_index(drop=True)
+
+
+def test_lowpass_uses_the_pupil_timebase():
+    times, pupil, _ = _trace()
+    frame = _interleave(times, pupil, np.zeros(len(times), dtype=np.int64))
+    filtered = lowpass(frame['Pupil'], times=frame['Timestamp'])
+    valid = frame['Pupil'].notna().to_numpy()
+    np.testing.assert_allclose(filtered[valid], lowpass(pupil), atol=1e-6)
+    assert np.isnan(filtered[~valid]).all()
+
+
+def test_pupil_metrics_ignore_interleaved_rows():
+    times, pupil, codes = _trace()
+    alone = pupil_metrics(pupil, codes, times=times)
+    frame = _interleave(times, pupil, codes)
+    interleaved = pupil_metrics(frame['Pupil'], frame['Code'], times=frame['Timestamp'])
+    pd.testing.assert_frame_equal(interleaved, alone, atol=1e-6)
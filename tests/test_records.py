@@ -0,0 +1,37 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from neurallib.records import Records
+
+
+def _frame():
+    return pd.DataFrame({'Res': ['001', '002', '001', '010'],
+                         'Stim': [3, 5, 3, 7],
+                         'AOI': [True, False, True, True],
+                         'Timestamp': [0.0, 16.7, 33.3, 50.0]})
+
+
+SCHEMA = {'Res': 'category', 'Stim': 'category', 'AOI': 'category', 'Timestamp': 'f4'}
+
+
+def test_save_load_keeps_label_types(tmp_path):
+    path = str(tmp_path / 'records.npy')
+    df = _frame()
+    Records.from_frame(df, SCHEMA).save(path)
+    loaded = Records.load(path)
+
+    assert loaded.categories == {'Res': ['001', '002', '010'], 'Stim': [3, 5, 7], 'AOI': [True, False]}
+    frame = loaded.to_frame()
+    for c in ('Res', 'Stim', 'AOI'):
+        assert list(frame[c]) == list(df[c])
+    np.testing.assert_allclose(frame['Timestamp'], df['Timestamp'], rtol=1e-6)
+
+
+def test_load_reads_sidecars_without_dtypes(tmp_path):
+    path = str(tmp_path / 'records.npy')
+    Records.from_frame(_frame(), SCHEMA).save(path)
+    with open(f"{path}.json", 'w') as file:
+        json.dump({'Res': ['001', '002', '010'], 'Stim': ['3', '5', '7'], 'AOI': ['True', 'False']}, file)
+    assert Records.load(path).categories['Stim'] == ['3', '5', '7']
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from neurallib import stats
+from neurallib.stats import get_significance, get_significance_batch
+
+
+def _tasks(n=4):
+    rng = np.random.default_rng(0)
+    tasks = []
+    for i in range(n):
+        group_data = {'A': rng.normal(0, 1, 20), 'B': rng.normal(0.8, 1, 20), 'C': rng.exponential(1, 20)}
+        tasks.append((f'Cluster {i}', group_data, ['A', 'B', 'C']))
+    tasks.append(('Pair', {'A': rng.normal(0, 1, 15), 'B': rng.normal(1, 1, 15)}, ['A', 'B']))
+    return tasks
+
+
+def _serial(tasks):
+    frames = [get_significance({k: v.copy() for k, v in data.items()}, cluster, groups, cache=False)
+              for cluster, data, groups in tasks]
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_batch_matches_serial_in_processes():
+    tasks = _tasks()
+    batch = get_significance_batch(tasks, workers=2, min_parallel=0, cache=False, effect_size=False)
+    pd.testing.assert_frame_equal(batch, _serial(tasks))
+
+
+def test_batch_matches_serial_in_this_process(monkeypatch):
+    def _no_pool(*args, **kwargs):
+        raise AssertionError('A process pool was started for a small batch')
+    monkeypatch.setattr(stats, 'ProcessPoolExecutor', _no_pool)
+    tasks = _tasks()
+    batch = get_significance_batch(tasks, workers=4, cache=False, effect_size=False)
+    pd.testing.assert_frame_equal(batch, _serial(tasks))
+
+
+def test_cache_does_not_change_group_data(tmp_path):
+    cache = stats.ResultCache(str(tmp_path))
+    rng = np.random.default_rng(1)
+    group_data = {'A': rng.normal(0, 1, 3), 'B': rng.normal(1, 1, 10)}
+    for _ in range(2):
+        data = {k: v.copy() for k, v in group_data.items()}
+        significance = get_significance(data, 'Cluster', ['A', 'B'], cache=cache)
+        assert len(data['A']) == 3
+        assert len(significance)
+    assert len(cache.get(stats._significance_key(group_data, ['A', 'B'], False, False, 'pingouin')))
+
+
+def _branch_data(branch):
+    rng = np.random.default_rng(0)
+    if branch == 'ANOVA':
+        return {'A': rng.normal(0, 1, 30), 'B': rng.normal(1, 1, 30), 'C': rng.normal(0.2, 1, 30)}, False
+    if branch == 'Kruskal-Wallis':
+        return {'A': rng.exponential(1, 30), 'B': rng.exponential(1, 30) + 0.8, 'C': rng.exponential(1, 30)}, False
+    if branch == 'ANOVA Welch':
+        return {'A': rng.normal(0, 0.3, 30), 'B': rng.normal(1.5, 3, 30), 'C': rng.normal(0.2, 1, 30)}, False
+    if branch == 'Independent T-Test':
+        return {'A': rng.normal(0, 1, 25), 'B': rng.normal(0.7, 1, 25)}, False
+    if branch == 'Mann-Whitney U':
+        return {'A': rng.exponential(1, 25), 'B': rng.exponential(2, 25)}, False
+    x = rng.normal(0, 1, 20)
+    if branch == 'Paired T-Test':
+        return {'A': x, 'B': x + rng.normal(0.5, 0.5, 20)}, True
+    return {'A': x, 'B': x + rng.exponential(1, 20) ** 3}, True
+
+
+# Normality and Levene decide which of these tests runs, so reaching each one checks them too
+@pytest.mark.parametrize('branch', ['ANOVA', 'Kruskal-Wallis', 'ANOVA Welch', 'Independent T-Test',
+                                    'Mann-Whitney U', 'Paired T-Test', 'Wilcoxin'])
+def test_fast_engine_matches_pingouin(branch):
+    group_data, paired = _branch_data(branch)
+    reference = get_significance(group_data, branch, list(group_data), paired=paired, engine='pingouin', cache=False)
+    fast = get_significance(group_data, branch, list(group_data), paired=paired, engine='fast', cache=False)
+
+    assert reference['Type'].iloc[0] == branch
+    assert fast['Type'].tolist() == reference['Type'].tolist()
+    np.testing.assert_allclose(fast['pValue'].astype(float), reference['pValue'].astype(float), rtol=1e-6, atol=1e-12)
@@ -0,0 +1,61 @@
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+from neurallib import tobiitools
+
+
+def _keys(folder, rng, slides=12):
+    rows = []
+    for s in range(1, slides + 1):
+        left, right = rng.choice(['R1', 'R2', 'R3'], 2, replace=False)
+        rows.append({'Slide Number': s, 'Left': left, 'Right': right, 'A': left, 'B': right,
+                     'Stim': ['Fruit', 'Dairy'][s % 2], 'Variant': 'V1',
+                     'Goal': ['Health', 'Taste'][s % 2], 'Category': ['Fruit', 'Dairy'][(s // 2) % 2]})
+    keys = pd.DataFrame(rows)
+    (folder / 'Keys').mkdir(parents=True)
+    keys[['Slide Number', 'Left', 'Right', 'Stim', 'Variant']].to_csv(folder / 'Keys' / 'flash.csv', index=False)
+    keys[['Slide Number', 'A', 'B', 'Goal', 'Category']].to_csv(folder / 'Keys' / 'topdown.csv', index=False)
+    return keys
+
+
+def _presses(folder, rng, presses, respondents=8, slides=12):
+    (folder / 'Raw').mkdir(exist_ok=True)
+    for r in range(respondents):
+        rows = []
+        for s in range(1, slides + 1):
+            rows.append({'Presented Stimulus name': f'Slide{s} (1)', 'Event': np.nan, 'Event value': np.nan,
+                         'Computer timestamp': 0})
+            rows.append({'Presented Stimulus name': np.nan, 'Event': 'KeyboardEvent',
+                         'Event value': rng.choice(presses), 'Computer timestamp': 1})
+        pd.DataFrame(rows).to_csv(folder / 'Raw' / f'resp{r}.tsv', sep='\t', index=False)
+
+
+def test_flash_exposure_results_have_intervals(tmp_path):
+    rng = np.random.default_rng(0)
+    _keys(tmp_path / 'in', rng)
+    _presses(tmp_path / 'in', rng, ['Left', 'Right'])
+
+    tobiitools.flash_exposure(f"{tmp_path}/in/", f"{tmp_path}/", key_path='flash.csv')
+
+    results = pd.read_excel(tmp_path / 'FlashExposure' / 'FlashExposure_Results.xlsx')
+    assert set(results['Type']) == {'Overall', 'Category', 'Variant'}
+    np.testing.assert_allclose(results['Proportion'], results['Count'] / results['n'] * 100)
+    assert (results['CI Low'] <= results['Proportion']).all()
+    assert (results['Proportion'] <= results['CI High']).all()
+
+
+def test_top_down_preferance_results_have_intervals(tmp_path):
+    rng = np.random.default_rng(0)
+    _keys(tmp_path / 'in', rng)
+    _presses(tmp_path / 'in', rng, ['A', 'B'])
+
+    tobiitools.top_down_preferance(f"{tmp_path}/in/", f"{tmp_path}/", task_tag='', key_path='topdown.csv')
+
+    out = tmp_path / 'TopDownPreferencetopdown'
+    for name in ['TopDownPreference_Results.xlsx', 'TopDownPreferenceCategory_Results.xlsx']:
+        results = pd.read_excel(out / name)
+        assert {'Count', 'n', 'CI Low', 'CI High'} <= set(results.columns)
+        assert (results['CI Low'] <= results['Chosen']).all()
+        assert (results['Chosen'] <= results['CI High']).all()